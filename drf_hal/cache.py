@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of rendered representations.
+
+Serializers with the `cache_representation` Meta option keep the native
+representation of each object in Django's cache framework, keyed by
+serializer class, field selection, URL base and format, and by version
+tokens of the object and of the models its representation embeds.
+
+Saving or deleting an object (`post_save`, `post_delete`) replaces its
+version token and the token of its model, and `m2m_changed` does the same
+for both sides of the relation, so stale entries are never read again and
+simply expire. Representations that read other data, e.g. through method
+fields, are not invalidated by changes to it.
+
+The receivers are only connected to the models that cached representations
+depend on (see `watch`): the model and dependencies of each serializer with
+`cache_representation`, registered when the serializer class is defined so
+that every process importing it watches the same models. Serializers
+defined before the models are loaded, and dependencies that only some field
+selections embed, are watched from their first cached serialization.
+
+The tokens are replaced in every cache named in the
+`HAL_REPRESENTATION_CACHE_ALIASES` setting, `('default',)` unless set, which
+must list the `cache_alias` of every serializer caching its representations
+in any process. `QuerySet.update()` and `bulk_create` send no signals:
+`HALModelSerializer.save_objects` calls `invalidate` after its bulk inserts,
+and code updating cached models in bulk must do the same.
+"""
+import hashlib
+import threading
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+
+# Representation caches, by cache alias.
+_representation_caches = {}
+
+# Concrete models whose changes invalidate cached representations.
+_watched_models = set()
+_watched_models_lock = threading.Lock()
+
+
+def get_model_label(model):
+    opts = model._meta.concrete_model._meta
+    return '%s.%s' % (opts.app_label, opts.model_name)
+
+
+def new_version():
+    return uuid.uuid4().hex
+
+
+class RepresentationCache(object):
+    """
+    Natives of serialized objects, in the cache `cache_alias`.
+
+    `hits` and `misses` count the objects served from the cache and the
+    ones that had to be serialized.
+    """
+    key_prefix = 'drf_hal.repr'
+
+    def __init__(self, cache_alias='default', key_prefix=None):
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix or self.key_prefix
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
+    def object_version_key(self, model, pk):
+        return '%s.v.%s.%s' % (self.key_prefix, get_model_label(model), pk)
+
+    def model_version_key(self, model):
+        return '%s.g.%s' % (self.key_prefix, get_model_label(model))
+
+    def get_versions(self, keys):
+        """
+        Return the version tokens of `keys`, creating the missing ones.
+        """
+        versions = self.cache.get_many(keys)
+        missing = dict((key, new_version()) for key in keys if key not in versions)
+        if missing:
+            self.cache.set_many(missing, None)
+            versions.update(missing)
+        return versions
+
+    def make_key(self, identity, pk, version, dependency_versions):
+        digest = hashlib.md5(repr((identity, pk, version, dependency_versions)).encode('utf-8')).hexdigest()
+        return '%s.r.%s' % (self.key_prefix, digest)
+
+    def serialize(self, objects, serialize, identity, model, dependencies=(), timeout=None):
+        """
+        Return the natives of `objects`, read from the cache where possible.
+        The others are serialized with `serialize(objects)` and stored for
+        `timeout` seconds.
+
+        `identity` stands for everything the representation depends on
+        besides the object, and `dependencies` are the models it embeds.
+        """
+        watch((model,) + tuple(dependencies))
+        dependency_keys = [self.model_version_key(related_model) for related_model in dependencies]
+        object_keys = [self.object_version_key(model, obj.pk) for obj in objects]
+        versions = self.get_versions(dependency_keys + object_keys)
+        dependency_versions = tuple(versions[key] for key in dependency_keys)
+        keys = [self.make_key(identity, obj.pk, versions[object_key], dependency_versions)
+                for obj, object_key in zip(objects, object_keys)]
+
+        cached = self.cache.get_many(keys)
+        missed = [index for index, key in enumerate(keys) if key not in cached]
+        self.hits += len(objects) - len(missed)
+        self.misses += len(missed)
+        if missed:
+            natives = serialize([objects[index] for index in missed])
+            self.cache.set_many(dict((keys[index], native) for index, native in zip(missed, natives)), timeout)
+            cached.update((keys[index], native) for index, native in zip(missed, natives))
+        return [cached[key] for key in keys]
+
+    def invalidate(self, model, pks=()):
+        """
+        Replace the version tokens of the objects `pks` of `model` and of `model`.
+        """
+        keys = [self.model_version_key(model)] + [self.object_version_key(model, pk) for pk in pks]
+        self.cache.set_many(dict((key, new_version()) for key in keys), None)
+
+
+def get_representation_cache(cache_alias='default'):
+    """
+    Return the `RepresentationCache` of the cache `cache_alias`.
+    """
+    representation_cache = _representation_caches.get(cache_alias)
+    if representation_cache is None:
+        representation_cache = _representation_caches[cache_alias] = RepresentationCache(cache_alias)
+    return representation_cache
+
+
+def invalidate(model, pks=()):
+    """
+    Invalidate the cached representations of the objects `pks` of `model`,
+    and of the representations embedding objects of `model`.
+    """
+    model = model._meta.concrete_model
+    cache_aliases = set(getattr(settings, 'HAL_REPRESENTATION_CACHE_ALIASES', ('default',)))
+    cache_aliases.update(_representation_caches)
+    for cache_alias in cache_aliases:
+        get_representation_cache(cache_alias).invalidate(model, pks)
+
+
+def instance_changed(sender, instance, **kwargs):
+    invalidate(sender, (instance.pk,))
+
+
+def relation_changed(sender, instance, action, model, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    invalidate(instance.__class__, (instance.pk,))
+    invalidate(model, pk_set or ())
+
+
+def get_through_models(model):
+    """
+    Return the intermediary models of the many-to-many relations of `model`,
+    in both directions.
+    """
+    opts = model._meta
+    relations = [field.rel for field in opts.many_to_many]
+    relations.extend(related.field.rel for related in opts.get_all_related_many_to_many_objects())
+    return set(relation.through for relation in relations)
+
+
+def watch(models):
+    """
+    Invalidate the cached representations when objects of `models`, or of
+    their proxies, are saved or deleted, or when their many-to-many
+    relations change.
+    """
+    new_models = set(model._meta.concrete_model for model in models) - _watched_models
+    if not new_models:
+        return
+    with _watched_models_lock:
+        new_models -= _watched_models
+        for model in new_models:
+            for sender in apps.get_models(include_auto_created=True):
+                if sender._meta.concrete_model is model:
+                    post_save.connect(instance_changed, sender=sender)
+                    post_delete.connect(instance_changed, sender=sender)
+            for through in get_through_models(model):
+                m2m_changed.connect(relation_changed, sender=through)
+        _watched_models.update(new_models)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent loading of related objects.
+
+A resource that embeds or links several to-many relations runs one prefetch
+query per relation, one after the other. `ConcurrentPrefetchQuerySet` runs
+the prefetches of independent relations in a pool of threads instead, so
+loading them takes about as long as the slowest one.
+
+Each thread uses its own database connection, so the prefetches do not see
+uncommitted changes of the request's transaction. As Django does around
+requests, the connections past their `CONN_MAX_AGE` or left unusable by
+errors are closed before and after each prefetch; the others are kept for
+the next one. `close_pools` closes them all and stops the threads, and runs
+at interpreter exit. In-memory SQLite databases are private to their
+connection and are always prefetched serially.
+
+The pools are shared by the whole process, one per number of workers: at
+most that many prefetches run at once across all requests, and the others
+wait for a free thread. Size `prefetch_workers` for the concurrent requests
+of the process, within the connection limit of the database, as every
+thread holds a connection.
+"""
+import atexit
+from multiprocessing.pool import ThreadPool
+import threading
+
+from django.db import close_old_connections, connections
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.query import Prefetch, QuerySet, prefetch_related_objects
+
+
+# Thread pools, by number of workers.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers):
+    pool = _pools.get(workers)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(workers)
+            if pool is None:
+                pool = _pools[workers] = ThreadPool(workers)
+    return pool
+
+
+def close_connections():
+    for connection in connections.all():
+        connection.close()
+
+
+def call_with_connections(function):
+    """
+    Call `function`, closing the connections of the thread that are past
+    their `CONN_MAX_AGE` or unusable before and after the call.
+    """
+    close_old_connections()
+    try:
+        return function()
+    finally:
+        close_old_connections()
+
+
+def call_in_every_thread(pool, workers, function):
+    """
+    Call `function` once in each of the `workers` threads of `pool`.
+    """
+    condition = threading.Condition()
+    arrived = [0]
+
+    def call(index):
+        # Holds the thread until every other one has a call too
+        with condition:
+            arrived[0] += 1
+            condition.notify_all()
+            while arrived[0] < workers:
+                condition.wait()
+        return function()
+    return pool.map(call, range(workers), chunksize=1)
+
+
+def close_pools():
+    """
+    Close the database connections of the threads of the pools, and stop them.
+    """
+    with _pools_lock:
+        pools = list(_pools.items())
+        _pools.clear()
+    for workers, pool in pools:
+        call_in_every_thread(pool, workers, close_connections)
+        pool.close()
+        pool.join()
+
+
+atexit.register(close_pools)
+
+
+def run_concurrently(functions, workers=4):
+    """
+    Call `functions` in a pool of `workers` threads and return their results.
+    """
+    if len(functions) < 2 or workers < 2:
+        return [function() for function in functions]
+    return get_pool(workers).map(call_with_connections, functions, chunksize=1)
+
+
+def can_load_concurrently(using):
+    connection = connections[using]
+    return not (connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'))
+
+
+def group_lookups(lookups):
+    """
+    Return `lookups` grouped by the relation they start from, in order.
+    """
+    groups = []
+    by_relation = {}
+    for lookup in lookups:
+        through = lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+        relation = through.split(LOOKUP_SEP, 1)[0]
+        group = by_relation.get(relation)
+        if group is None:
+            group = by_relation[relation] = []
+            groups.append(group)
+        group.append(lookup)
+    return groups
+
+
+def prefetch_related_objects_concurrently(objects, lookups, workers=4):
+    """
+    Same as `prefetch_related_objects`, with the lookups of different
+    relations of `objects` prefetched concurrently.
+    """
+    groups = group_lookups(lookups)
+    if len(groups) < 2:
+        prefetch_related_objects(objects, lookups)
+        return
+    # Created here rather than in each thread
+    for obj in objects:
+        if not hasattr(obj, '_prefetched_objects_cache'):
+            obj._prefetched_objects_cache = {}
+    run_concurrently([lambda group=group: prefetch_related_objects(objects, group) for group in groups], workers)
+
+
+class ConcurrentPrefetchQuerySet(QuerySet):
+    """
+    QuerySet whose `prefetch_related` lookups of different relations are
+    prefetched concurrently, by up to `prefetch_workers` threads.
+    """
+    prefetch_workers = 4
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        kwargs.setdefault('prefetch_workers', self.prefetch_workers)
+        return super(ConcurrentPrefetchQuerySet, self)._clone(klass, setup, **kwargs)
+
+    def _prefetch_related_objects(self):
+        if self._result_cache and can_load_concurrently(self.db):
+            prefetch_related_objects_concurrently(self._result_cache, self._prefetch_related_lookups,
+                                                  self.prefetch_workers)
+        else:
+            prefetch_related_objects(self._result_cache, self._prefetch_related_lookups)
+        self._prefetch_done = True
+
+
+def prefetch_concurrently(queryset, workers=None):
+    """
+    Return a copy of `queryset` whose prefetches run concurrently, in up to
+    `workers` threads.
+    """
+    if queryset.__class__ not in (QuerySet, ConcurrentPrefetchQuerySet):
+        return queryset
+    kwargs = {'prefetch_workers': workers} if workers is not None else {}
+    return queryset._clone(klass=ConcurrentPrefetchQuerySet, **kwargs)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.db import connections
+from django.db.models.sql.datastructures import EmptyResultSet
+
+
+class ExactCount(object):
+    """
+    Counts with `SELECT COUNT(*)`.
+
+    A count strategy is called with a queryset and returns a
+    `(count, is_approximate)` tuple.
+    """
+
+    def __call__(self, queryset):
+        return queryset.count(), False
+
+
+class CachedCount(object):
+    """
+    Caches the result of another count strategy (exact by default) for
+    `timeout` seconds, keyed on the SQL of the filtered query.
+    """
+
+    def __init__(self, strategy=None, timeout=60, cache_alias='default', key_prefix='drf_hal.count'):
+        self.strategy = strategy or ExactCount()
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+
+    def get_cache_key(self, queryset):
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        digest = hashlib.md5(repr((queryset.db, sql, params)).encode('utf-8')).hexdigest()
+        return '%s.%s' % (self.key_prefix, digest)
+
+    def __call__(self, queryset):
+        key = self.get_cache_key(queryset)
+        if key is None:
+            return 0, False
+
+        cache = caches[self.cache_alias]
+        result = cache.get(key)
+        if result is None:
+            result = self.strategy(queryset)
+            cache.set(key, result, self.timeout)
+        return tuple(result)
+
+
+class EstimatedCount(object):
+    """
+    Uses the query planner's row estimate when it is at least `threshold`,
+    and an exact count otherwise or when the database cannot estimate.
+
+    Only PostgreSQL estimates are supported out of the box; override
+    `estimate` for other backends.
+    """
+
+    def __init__(self, threshold=10000, strategy=None):
+        self.threshold = threshold
+        self.strategy = strategy or ExactCount()
+
+    def estimate(self, queryset):
+        """
+        Return the planner's estimate of the number of rows of `queryset`, or None.
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        cursor = connection.cursor()
+        try:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        if isinstance(plan, basestring):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def __call__(self, queryset):
+        estimate = self.estimate(queryset)
+        if estimate is not None and estimate >= self.threshold:
+            return estimate, True
+        return self.strategy(queryset)
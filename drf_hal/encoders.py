@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+JSON backends of `HALRenderer` and `HALParser`.
+
+A backend has a `dumps(value, indent=None, ensure_ascii=True)` method that
+returns JSON bytes, and a `loads(text)` method that decodes JSON text.
+Values that JSON has no type for are converted the way DRF's `JSONEncoder`
+does: lazy translation strings become text, dates and times ISO 8601
+strings, and Decimals strings.
+
+The standard library's backend is the default. `SimpleJSONBackend` is
+opt-in, as the `json_backend` of `HALRenderer` or `HALParser`.
+"""
+import json
+
+from rest_framework.compat import six
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+# Default backends, by encoder class.
+_default_backends = {}
+
+
+class HALJSONEncoder(JSONEncoder):
+    """
+    Encoder of HAL documents, the base class for custom `encoder_class`.
+    """
+
+
+def to_bytes(ret):
+    # json.dumps() returns bytestrings on python 2.x if ensure_ascii=True,
+    # and may or may not return unicode otherwise.
+    if isinstance(ret, six.text_type):
+        return bytes(ret.encode('utf-8'))
+    return ret
+
+
+class StdlibJSONBackend(object):
+    """
+    Encodes with the standard library's `json` and `encoder_class`.
+    """
+
+    def __init__(self, encoder_class=HALJSONEncoder):
+        self.encoder_class = encoder_class
+
+    def dumps(self, value, indent=None, ensure_ascii=True):
+        return to_bytes(json.dumps(value, cls=self.encoder_class, indent=indent, ensure_ascii=ensure_ascii))
+
+    def loads(self, text):
+        return json.loads(text)
+
+
+class SimpleJSONBackend(object):
+    """
+    Encodes with `simplejson`, and its C speedups if they are installed.
+
+    Other types go through the `default` method of `encoder_class`, so
+    Decimals are encoded as strings as with the standard library. Only that
+    method is used: encoder classes overriding `encode` or `iterencode` are
+    refused.
+    """
+
+    def __init__(self, encoder_class=HALJSONEncoder):
+        if simplejson is None:
+            raise ImportError('SimpleJSONBackend requires simplejson')
+        for name in ('encode', 'iterencode'):
+            if getattr(encoder_class, name).__func__ is not getattr(json.JSONEncoder, name).__func__:
+                raise ValueError('SimpleJSONBackend only uses the default method of %s, which overrides %s' % (
+                    encoder_class.__name__, name))
+        self.default = encoder_class().default
+
+    def dumps(self, value, indent=None, ensure_ascii=True):
+        # The separators of the standard library, which keeps the space after
+        # commas at the end of indented lines
+        separators = (', ', ': ') if indent is not None else None
+        return to_bytes(simplejson.dumps(value, default=self.default, indent=indent, separators=separators,
+                                         ensure_ascii=ensure_ascii, use_decimal=False, namedtuple_as_object=False))
+
+    def loads(self, text):
+        return simplejson.loads(text)
+
+
+def get_default_json_backend(encoder_class=HALJSONEncoder):
+    """
+    Return the standard library's backend for `encoder_class`.
+    """
+    backend = _default_backends.get(encoder_class)
+    if backend is None:
+        backend = _default_backends[encoder_class] = StdlibJSONBackend(encoder_class)
+    return backend
@@ -1,14 +1,50 @@
 # -*- coding: utf-8 -*-
+from functools import partial
 import warnings
 
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.urlresolvers import NoReverseMatch
-from rest_framework.fields import Field
+from django.db import models
+from django.db.models import Q
+from django.utils.encoding import force_text
+from rest_framework.compat import six
+from rest_framework.fields import Field, get_component, is_simple_callable
 from rest_framework import reverse
 from rest_framework.relations import HyperlinkedRelatedField
 
+from drf_hal import reverse as hal_reverse
+from drf_hal.hrefs import href_to_path, resolve_path
+from drf_hal.instrumentation import get_profile
+from drf_hal.lookups import compile_lookups, get_accessor
+from drf_hal.memo import get_memo
 
-class HALLinkField(Field):
+
+class LinkTemplateMixin(object):
+    """
+    Reverses URLs through the compiled link templates of `drf_hal.reverse`
+    when `link_templates` is enabled, and remembers them in the request's
+    `RenderMemo`.
+    """
+    link_templates = False
+
+    def reverse_url(self, view_name, kwargs, request, format=None):
+        memo = get_memo(getattr(self, 'context', None))
+        key = memo and memo.get_link_key(view_name, kwargs, request, format)
+        if key is not None:
+            href = memo.get_link(key)
+            if href is not None:
+                return href
+
+        if self.link_templates:
+            href = hal_reverse.reverse(view_name, kwargs=kwargs, request=request, format=format)
+        else:
+            href = reverse.reverse(view_name, kwargs=kwargs, request=request, format=format)
+        if key is not None:
+            memo.set_link(key, href)
+        return href
+
+
+class HALLinkField(LinkTemplateMixin, Field):
     many = False
 
     def __init__(self, *args, **kwargs):
@@ -20,6 +56,7 @@ class HALLinkField(Field):
 
         self.lookup_mapping = kwargs.pop('lookup_mapping')
         self.many = kwargs.pop('many', self.many)
+        self.link_templates = kwargs.pop('link_templates', self.link_templates)
         super(HALLinkField, self).__init__(*args, **kwargs)
 
     def field_to_native(self, obj, field_name):
@@ -27,10 +64,353 @@ class HALLinkField(Field):
         kwargs = {}
         for key, value in self.lookup_mapping.items():
             kwargs[key] = getattr(obj, value, None)
-        return reverse.reverse(self.view_name, kwargs=kwargs, request=request)
+        return self.reverse_url(self.view_name, kwargs, request)
+
+
+class BulkHyperlinkMixin(object):
+    """
+    Resolves incoming hrefs through the cached `drf_hal.hrefs` resolver, and
+    fetches the targets of a to-many field with one query per batch instead
+    of one `get()` per href. Validation errors are the same as one by one.
+
+    Set `bulk_lookup = False` on subclasses whose `get_object` is not a plain
+    filter on the kwargs returned by `get_filter_kwargs`.
+    """
+    bulk_lookup = True
+    bulk_batch_size = 500
+    _prefetched = None
+    _prefetched_ids = frozenset()
+
+    def get_filter_kwargs(self, view_kwargs):
+        """
+        Return the kwargs `get_object` filters the queryset with, or None.
+        """
+        return view_kwargs
+
+    def resolve_href(self, value):
+        try:
+            path = href_to_path(value)
+        except AttributeError:
+            msg = self.error_messages['incorrect_type']
+            raise ValidationError(msg % type(value).__name__)
+
+        match = resolve_path(path)
+        if match is None:
+            raise ValidationError(self.error_messages['no_match'])
+        if match.view_name != self.view_name:
+            raise ValidationError(self.error_messages['incorrect_match'])
+        return match
+
+    def get_prefetched(self, match):
+        if not self._prefetched:
+            return None
+        return self._prefetched.get((match.view_name, tuple(sorted(match.kwargs.items()))))
+
+    def prefetch_data(self, data, field_name):
+        """
+        Resolve the hrefs of `field_name` in all items of `data` and fetch
+        their targets at once, for the items to be restored one by one.
+        """
+        self._prefetched = None
+        if self.read_only or self.queryset is None:
+            return
+
+        matches = []
+        for item in data:
+            value = item.get(field_name) if isinstance(item, dict) else None
+            if value is None:
+                continue
+            for href in (value if self.many and isinstance(value, (list, tuple)) else [value]):
+                try:
+                    matches.append(self.resolve_href(href))
+                except ValidationError:
+                    continue
+
+        prefetched = {}
+        for match, obj in zip(matches, self.get_objects(matches)):
+            if obj is not None:
+                prefetched[(match.view_name, tuple(sorted(match.kwargs.items())))] = obj
+        self._prefetched = prefetched
+        self._prefetched_ids = set(id(obj) for obj in prefetched.values())
+
+    def clear_prefetched_data(self):
+        self._prefetched = None
+        self._prefetched_ids = set()
+
+    def is_prefetched(self, obj):
+        """
+        Return whether `obj` was fetched by `prefetch_data`, so is known to exist.
+        """
+        return bool(self._prefetched) and id(obj) in self._prefetched_ids
+
+    def from_native(self, value):
+        if self.queryset is None:
+            raise Exception('Writable related fields must include a `queryset` argument')
+
+        match = self.resolve_href(value)
+        obj = self.get_prefetched(match)
+        if obj is not None:
+            return obj
+        try:
+            return self.get_object(self.queryset, match.view_name, match.args, match.kwargs)
+        except (ObjectDoesNotExist, TypeError, ValueError):
+            raise ValidationError(self.error_messages['does_not_exist'])
+
+    def from_native_many(self, values):
+        """
+        Convert a list of hrefs -> list of model instances.
+        """
+        if self.queryset is None:
+            raise Exception('Writable related fields must include a `queryset` argument')
+
+        # Stop at the first href that does not resolve; the ones before it
+        # are still looked up so that errors come in the same order as when
+        # each href is converted on its own.
+        matches = []
+        error = None
+        for value in values:
+            try:
+                matches.append(self.resolve_href(value))
+            except ValidationError as err:
+                error = err
+                break
+
+        if self._prefetched:
+            objects = [self.get_prefetched(match) for match in matches]
+        else:
+            objects = self.get_objects(matches)
+
+        ret = []
+        for match, obj in zip(matches, objects):
+            if obj is None:
+                try:
+                    obj = self.get_object(self.queryset, match.view_name, match.args, match.kwargs)
+                except (ObjectDoesNotExist, TypeError, ValueError):
+                    raise ValidationError(self.error_messages['does_not_exist'])
+            ret.append(obj)
+        if error is not None:
+            raise error
+        return ret
+
+    def get_objects(self, matches):
+        """
+        Return the object of each match, or None where it has to be looked
+        up on its own.
+        """
+        lookups = []
+        groups = {}
+        for match in matches:
+            filter_kwargs = self.bulk_lookup and self.get_filter_kwargs(match.kwargs)
+            if not filter_kwargs:
+                lookups.append(None)
+                continue
+            names = tuple(sorted(filter_kwargs))
+            values = tuple(force_text(filter_kwargs[name]) for name in names)
+            lookups.append((names, values))
+            groups.setdefault(names, set()).add(values)
+
+        found = {}
+        for names, values in groups.items():
+            values = list(values)
+            batch_size = max(1, self.bulk_batch_size // len(names))
+            for start in xrange(0, len(values), batch_size):
+                batch = values[start:start + batch_size]
+                try:
+                    found.update(((names, key), obj) for key, obj in self.fetch_objects(names, batch))
+                except (TypeError, ValueError):
+                    # Malformed values; let them fail one by one.
+                    pass
+        return [found.get(lookup) if lookup is not None else None for lookup in lookups]
+
+    def fetch_objects(self, names, values):
+        """
+        Return `(values, obj)` pairs of the objects matching any of `values`,
+        a list of tuples of text values for the lookups `names`.
+        """
+        queryset = self.queryset.all()
+        if names == ('pk',):
+            objects = queryset.in_bulk([value[0] for value in values])
+            return [((force_text(pk),), obj) for pk, obj in objects.items()]
+
+        condition = Q()
+        for value in values:
+            condition |= Q(**dict(zip(names, value)))
+        rows = list(queryset.filter(condition).values_list('pk', *names))
+        objects = queryset.in_bulk([row[0] for row in rows])
+        return [(tuple(force_text(item) for item in row[1:]), objects[row[0]])
+                for row in rows if row[0] in objects]
+
+    def field_from_native(self, data, files, field_name, into):
+        """
+        Same as `RelatedField.field_from_native`, but to-many hrefs go
+        through `from_native_many`.
+        """
+        if self.read_only:
+            return
+
+        try:
+            if self.many:
+                try:
+                    # Form data
+                    value = data.getlist(field_name)
+                    if value == [''] or value == []:
+                        raise KeyError
+                except AttributeError:
+                    # Non-form data
+                    value = data[field_name]
+            else:
+                value = data[field_name]
+        except KeyError:
+            if self.partial:
+                return
+            value = [] if self.many else None
+
+        if value in (None, ''):
+            if self.required:
+                raise ValidationError(self.error_messages['required'])
+            into[(self.source or field_name)] = None
+        elif self.many:
+            into[(self.source or field_name)] = self.from_native_many(value)
+        else:
+            into[(self.source or field_name)] = self.from_native(value)
+
+
+class HALHyperlinkedRelatedField(BulkHyperlinkMixin, LinkTemplateMixin, HyperlinkedRelatedField):
+    """
+    HyperlinkedRelatedField that can use the compiled link templates.
+
+    With `many_links_from_values`, to-many links are built from a
+    `values_list` of the lookup field instead of related model instances.
+    """
+    many_links_from_values = False
+
+    def __init__(self, *args, **kwargs):
+        self.link_templates = kwargs.pop('link_templates', self.link_templates)
+        self.many_links_from_values = kwargs.pop('many_links_from_values', self.many_links_from_values)
+        self._values_lookups = {}
+        self._lookup_values = None
+        super(HALHyperlinkedRelatedField, self).__init__(*args, **kwargs)
+
+    def get_filter_kwargs(self, view_kwargs):
+        # Same precedence as `HyperlinkedRelatedField.get_object`.
+        lookup = view_kwargs.get(self.lookup_field, None)
+        pk = view_kwargs.get(self.pk_url_kwarg, None)
+        slug = view_kwargs.get(self.slug_url_kwarg, None)
+
+        if lookup is not None:
+            return {self.lookup_field: lookup}
+        elif pk is not None:
+            return {'pk': pk}
+        elif slug is not None:
+            return {self.slug_field: slug}
+        return None
+
+    def get_values_lookup(self, model, field_name):
+        """
+        Return `(query_name, related_model)` of the to-many relation whose
+        lookup values the links are built from, or None.
+        """
+        if not self.many or not self.many_links_from_values or not isinstance(self.lookup_field, basestring):
+            return None
+        try:
+            return self._values_lookups[(model, field_name)]
+        except KeyError:
+            pass
+
+        source = self.source or field_name
+        opts = model._meta.concrete_model._meta
+        values_lookup = None
+        try:
+            model_field = opts.get_field(source)
+            if isinstance(model_field, models.ManyToManyField):
+                values_lookup = (source, model_field.rel.to)
+        except models.FieldDoesNotExist:
+            for relation in opts.get_all_related_objects() + opts.get_all_related_many_to_many_objects():
+                if relation.get_accessor_name() == source:
+                    values_lookup = (relation.field.related_query_name(), relation.model)
+        self._values_lookups[(model, field_name)] = values_lookup
+        return values_lookup
+
+    def prefetch_objects(self, objects, field_name):
+        """
+        Fetch the lookup values of the links of all `objects` in one query.
+        """
+        self._lookup_values = None
+        if not objects:
+            return
+        model = objects[0].__class__
+        values_lookup = self.get_values_lookup(model, field_name)
+        if values_lookup is None:
+            return
+
+        query_name, related_model = values_lookup
+        path = '%s__%s' % (query_name, self.lookup_field)
+        pks = [obj.pk for obj in objects if obj.pk is not None]
+        queryset = model._meta.concrete_model._default_manager.filter(pk__in=pks)
+        ordering = ['%s%s__%s' % ('-' if name.startswith('-') else '', query_name, name.lstrip('-'))
+                    for name in related_model._meta.ordering]
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        lookup_values = dict((pk, []) for pk in pks)
+        for pk, value in queryset.values_list('pk', path):
+            if value is not None:
+                lookup_values[pk].append(value)
+        self._lookup_values = lookup_values
+
+    def clear_prefetched_objects(self):
+        self._lookup_values = None
+
+    def get_lookup_values(self, obj, field_name):
+        if self._lookup_values is not None and obj.pk in self._lookup_values:
+            return self._lookup_values[obj.pk]
+        if obj.pk is None:
+            return []
+        manager = getattr(obj, self.source or field_name)
+        return manager.values_list(self.lookup_field, flat=True)
+
+    def get_local_column(self, model, field_name):
+        """
+        Return the name of the foreign key column of `model` the link can be
+        built from without loading the related object, or None.
+        """
+        source = self.source or field_name
+        if self.many or not isinstance(self.lookup_field, basestring) or source == '*' or '.' in source:
+            return None
+        return get_accessor('%s__%s' % (source, self.lookup_field)).get_column(model)
+
+    def field_to_native(self, obj, field_name):
+        if obj is not None and self.get_values_lookup(obj.__class__, field_name) is not None:
+            request = self.context.get('request', None)
+            format = self.format or self.context.get('format', None)
+            try:
+                return [self.reverse_url(self.view_name, {self.lookup_field: value}, request, format)
+                        for value in self.get_lookup_values(obj, field_name)]
+            except NoReverseMatch:
+                pass
+        if obj is not None and self.get_local_column(obj.__class__, field_name) is not None:
+            accessor = get_accessor('%s__%s' % (self.source or field_name, self.lookup_field))
+            value = accessor(obj)
+            if value is None:
+                return None
+            request = self.context.get('request', None)
+            format = self.format or self.context.get('format', None)
+            try:
+                return self.reverse_url(self.view_name, {self.lookup_field: value}, request, format)
+            except NoReverseMatch:
+                pass
+        return super(HALHyperlinkedRelatedField, self).field_to_native(obj, field_name)
+
+    def get_url(self, obj, view_name, request, format):
+        kwargs = {self.lookup_field: getattr(obj, self.lookup_field)}
+        try:
+            return self.reverse_url(view_name, kwargs, request, format)
+        except NoReverseMatch:
+            pass
+        return super(HALHyperlinkedRelatedField, self).get_url(obj, view_name, request, format)
 
 
-class HALRelatedLinkField(HyperlinkedRelatedField):
+class HALRelatedLinkField(BulkHyperlinkMixin, LinkTemplateMixin, HyperlinkedRelatedField):
     many = False
 
     def __init__(self, *args, **kwargs):
@@ -41,22 +421,16 @@ class HALRelatedLinkField(HyperlinkedRelatedField):
             raise ValueError(msg)
 
         self.lookup_field = kwargs.pop('lookup_field')
+        self.lookup_accessors = compile_lookups(self.lookup_field) if self.lookup_field else []
         self.many = kwargs.pop('many', self.many)
         self.format = kwargs.pop('format', None)
+        self.link_templates = kwargs.pop('link_templates', self.link_templates)
         super(HyperlinkedRelatedField, self).__init__(*args, **kwargs)
 
     def _get_kwargs(self, obj):
         kwargs = {}
-        if self.lookup_field:
-            for lookup_field in self.lookup_field:
-                split_lookup_field = lookup_field.split('__')
-                if len(split_lookup_field) > 1:
-                    value = obj
-                    for field in split_lookup_field:
-                        value = getattr(value, field, None)
-                    kwargs[lookup_field] = value
-                else:
-                    kwargs[lookup_field] = getattr(obj, lookup_field, None)
+        for lookup_field, accessor in self.lookup_accessors:
+            kwargs[lookup_field] = accessor(obj)
         return kwargs
 
     def get_url(self, obj, view_name, request, format):
@@ -68,7 +442,7 @@ class HALRelatedLinkField(HyperlinkedRelatedField):
         """
         kwargs = self._get_kwargs(obj)
         try:
-            return reverse.reverse(view_name, kwargs=kwargs, request=request, format=format)
+            return self.reverse_url(view_name, kwargs, request, format)
         except NoReverseMatch:
             pass
 
@@ -84,7 +458,7 @@ class HALRelatedLinkField(HyperlinkedRelatedField):
         return queryset.get(**view_kwargs)
 
 
-class HALLinksField(Field):
+class HALLinksField(LinkTemplateMixin, Field):
     """
     Represents the instance, or a property on the instance, using hyperlinking.
     """
@@ -100,10 +474,13 @@ class HALLinksField(Field):
 
         self.additional_links = kwargs.pop('additional_links', {})
         self.exclude = kwargs.pop('exclude', ())
+        self._link_fields = None
 
         self.format = kwargs.pop('format', None)
         lookup_field = kwargs.pop('lookup_field', None)
         self.lookup_field = lookup_field or self.lookup_field
+        self.lookup_accessors = compile_lookups(self.lookup_field)
+        self.link_templates = kwargs.pop('link_templates', self.link_templates)
 
         super(HALLinksField, self).__init__(*args, **kwargs)
 
@@ -143,31 +520,37 @@ class HALLinksField(Field):
             raise Exception(msg % view_name)
 
         ret = {
-            'self': {
-                'href': self_link
-            }
+            'self': {'href': self_link}
         }
-        for key, field in self.additional_links.items():
-            field.initialize(parent=self, field_name=key)
-            if field.many:
-                links = field.field_to_native(obj, key)
-                ret[key] = [{'href': link} for link in links]
+        profile = get_profile(self.context)
+        for key, field, many, profile_name in self.get_link_fields():
+            if profile is None:
+                value = field.field_to_native(obj, key)
+            else:
+                value = profile.record(profile_name, field.field_to_native, obj, key)
+            if many:
+                ret[key] = [{'href': link} for link in value]
             else:
-                ret[key] = {
-                    'href': field.field_to_native(obj, key)
-                }
+                ret[key] = {'href': value}
         return ret
 
-    def __get_lookup_value(self, obj, lookup_field):
-        split_lookup_field = lookup_field.split('__')
-        if len(split_lookup_field) > 1:
-            value = obj
-            for field in split_lookup_field:
-                value = getattr(value, field, None)
-            lookup = value
-        else:
-            lookup = getattr(obj, lookup_field, None)
-        return lookup
+    def initialize(self, parent, field_name):
+        if self._link_fields is not None and self.parent is parent and self.root is (parent.root or parent):
+            return
+        super(HALLinksField, self).initialize(parent, field_name)
+        self._link_fields = None
+
+    def get_link_fields(self):
+        """
+        Return `(key, field, many, profile name)` for each additional link,
+        with the fields initialized, once per initialization.
+        """
+        if self._link_fields is None:
+            name = '%s._links.%%s' % self.parent.__class__.__name__
+            for key, field in self.additional_links.items():
+                field.initialize(parent=self, field_name=key)
+            self._link_fields = [(key, field, field.many, name % key) for key, field in self.additional_links.items()]
+        return self._link_fields
 
     def get_url(self, obj, view_name, request, format):
         """
@@ -176,22 +559,16 @@ class HALLinksField(Field):
         May raise a `NoReverseMatch` if the `view_name` and `lookup_field`
         attributes are not configured to correctly match the URL conf.
         """
-        if isinstance(self.lookup_field, tuple):
-            lookup_fields = self.lookup_field
-            kwargs = {}
-            for lookup_field in lookup_fields:
-                split_lookup_field = lookup_field.split('__')
-                kwargs[lookup_field] = self.__get_lookup_value(obj, lookup_field)
-        else:
-            lookup_field = self.__get_lookup_value(obj, self.lookup_field)
-            kwargs = {self.lookup_field: lookup_field}
-
-        # Handle unsaved object case
-        if lookup_field is None:
-            return None
+        kwargs = {}
+        for lookup_field, accessor in self.lookup_accessors:
+            value = accessor(obj)
+            # Handle unsaved object case
+            if value is None:
+                return None
+            kwargs[lookup_field] = value
 
         try:
-            return reverse.reverse(view_name, kwargs=kwargs, request=request, format=format)
+            return self.reverse_url(view_name, kwargs, request, format)
         except NoReverseMatch:
             pass
 
@@ -203,29 +580,143 @@ class HALEmbeddedFieldValidationError(ValidationError):
         self.error_dict = error_dict
 
 
+class EmbedFallback(object):
+    """
+    Returned for an embedded relation cut by the embed limits of the
+    serializer: `native` is what is still embedded, if anything, `links`
+    the `_links` entry the relation is also emitted as, and `count` the
+    number of related objects of a truncated to-many relation.
+    """
+    __slots__ = ('native', 'links', 'count')
+
+    def __init__(self, native=None, links=None, count=None):
+        self.native = native
+        self.links = links
+        self.count = count
+
+
 class HALEmbeddedField(Field):
+    """
+    The `_embedded` object of a HAL serializer.
+
+    The embedded fields are initialized once per parent serializer. When the
+    parent serializes a list, embedded lists of HAL serializers are
+    serialized for all the objects of the list in one `serialize_many` call
+    (see `prefetch_objects`).
+    """
 
     def __init__(self, *args, **kwargs):
         self.embedded_fields = kwargs.pop('embedded_fields', {})
+        self._getters = None
+        self._batches = {}
 
         super(HALEmbeddedField, self).__init__(*args, **kwargs)
 
     def initialize(self, parent, field_name):
-        [field.initialize(parent, name) for name, field in self.embedded_fields.items()]
-        return super(HALEmbeddedField, self).initialize(parent, field_name)
+        if self._getters is not None and self.parent is parent and self.root is (parent.root or parent):
+            return
+        super(HALEmbeddedField, self).initialize(parent, field_name)
+        for name, field in self.embedded_fields.items():
+            field.initialize(parent, name)
+        # Lets the serializer apply its embed limits
+        embed_field_to_native = getattr(parent, 'embed_field_to_native', None)
+        if embed_field_to_native is not None:
+            self._getters = [(key, partial(embed_field_to_native, field))
+                             for key, field in self.embedded_fields.items()]
+        else:
+            self._getters = [(key, field.field_to_native) for key, field in self.embedded_fields.items()]
 
     def field_to_native(self, obj, field_name):
         ret = {}
-        [ret.update({key: field.field_to_native(obj, key)}) for key, field in self.embedded_fields.items()]
+        batches = self._batches
+        profile = get_profile(self.context)
+        name = '%s._embedded.%%s' % self.parent.__class__.__name__
+        for key, getter in self._getters:
+            if batches:
+                batch = batches.get(key)
+                if batch is not None and id(obj) in batch:
+                    ret[key] = batch.pop(id(obj))
+                    continue
+            if profile is None:
+                ret[key] = getter(obj, key)
+            else:
+                ret[key] = profile.record(name % key, getter, obj, key)
         return ret
 
+    def prefetch_objects(self, objects, field_name):
+        """
+        Serialize the embedded lists of HAL serializers of all `objects` at
+        once, for `field_to_native` to hand out object by object.
+        """
+        self._batches = {}
+        if len(objects) < 2:
+            return
+        get_embed_limits = getattr(self.parent, 'get_embed_limits', None)
+        if get_embed_limits is not None and get_embed_limits() is not None:
+            # Limited relations are truncated per object
+            return
+        profile = get_profile(self.context)
+        name = '%s._embedded.%%s' % self.parent.__class__.__name__
+        for key, field in self.embedded_fields.items():
+            if getattr(field, 'serialize_many', None) is None or getattr(field, 'write_only', False) or \
+                    field.source == '*':
+                continue
+            values = self.get_related_lists(objects, field, key)
+            if values is None:
+                continue
+            related = [item for items in values if items is not None for item in items]
+            if profile is None:
+                natives = field.serialize_many(related)
+            else:
+                natives = profile.record(name % key, field.serialize_many, related)
+            batch = self._batches[key] = {}
+            start = 0
+            for obj, items in zip(objects, values):
+                if items is None:
+                    batch[id(obj)] = None
+                else:
+                    batch[id(obj)] = natives[start:start + len(items)]
+                    start += len(items)
+
+    def clear_prefetched_objects(self):
+        self._batches = {}
+
+    def get_related_lists(self, objects, field, field_name):
+        """
+        Return the list of related objects of each of `objects`, None where
+        the relation is None, or None if the field does not embed a list.
+        """
+        source = (field.source or field_name).split('.')
+        values = []
+        for obj in objects:
+            value = obj
+            try:
+                for component in source:
+                    if value is None:
+                        break
+                    value = get_component(value, component)
+            except ObjectDoesNotExist:
+                value = None
+            if is_simple_callable(getattr(value, 'all', None)):
+                value = list(value.all())
+            elif value is not None:
+                if not field.many or isinstance(value, (dict, six.text_type)) or not hasattr(value, '__iter__'):
+                    return None
+                value = list(value)
+            values.append(value)
+        return values
+
     def field_from_native(self, data, files, field_name, into):
-        embedded_data = data.get(field_name, {})
-        error_dict = {}
+        embedded_data = getattr(data, 'embedded', None)
+        if embedded_data is None:
+            embedded_data = data.get(field_name, {})
+        error_dict = None
         for key, field in self.embedded_fields.items():
             try:
                 field.field_from_native(embedded_data, files, key, into)
             except ValidationError as err:
+                if error_dict is None:
+                    error_dict = {}
                 error_dict[key] = err
         if error_dict:
             raise HALEmbeddedFieldValidationError(error_dict)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Sparse fieldsets and on-demand embedding.
+
+Clients pick the fields of a resource with `?fields=id,question`, leave some
+out with `?exclude=votes` and embed related resources instead of linking
+them with `?embed=poll,poll.choices`.  The parsed `FieldSelection` prunes the
+field layout of a `HALModelSerializer`, so that left out fields, links and
+embedded resources are never computed, and restricts the queryset to the
+columns and joins the selected fields read.
+"""
+
+# Containers that are always serialized; their entries are selected instead.
+ALWAYS_INCLUDED = frozenset(('_links', '_embedded'))
+
+
+def split_names(value):
+    """
+    Split a comma separated query parameter value into names.
+    """
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class FieldSelection(object):
+    """
+    The fields of a resource that a client asked for.
+
+    `fields` is None to keep every field, `embed` maps the names of the
+    relations to embed to the `FieldSelection` of the embedded resources,
+    or to None to embed them whole.
+    """
+
+    def __init__(self, fields=None, exclude=(), embed=None):
+        self.fields = frozenset(fields) if fields is not None else None
+        self.exclude = frozenset(exclude)
+        self.embed = dict(embed or {})
+
+    @classmethod
+    def parse(cls, fields=None, exclude=None, embed=None, max_embed_levels=None):
+        """
+        Build a selection from query parameter values, or return None when
+        none is given. Embedded paths are dotted, e.g. `poll.choices`, and
+        cut after `max_embed_levels` names.
+        """
+        fields, exclude, embed = split_names(fields), split_names(exclude), split_names(embed)
+        if not (fields or exclude or embed):
+            return None
+
+        tree = {}
+        for path in embed:
+            node = tree
+            for name in path.split('.')[:max_embed_levels]:
+                node = node.setdefault(name, {})
+        return cls(fields or None, exclude, cls.from_tree(tree))
+
+    @classmethod
+    def from_tree(cls, tree):
+        return dict((name, cls(embed=cls.from_tree(children)) if children else None)
+                    for name, children in tree.items())
+
+    def includes(self, name):
+        """
+        Return whether the field, link or embedded resource `name` is selected.
+        Relations to embed are selected implicitly.
+        """
+        if name in self.exclude:
+            return False
+        return self.fields is None or name in ALWAYS_INCLUDED or name in self.fields or name in self.embed
+
+    def get_embedded(self):
+        """
+        Return `(name, selection)` of the relations to embed.
+        """
+        return [(name, selection) for name, selection in sorted(self.embed.items()) if name not in self.exclude]
+
+    @property
+    def key(self):
+        """
+        A hashable value identifying the selection, e.g. to cache plans by.
+        """
+        return (tuple(sorted(self.fields)) if self.fields is not None else None,
+                tuple(sorted(self.exclude)),
+                tuple((name, selection and selection.key) for name, selection in sorted(self.embed.items())))
+
+    def __eq__(self, other):
+        return isinstance(other, FieldSelection) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return 'FieldSelection(fields=%r, exclude=%r, embed=%r)' % (
+            sorted(self.fields) if self.fields is not None else None, sorted(self.exclude), self.embed)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Resolution of incoming hrefs.
+
+Writes that link to other resources send their hrefs, which are turned back
+into view kwargs with Django's URL resolver.  Paths repeat a lot (the same
+partner linked from many channels, the same poll from every choice), so the
+matches are kept in a bounded LRU.
+"""
+from collections import OrderedDict
+import threading
+import urlparse
+
+from django.core.urlresolvers import Resolver404, get_script_prefix, get_urlconf, resolve
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+
+MAX_RESOLVED_PATHS = 1024
+
+_resolved_paths = OrderedDict()
+_resolved_paths_lock = threading.Lock()
+
+
+def href_to_path(href):
+    """
+    Return the path of `href` relative to the script prefix.
+
+    Raises `AttributeError` if `href` is not a string.
+    """
+    if href.startswith(('http:', 'https:')):
+        # If needed convert absolute URLs to relative path
+        href = urlparse.urlparse(href).path
+        prefix = get_script_prefix()
+        if href.startswith(prefix):
+            href = '/' + href[len(prefix):]
+    return href
+
+
+def resolve_path(path):
+    """
+    Return the `ResolverMatch` of `path`, or None if it does not resolve.
+    """
+    key = (get_urlconf(), path)
+    with _resolved_paths_lock:
+        # Moved to the end as the most recently used
+        try:
+            match = _resolved_paths.pop(key)
+        except KeyError:
+            pass
+        else:
+            _resolved_paths[key] = match
+            return match
+
+    try:
+        match = resolve(path)
+    except Resolver404:
+        match = None
+    except Exception:
+        # Same as DRF, anything that does not resolve cleanly is no match.
+        return None
+    with _resolved_paths_lock:
+        while len(_resolved_paths) >= MAX_RESOLVED_PATHS:
+            _resolved_paths.popitem(last=False)
+        _resolved_paths[key] = match
+    return match
+
+
+def clear_resolved_paths():
+    with _resolved_paths_lock:
+        _resolved_paths.clear()
+
+
+@receiver(setting_changed)
+def root_urlconf_changed(**kwargs):
+    if kwargs['setting'] == 'ROOT_URLCONF':
+        clear_resolved_paths()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Per-field serialization cost.
+
+While a `Profile` is in the serializer context (`hal_profile`) or on the
+request (see `ProfiledViewMixin`), `HALModelSerializer`, `HALLinksField`,
+`HALEmbeddedField` and the pagination serializers record the wall time,
+number of calls and number of SQL queries of each field, under names like
+`PollSerializer.question`, `ChoiceSerializer._links.poll`,
+`PollSerializer._embedded.choices` or `pagination.total`.
+
+Times and queries are inclusive: `PollSerializer._embedded` also counts the
+fields of the embedded choices. Without a profile nothing is recorded.
+"""
+from time import time
+
+from django.db import connections
+from django.dispatch import Signal
+
+
+# Sent by `ProfiledViewMixin` with the `profile` of each request.
+serialization_profiled = Signal(providing_args=['request', 'profile'])
+
+
+class FieldStats(object):
+    __slots__ = ('calls', 'seconds', 'queries')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.queries = 0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'ms': round(self.seconds * 1000, 3), 'queries': self.queries}
+
+
+class Profile(object):
+    """
+    Wall time, calls and SQL queries, by name.
+
+    Queries are counted from the query log of the connections, which
+    `enable_query_log` turns on until `disable_query_log`.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self._debug_cursors = None
+
+    def enable_query_log(self):
+        self._debug_cursors = [(connection, connection.use_debug_cursor) for connection in connections.all()]
+        for connection, use_debug_cursor in self._debug_cursors:
+            connection.use_debug_cursor = True
+
+    def disable_query_log(self):
+        for connection, use_debug_cursor in self._debug_cursors or ():
+            connection.use_debug_cursor = use_debug_cursor
+        self._debug_cursors = None
+
+    def count_queries(self):
+        return sum(len(connection.queries) for connection in connections.all())
+
+    def start(self):
+        """
+        Return a token to pass to `stop`.
+        """
+        return time(), self.count_queries()
+
+    def stop(self, name, token):
+        """
+        Record a call of `name` that started at `token`.
+        """
+        started, queries = token
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = FieldStats()
+        stats.calls += 1
+        stats.seconds += time() - started
+        stats.queries += self.count_queries() - queries
+
+    def record(self, name, function, *args):
+        """
+        Call `function(*args)` and record it as a call of `name`.
+        """
+        token = self.start()
+        try:
+            return function(*args)
+        finally:
+            self.stop(name, token)
+
+    def get_slowest(self, count=None):
+        """
+        Return `(name, stats)` by decreasing time.
+        """
+        items = sorted(self.stats.items(), key=lambda item: item[1].seconds, reverse=True)
+        return items[:count] if count is not None else items
+
+    def as_dict(self):
+        return dict((name, stats.as_dict()) for name, stats in self.stats.items())
+
+    def as_server_timing(self, count=None):
+        """
+        Return the slowest entries as a `Server-Timing` header value.
+        """
+        return ', '.join('%s;dur=%.3f;desc="%s calls, %s queries"' % (
+            name, stats.seconds * 1000, stats.calls, stats.queries) for name, stats in self.get_slowest(count))
+
+
+def get_profile(context):
+    """
+    Return the `Profile` of the serializer context, or None.
+    """
+    if not context:
+        return None
+    profile = context.get('hal_profile')
+    if profile is not None:
+        return profile
+    request = context.get('request')
+    profile = getattr(request, '_hal_profile', None)
+    if isinstance(profile, Profile):
+        return profile
+    return None
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from operator import attrgetter
+
+from django.db import models
+
+
+_accessors = {}
+
+
+class LookupAccessor(object):
+    """
+    Reads a `lookup_field` such as `'pk'` or `'poll__pk'` off an object.
+
+    The path is parsed once; the getter is compiled per object class into an
+    `attrgetter`. A trailing `<foreign key>__<target field>` is read from the
+    local column (e.g. `poll__pk` reads `poll_id`), so the related object is
+    not loaded. Missing attributes give None, like `getattr(obj, name, None)`.
+    """
+
+    def __init__(self, lookup_field):
+        self.lookup_field = lookup_field
+        self.path = tuple(lookup_field.split('__'))
+        self._getters = {}
+        self._columns = {}
+
+    def __call__(self, obj):
+        try:
+            getter = self._getters[obj.__class__]
+        except KeyError:
+            getter = self._getters[obj.__class__] = self.compile(obj.__class__)
+        try:
+            return getter(obj)
+        except AttributeError:
+            return None
+
+    def compile(self, cls):
+        path = list(self.path)
+        column = self.get_column(cls)
+        if column is not None and len(path) > 1:
+            path = path[:-2] + [column]
+        return attrgetter('.'.join(path))
+
+    def get_column(self, cls):
+        """
+        Return the attribute name of the local column holding the value of the
+        last two steps of the path when they are a foreign key and its target
+        field, else None.
+        """
+        try:
+            return self._columns[cls]
+        except KeyError:
+            column = self._columns[cls] = self._get_column(cls)
+            return column
+
+    def _get_column(self, cls):
+        if len(self.path) < 2 or not hasattr(cls, '_meta'):
+            return None
+        try:
+            model = cls
+            for name in self.path[:-2]:
+                field = model._meta.get_field(name)
+                if not isinstance(field, models.ForeignKey):
+                    return None
+                model = field.rel.to
+            field = model._meta.get_field(self.path[-2])
+            if not isinstance(field, models.ForeignKey):
+                return None
+            target = field.rel.get_related_field()
+        except (models.FieldDoesNotExist, AttributeError):
+            return None
+
+        if self.path[-1] == target.name or (self.path[-1] == 'pk' and target.primary_key):
+            return field.attname
+        return None
+
+
+def get_accessor(lookup_field):
+    """
+    Return the shared `LookupAccessor` for `lookup_field`.
+    """
+    try:
+        return _accessors[lookup_field]
+    except KeyError:
+        accessor = _accessors[lookup_field] = LookupAccessor(lookup_field)
+        return accessor
+
+
+def compile_lookups(lookup_field):
+    """
+    Return `(lookup_field, accessor)` pairs for a single lookup field or a tuple of them.
+    """
+    if isinstance(lookup_field, (list, tuple)):
+        return [(name, get_accessor(name)) for name in lookup_field]
+    return [(lookup_field, get_accessor(lookup_field))]
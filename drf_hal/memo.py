@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Request-scoped memo of rendered links and embedded objects.
+
+A page of choices of the same poll reverses the same `poll-detail` href and
+serializes the same embedded poll once per row.  The memo is kept on the
+request of the serializer context, so every serializer and field rendering
+that request shares it, and repeated links are reversed once.
+Pass `hal_memo` in the context to share a memo explicitly, or `None` to
+disable it.
+
+Embedded objects are only memoized for serializers with the
+`memoize_embedded` Meta option. Every row embedding the object then shares
+the same native dict, which must not be changed afterwards, e.g. by
+`transform_<field>` methods of the embedding serializer.
+"""
+_missing = object()
+
+
+class RenderMemo(object):
+    """
+    Bounded caches of `(view_name, lookup kwargs, format) -> href` and
+    `(serializer class, pk) -> native dict`. Once a cache holds its maximum
+    number of entries, further entries are not remembered.
+    """
+    max_links = 10000
+    max_objects = 1000
+
+    def __init__(self, max_links=None, max_objects=None):
+        self.max_links = max_links or self.max_links
+        self.max_objects = max_objects or self.max_objects
+        self.links = {}
+        self.objects = {}
+
+    def get_link_key(self, view_name, kwargs, request, format):
+        try:
+            key = (view_name, tuple(sorted(kwargs.items())), format, request is not None)
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get_link(self, key):
+        return self.links.get(key)
+
+    def set_link(self, key, href):
+        if len(self.links) < self.max_links:
+            self.links[key] = href
+
+    def get_object(self, key):
+        return self.objects.get(key)
+
+    def set_object(self, key, native):
+        if len(self.objects) < self.max_objects:
+            self.objects[key] = native
+
+
+def get_memo(context):
+    """
+    Return the `RenderMemo` of the serializer context, or None.
+    """
+    if not context:
+        return None
+    memo = context.get('hal_memo', _missing)
+    if memo is not _missing:
+        return memo
+    request = context.get('request')
+    if request is None:
+        return None
+    memo = getattr(request, '_hal_memo', None)
+    if not isinstance(memo, RenderMemo):
+        memo = request._hal_memo = RenderMemo()
+    return memo
@@ -1,10 +1,28 @@
 # -*- coding: utf-8 -*-
-import urlparse
+import calendar
+import hashlib
+from itertools import islice
 
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured, ValidationError, ObjectDoesNotExist
-from django.core.urlresolvers import get_script_prefix, resolve
+from django.core.paginator import InvalidPage
+from django.db.models import Count, Max, Sum
+from django.db.models.query import QuerySet, prefetch_related_objects
+from django.http import Http404, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from drf_hal.concurrency import prefetch_concurrently
+from drf_hal.fieldsets import FieldSelection
+from drf_hal.hrefs import href_to_path, resolve_path
+from drf_hal.instrumentation import Profile, serialization_profiled
+from drf_hal.pagination import CursorPaginator, HALCursorPaginationSerializer
+from drf_hal.parallel import iter_parallel_chunks
 
 
 class MultipleLookupFieldsMixin(object):
@@ -42,6 +60,444 @@ class MultipleLookupFieldsMixin(object):
         return obj
 
 
+class OptimizedQuerysetMixin(object):
+    """
+    Lets the serializer class of a generic view add the joins, prefetches
+    and column restrictions it needs to the view's queryset, for the fields
+    selected with `SparseFieldsetMixin` if the view uses it.
+    """
+
+    def get_queryset(self):
+        queryset = super(OptimizedQuerysetMixin, self).get_queryset()
+        optimize_queryset = getattr(self.get_serializer_class(), 'optimize_queryset', None)
+        if optimize_queryset is None:
+            return queryset
+        get_field_selection = getattr(self, 'get_field_selection', None)
+        selection = get_field_selection() if get_field_selection is not None else None
+        if selection is None:
+            return optimize_queryset(queryset)
+        return optimize_queryset(queryset, selection)
+
+
+class ConcurrentPrefetchMixin(object):
+    """
+    Prefetches the relations of the objects of read requests concurrently
+    (see `drf_hal.concurrency`). Put it before `OptimizedQuerysetMixin`, which
+    adds the prefetches the serializer needs.
+    """
+    prefetch_workers = 4
+
+    def get_queryset(self):
+        queryset = super(ConcurrentPrefetchMixin, self).get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return prefetch_concurrently(queryset, self.prefetch_workers)
+
+
+class SparseFieldsetMixin(object):
+    """
+    Lets clients of read requests pick the fields of the response with
+    `?fields=id,question`, leave some out with `?exclude=votes` and embed
+    related resources with `?embed=poll,poll.choices` (see `drf_hal.fieldsets`).
+
+    Only the relations in the `embeddable` option of the serializers can be
+    embedded, at most `max_embed_levels` deep.
+    """
+    fields_query_param = 'fields'
+    exclude_query_param = 'exclude'
+    embed_query_param = 'embed'
+    max_embed_levels = 3
+
+    def get_field_selection(self):
+        """
+        Return the `FieldSelection` of the request, or None.
+        """
+        if self.request.method not in SAFE_METHODS:
+            return None
+        try:
+            return self._field_selection
+        except AttributeError:
+            pass
+        query_params = self.request.QUERY_PARAMS
+        self._field_selection = FieldSelection.parse(query_params.get(self.fields_query_param),
+                                                     query_params.get(self.exclude_query_param),
+                                                     query_params.get(self.embed_query_param),
+                                                     self.max_embed_levels)
+        return self._field_selection
+
+    def get_serializer_context(self):
+        context = super(SparseFieldsetMixin, self).get_serializer_context()
+        selection = self.get_field_selection()
+        if selection is not None:
+            context['hal_fields'] = selection
+        return context
+
+
+class CursorPaginationMixin(object):
+    """
+    List view mixin that paginates with opaque `cursor` links instead of page
+    numbers (see `CursorPaginator`). `cursor_ordering` must name a unique,
+    indexed column, optionally prefixed with '-'.
+    """
+    cursor_query_param = 'cursor'
+    cursor_ordering = 'pk'
+    pagination_serializer_class = HALCursorPaginationSerializer
+
+    def paginate_queryset(self, queryset, page_size=None):
+        page_size = page_size or self.get_paginate_by()
+        if not page_size:
+            return None
+
+        paginator = CursorPaginator(queryset, page_size, ordering=self.cursor_ordering,
+                                    cursor_query_param=self.cursor_query_param)
+        try:
+            return paginator.page(self.request.QUERY_PARAMS.get(self.cursor_query_param))
+        except InvalidPage as exc:
+            raise Http404(_("Invalid cursor: %(message)s") % {'message': unicode(exc)})
+
+
+class BulkWriteMixin(object):
+    """
+    List view mixin that creates (POST) or updates (PUT/PATCH) a whole
+    collection in one request.
+
+    The body is a HAL collection, with the items in `_embedded` under the
+    plural verbose name of the model, or a plain list of items. Items to
+    update are identified by their `_links.self.href`, and all of them are
+    fetched in one query. Everything is saved in one transaction (see
+    `HALModelSerializer.save_objects`) and the response is a HAL collection
+    of the saved items.
+
+    Objects inserted with the `bulk_create` option of the serializer get
+    their primary key back from `HALModelSerializer.bulk_insert` when it is
+    an `AutoField`; those left without one are not passed to `post_save` and
+    have no self link in the response.
+    """
+
+    def get_bulk_items(self, data):
+        """
+        Return the list of items of a collection body, or None.
+        """
+        if isinstance(data, list):
+            return data
+        embedded = data.get('_embedded') if isinstance(data, dict) else None
+        if isinstance(embedded, dict):
+            items = embedded.get(unicode(self.model._meta.verbose_name_plural))
+            if isinstance(items, list):
+                return items
+        return None
+
+    def create(self, request, *args, **kwargs):
+        items = self.get_bulk_items(request.DATA)
+        if items is None:
+            return super(BulkWriteMixin, self).create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=items, many=True)
+        return self.bulk_save(serializer, created=True)
+
+    def bulk_update(self, request, partial=False):
+        items = self.get_bulk_items(request.DATA)
+        if items is None:
+            return Response({'non_field_errors': ['Expected a list of items.']}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+        objects = self.get_serializer().get_identity_objects(items, queryset)
+        serializer = self.get_serializer(objects, data=items, many=True, partial=partial)
+        return self.bulk_save(serializer, created=False)
+
+    def put(self, request, *args, **kwargs):
+        return self.bulk_update(request)
+
+    def patch(self, request, *args, **kwargs):
+        return self.bulk_update(request, partial=True)
+
+    def bulk_save(self, serializer, created):
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        for obj in serializer.object:
+            self.pre_save(obj)
+        self.object = serializer.save()
+        for obj in self.object:
+            if obj.pk is not None:
+                self.post_save(obj, created=created)
+
+        data = {
+            '_links': {'self': {'href': self.request.build_absolute_uri()}},
+            'count': len(self.object),
+            '_embedded': {unicode(self.model._meta.verbose_name_plural): serializer.data},
+        }
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class StreamingListMixin(object):
+    """
+    List view mixin that streams the HAL collection when the accepted
+    renderer supports it (see `HALRenderer.render_stream`).
+
+    `_links` and the pagination counts are rendered first, then the items of
+    `_embedded` are read and serialized `stream_chunk_size` objects at a time.
+    Unpaginated collections end with the `count` of items streamed.
+
+    With `parallel_serialization` set to 'processes' or 'threads', the
+    objects of unpaginated collections are serialized by a pool of
+    `parallel_workers` (see `drf_hal.parallel`) when the queryset is ordered
+    by pk, or not ordered, and streamed in order of pk.
+    """
+    stream_chunk_size = 100
+    parallel_serialization = None
+    parallel_workers = None
+
+    def list(self, request, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if not hasattr(renderer, 'render_stream'):
+            return super(StreamingListMixin, self).list(request, *args, **kwargs)
+
+        self.object_list = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(self.object_list)
+        trailer = None
+        if page is not None:
+            pagination_serializer = self.get_pagination_serializer(page)
+            embedded_name = pagination_serializer.results_field
+            serializer = pagination_serializer.fields.pop(embedded_name)
+            data = pagination_serializer.to_native(page)
+            objects = page.object_list
+        else:
+            embedded_name = unicode(self.model._meta.verbose_name_plural)
+            serializer = self.get_serializer(many=True)
+            data = {'_links': {'self': {'href': request.build_absolute_uri()}}}
+            objects = self.object_list
+            counter = {'count': 0}
+            trailer = lambda: counter
+
+        def chunks():
+            if self.parallel_serialization and page is None and isinstance(objects, QuerySet):
+                serialized_chunks = iter_parallel_chunks(
+                    serializer.__class__, objects, serializer.context, self.stream_chunk_size,
+                    self.parallel_workers, self.parallel_serialization == 'processes')
+                for chunk in serialized_chunks:
+                    counter['count'] += len(chunk)
+                    yield chunk
+                return
+            for chunk in self.iter_chunks(objects):
+                if trailer is not None:
+                    counter['count'] += len(chunk)
+                serialize_many = getattr(serializer, 'serialize_many', None)
+                if serialize_many is not None:
+                    yield serialize_many(chunk)
+                else:
+                    yield [serializer.to_native(obj) for obj in chunk]
+
+        content = renderer.render_stream(data, embedded_name, chunks(), trailer)
+        return StreamingHttpResponse(content, content_type=renderer.media_type)
+
+    def iter_chunks(self, objects):
+        """
+        Yield lists of at most `stream_chunk_size` objects. Querysets are read
+        with `.iterator()` and their `prefetch_related` lookups are applied per chunk.
+        """
+        if isinstance(objects, QuerySet):
+            lookups = objects._prefetch_related_lookups
+            iterator = objects.iterator()
+        else:
+            lookups = []
+            iterator = iter(objects)
+
+        while True:
+            chunk = list(islice(iterator, self.stream_chunk_size))
+            if not chunk:
+                break
+            if lookups:
+                prefetch_related_objects(chunk, lookups)
+            yield chunk
+
+
+# Headers a 304 response repeats from the 200 response it stands for (RFC 7232, 4.1).
+NOT_MODIFIED_HEADERS = ('Cache-Control', 'Content-Location', 'Date', 'Expires', 'Vary')
+
+
+class ConditionalGetMixin(object):
+    """
+    Adds `ETag` and `Last-Modified` validators to the GET responses of
+    generic views, and answers `If-None-Match` and `If-Modified-Since` with
+    `304 Not Modified`.
+
+    With `etag_field` (a version column incremented on every change) or
+    `last_modified_field` (e.g. `updated_at`), the validators are read from
+    the object, or aggregated over the filtered queryset of a list, before
+    anything is serialized. Otherwise, with `etag_from_content`, the ETag
+    is a hash of the rendered response, which saves the transfer but not
+    the work. The ETags of lists depend on the full path, so every page
+    and field selection has its own.
+    """
+    etag_field = None
+    last_modified_field = None
+    etag_from_content = True
+
+    def has_validators(self):
+        return bool(self.etag_field or self.last_modified_field)
+
+    def make_etag(self, *parts):
+        """
+        Return an ETag for `parts` of the current request's representation.
+        """
+        media_type = getattr(self.request, 'accepted_media_type', None)
+        key = repr((self.request.get_full_path(), media_type) + parts)
+        return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def get_timestamp(self, value):
+        if value is None:
+            return None
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.get_default_timezone())
+        return calendar.timegm(value.utctimetuple())
+
+    def get_object_validators(self, obj):
+        """
+        Return the `(etag, last_modified)` of `obj`; either may be None.
+        """
+        etag = last_modified = None
+        if self.last_modified_field:
+            last_modified = self.get_timestamp(getattr(obj, self.last_modified_field))
+        if self.etag_field:
+            etag = self.make_etag(obj.pk, getattr(obj, self.etag_field))
+        elif last_modified is not None:
+            etag = self.make_etag(obj.pk, last_modified)
+        return etag, last_modified
+
+    def get_list_validators(self, queryset):
+        """
+        Return the `(etag, last_modified)` of a list, from the number of
+        objects, their latest modification and the sum of their versions.
+        """
+        if not isinstance(queryset, QuerySet):
+            return None, None
+        aggregates = {'count': Count('pk')}
+        if self.last_modified_field:
+            aggregates['last_modified'] = Max(self.last_modified_field)
+        if self.etag_field:
+            aggregates['version'] = Sum(self.etag_field)
+        values = queryset.order_by().aggregate(**aggregates)
+        last_modified = self.get_timestamp(values.get('last_modified'))
+        etag = self.make_etag(values['count'], last_modified, values.get('version'))
+        return etag, last_modified
+
+    def is_not_modified(self, etag, last_modified):
+        """
+        Return whether the client's copy with the request's preconditions is
+        still fresh. `If-Modified-Since` only counts without `If-None-Match`.
+        """
+        if_none_match = self.request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            if etag is None:
+                return False
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+        if_modified_since = self.request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since and last_modified is not None:
+            if_modified_since = parse_http_date_safe(if_modified_since)
+            return if_modified_since is not None and last_modified <= if_modified_since
+        return False
+
+    def set_validators(self, response, etag, last_modified):
+        if etag is not None:
+            response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def not_modified(self, etag, last_modified):
+        return self.set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.has_validators():
+            return super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+
+        self.object = self.get_object()
+        etag, last_modified = self.get_object_validators(self.object)
+        if self.is_not_modified(etag, last_modified):
+            return self.not_modified(etag, last_modified)
+        serializer = self.get_serializer(self.object)
+        return self.set_validators(Response(serializer.data), etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        if not self.has_validators():
+            return super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+
+        etag, last_modified = self.get_list_validators(self.filter_queryset(self.get_queryset()))
+        if self.is_not_modified(etag, last_modified):
+            return self.not_modified(etag, last_modified)
+        response = super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(ConditionalGetMixin, self).finalize_response(request, response, *args, **kwargs)
+        if not self.etag_from_content or request.method not in ('GET', 'HEAD') or \
+                response.status_code != status.HTTP_200_OK or response.streaming or response.has_header('ETag'):
+            return response
+
+        if hasattr(response, 'render'):
+            response.render()
+        etag = hashlib.md5(response.content).hexdigest()
+        if self.is_not_modified(etag, None):
+            not_modified = HttpResponseNotModified()
+            for header in NOT_MODIFIED_HEADERS:
+                if response.has_header(header):
+                    not_modified[header] = response[header]
+            response = not_modified
+        response['ETag'] = quote_etag(etag)
+        return response
+
+
+class ProfiledViewMixin(object):
+    """
+    Records the cost of serializing each field of the response, of
+    paginating (which counts the objects) and of rendering (see `drf_hal.instrumentation`), when
+    `should_profile` allows it, by default with `DEBUG` on.
+
+    The slowest `profile_header_entries` entries are sent in the
+    `profile_header` header, `Server-Timing` by default, and with
+    `profile_meta` all of them in a `_meta` block of the document. The
+    `serialization_profiled` signal is sent with the profile of each request.
+    """
+    profile_header = 'Server-Timing'
+    profile_header_entries = 20
+    profile_meta = False
+
+    def should_profile(self, request):
+        return settings.DEBUG
+
+    def initial(self, request, *args, **kwargs):
+        super(ProfiledViewMixin, self).initial(request, *args, **kwargs)
+        if self.should_profile(request):
+            request._hal_profile = Profile()
+            request._hal_profile.enable_query_log()
+
+    def paginate_queryset(self, queryset, page_size=None):
+        profile = getattr(self.request, '_hal_profile', None)
+        paginate_queryset = super(ProfiledViewMixin, self).paginate_queryset
+        if not isinstance(profile, Profile):
+            return paginate_queryset(queryset, page_size)
+        return profile.record('paginate', paginate_queryset, queryset, page_size)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        profile = getattr(request, '_hal_profile', None)
+        if not isinstance(profile, Profile):
+            return super(ProfiledViewMixin, self).finalize_response(request, response, *args, **kwargs)
+
+        try:
+            if self.profile_meta and isinstance(getattr(response, 'data', None), dict):
+                response.data['_meta'] = {'profile': profile.as_dict()}
+            response = super(ProfiledViewMixin, self).finalize_response(request, response, *args, **kwargs)
+            if hasattr(response, 'render') and not response.streaming:
+                profile.record('render', response.render)
+        finally:
+            profile.disable_query_log()
+
+        if self.profile_header:
+            response[self.profile_header] = profile.as_server_timing(self.profile_header_entries)
+        serialization_profiled.send(sender=self.__class__, request=request, profile=profile)
+        return response
+
+
 class LinkInputEmbeddedOutputRelatedSerializerMixin(object):
     """
     This is a bad behavior but we'll support it for now :(
@@ -63,21 +519,13 @@ class LinkInputEmbeddedOutputRelatedSerializerMixin(object):
             raise Exception('Writable related fields must include a `queryset` argument')
 
         try:
-            http_prefix = value.startswith(('http:', 'https:'))
+            value = href_to_path(value)
         except AttributeError:
             msg = self.error_messages['incorrect_type']
             raise ValidationError(msg % type(value).__name__)
 
-        if http_prefix:
-            # If needed convert absolute URLs to relative path
-            value = urlparse.urlparse(value).path
-            prefix = get_script_prefix()
-            if value.startswith(prefix):
-                value = '/' + value[len(prefix):]
-
-        try:
-            match = resolve(value)
-        except Exception:
+        match = resolve_path(value)
+        if match is None:
             raise ValidationError(self.error_messages['no_match'])
 
         if match.view_name != self.view_name:
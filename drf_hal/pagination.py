@@ -1,8 +1,93 @@
 # -*- coding: utf-8 -*-
+import base64
+import json
+import urlparse
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import QueryDict
 from rest_framework import serializers
 from rest_framework import pagination
 from rest_framework.templatetags.rest_framework import replace_query_param
 
+from drf_hal.counts import ExactCount
+from drf_hal.instrumentation import get_profile
+
+
+def remove_query_param(url, key):
+    """
+    Given a URL and a key, remove the item from the query parameters of the URL.
+    """
+    (scheme, netloc, path, query, fragment) = urlparse.urlsplit(url)
+    query_dict = QueryDict(query).copy()
+    query_dict.pop(key, None)
+    query = query_dict.urlencode()
+    return urlparse.urlunsplit((scheme, netloc, path, query, fragment))
+
+
+class HALPage(Page):
+
+    def has_next(self):
+        if self.paginator.count_is_approximate:
+            return len(self.object_list) >= self.paginator.per_page
+        return super(HALPage, self).has_next()
+
+
+class HALPaginator(Paginator):
+    """
+    Paginator whose total comes from a pluggable count strategy (see
+    `drf_hal.counts`); set `count_strategy` on a subclass and use it as the
+    view's `paginator_class`.
+
+    When the strategy returns an approximate total, pages past the estimated
+    last page can still be requested, the last page is not clipped to the
+    estimate and `next` links are offered while pages come back full.
+    """
+    count_strategy = ExactCount()
+
+    def __init__(self, *args, **kwargs):
+        count_strategy = kwargs.pop('count_strategy', None)
+        if count_strategy is not None:
+            self.count_strategy = count_strategy
+        super(HALPaginator, self).__init__(*args, **kwargs)
+        self._count_is_approximate = False
+
+    def _get_count(self):
+        if self._count is None:
+            if hasattr(self.object_list, 'query'):
+                self._count, self._count_is_approximate = self.count_strategy(self.object_list)
+            else:
+                super(HALPaginator, self)._get_count()
+        return self._count
+    count = property(_get_count)
+
+    @property
+    def count_is_approximate(self):
+        self._get_count()
+        return self._count_is_approximate
+
+    def validate_number(self, number):
+        if not self.count_is_approximate:
+            return super(HALPaginator, self).validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        if not self.count_is_approximate:
+            return super(HALPaginator, self).page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return HALPage(*args, **kwargs)
+
 
 class PageLinkMixin(object):
     page_field = 'page'
@@ -12,9 +97,7 @@ class PageLinkMixin(object):
         return request and request.build_absolute_uri() or ''
 
     def _get_link_object(self, link):
-        return {
-            'href': link
-        }
+        return {'href': link}
 
     def _get_page_link(self, value, page):
         if not value.paginator.count:
@@ -72,6 +155,8 @@ class CountField(serializers.Field):
     Field that returns count for the page
     """
     def to_native(self, value):
+        if getattr(value.paginator, 'count_is_approximate', False):
+            return len(value.object_list)
         if value.paginator.count == 0:
             return 0
         start_index = value.start_index()
@@ -79,6 +164,14 @@ class CountField(serializers.Field):
         return (end_index - start_index) + 1
 
 
+class ApproximateTotalField(serializers.Field):
+    """
+    Field that returns whether the total of the paginator is an estimate
+    """
+    def to_native(self, value):
+        return getattr(value.paginator, 'count_is_approximate', False)
+
+
 class HALPaginationLinksSerializer(serializers.Serializer):
     self = SelfPageField(source='*')
     next = NextPageField(source='*')
@@ -87,11 +180,13 @@ class HALPaginationLinksSerializer(serializers.Serializer):
     last = LastPageField(source='*')
 
 
-class HALPaginationSerializer(pagination.BasePaginationSerializer):
-    _links = HALPaginationLinksSerializer(source='*')  # Takes the page object as the source
-    total = serializers.Field(source='paginator.count')
-    num_pages = serializers.Field(source='paginator.num_pages')
-    count = CountField(source='*')
+class HALBasePaginationSerializer(pagination.BasePaginationSerializer):
+    """
+    Puts the serialized objects of the page into `_embedded`, keyed by the
+    plural verbose name of the view's model.
+    """
+    # Prefix of the fields in profiles; the class is built on the fly by DRF.
+    profile_name = 'pagination'
 
     def __init__(self, *args, **kwargs):
         """
@@ -106,10 +201,211 @@ class HALPaginationSerializer(pagination.BasePaginationSerializer):
         self.fields[self.results_field] = object_serializer(source='object_list', **context_kwarg)
 
     def to_native(self, obj):
-        native = super(HALPaginationSerializer, self).to_native(obj)
+        profile = get_profile(self.context)
+        if profile is None:
+            native = super(HALBasePaginationSerializer, self).to_native(obj)
+        else:
+            native = self.profiled_to_native(obj, profile)
         results = native.pop(self.results_field, None)
         native['_embedded'] = {
             self.results_field: results
         }
         return native
 
+    def profiled_to_native(self, obj, profile):
+        """
+        Same as `BaseSerializer.to_native`, recording each field in `profile`.
+        """
+        ret = self._dict_class()
+        ret.fields = self._dict_class()
+
+        for field_name, field in self.fields.items():
+            if field.read_only and obj is None:
+                continue
+            field.initialize(parent=self, field_name=field_name)
+            key = self.get_field_key(field_name)
+            value = profile.record('%s.%s' % (self.profile_name, field_name),
+                                   field.field_to_native, obj, field_name)
+            method = getattr(self, 'transform_%s' % field_name, None)
+            if callable(method):
+                value = method(obj, value)
+            if not getattr(field, 'write_only', False):
+                ret[key] = value
+            ret.fields[key] = self.augment_field(field, field_name, key, value)
+
+        return ret
+
+
+class HALPaginationSerializer(HALBasePaginationSerializer):
+    _links = HALPaginationLinksSerializer(source='*')  # Takes the page object as the source
+    total = serializers.Field(source='paginator.count')
+    total_is_approximate = ApproximateTotalField(source='*')
+    num_pages = serializers.Field(source='paginator.num_pages')
+    count = CountField(source='*')
+
+
+class CursorPage(object):
+    """
+    A page of a `CursorPaginator`.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(object):
+    """
+    Keyset pagination over a unique, indexed column.
+
+    Pages are selected with `WHERE <column> > <position>` instead of an
+    `OFFSET`, so deep pages are as cheap as the first one, and no `COUNT(*)`
+    is run unless `count` is asked for. Prefix the column with '-' to walk
+    it in descending order.
+    """
+
+    def __init__(self, queryset, per_page, ordering='pk', cursor_query_param='cursor'):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = ordering
+        self.cursor_query_param = cursor_query_param
+        self.descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        self._count = None
+
+    @property
+    def count(self):
+        if self._count is None:
+            self._count = self.queryset.count()
+        return self._count
+
+    def encode_cursor(self, direction, position):
+        data = json.dumps([direction, position], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode('utf-8')).rstrip(b'=')
+
+    def decode_cursor(self, cursor):
+        """
+        Return the direction and position of `cursor`, the position converted
+        to the type of the column. Raises `InvalidPage` for malformed cursors.
+        """
+        opts = self.queryset.model._meta
+        field = opts.pk if self.field_name == 'pk' else opts.get_field(self.field_name)
+        try:
+            cursor = str(cursor)
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, position = json.loads(data.decode('utf-8'))
+            position = field.to_python(position)
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise InvalidPage('Invalid cursor')
+        if direction not in ('n', 'p'):
+            raise InvalidPage('Invalid cursor')
+        return direction, position
+
+    def page(self, cursor=None):
+        """
+        Return the page at `cursor`, or the first page.
+        """
+        direction, position = self.decode_cursor(cursor) if cursor else ('n', None)
+        forward = direction == 'n'
+
+        # Walk backwards by flipping the ordering, then restore the order.
+        if forward != self.descending:
+            ordering, lookup = self.field_name, '__gt'
+        else:
+            ordering, lookup = '-' + self.field_name, '__lt'
+        queryset = self.queryset.order_by(ordering)
+        if position is not None:
+            queryset = queryset.filter(**{self.field_name + lookup: position})
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if not forward:
+            object_list.reverse()
+
+        next_cursor = previous_cursor = None
+        if object_list:
+            if has_more or not forward:
+                next_cursor = self.encode_cursor('n', getattr(object_list[-1], self.field_name))
+            if (has_more or forward) and position is not None:
+                previous_cursor = self.encode_cursor('p', getattr(object_list[0], self.field_name))
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
+
+
+class CursorLinkMixin(PageLinkMixin):
+
+    def _get_cursor_link(self, value, cursor):
+        if cursor is None:
+            return None
+        uri = self._get_current_uri()
+        return self._get_link_object(replace_query_param(uri, value.paginator.cursor_query_param, cursor))
+
+
+class FirstCursorField(CursorLinkMixin, serializers.Field):
+    """
+    Field that returns a link to the first page of cursor paginated results.
+    """
+    def to_native(self, value):
+        uri = self._get_current_uri()
+        return self._get_link_object(remove_query_param(uri, value.paginator.cursor_query_param))
+
+
+class NextCursorField(CursorLinkMixin, serializers.Field):
+    """
+    Field that returns a link to the next page of cursor paginated results.
+    """
+    def to_native(self, value):
+        return self._get_cursor_link(value, value.next_cursor)
+
+
+class PreviousCursorField(CursorLinkMixin, serializers.Field):
+    """
+    Field that returns a link to the previous page of cursor paginated results.
+    """
+    def to_native(self, value):
+        return self._get_cursor_link(value, value.previous_cursor)
+
+
+class CursorCountField(serializers.Field):
+    """
+    Field that returns count for the cursor page
+    """
+    def to_native(self, value):
+        return len(value.object_list)
+
+
+class HALCursorPaginationLinksSerializer(serializers.Serializer):
+    self = SelfPageField(source='*')
+    next = NextCursorField(source='*')
+    prev = PreviousCursorField(source='*')
+    first = FirstCursorField(source='*')
+
+
+class HALCursorPaginationSerializer(HALBasePaginationSerializer):
+    """
+    Pagination serializer for `CursorPage`s with opaque `next`/`prev` cursor links.
+
+    The `total` count needs a `COUNT(*)` and is only included when
+    `include_total` is set.
+    """
+    _links = HALCursorPaginationLinksSerializer(source='*')
+    total = serializers.Field(source='paginator.count')
+    count = CursorCountField(source='*')
+
+    include_total = False
+
+    def __init__(self, *args, **kwargs):
+        super(HALCursorPaginationSerializer, self).__init__(*args, **kwargs)
+        if not self.include_total:
+            self.fields.pop('total', None)
+
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel serialization of large collections.
+
+`iter_parallel_chunks` splits a queryset into ranges of primary keys and
+serializes each range in a pool of workers, yielding the natives in order of
+primary key, one list per range. Querysets ordered otherwise, or sliced,
+are serialized in the calling thread, in their own order.
+
+With `processes`, the workers are forked once the field plan of the
+serializer class is built, so they inherit the field plans, compiled link
+templates, queryset and serializer context of the parent instead of having
+them pickled; only the natives come back. Forking needs the parent's
+database connections to be closed, which is not done inside a transaction:
+the collection is then serialized in the calling thread. In-memory SQLite
+databases are inherited by the forked workers as they are.
+
+Threads share the process, so they only help while serialization waits on
+the database. They run in a pool of their own, apart from the shared pools
+of `drf_hal.concurrency` that the serializers may prefetch with, and each
+use their own connection, closed with the pool. In-memory SQLite databases,
+private to their connection, are serialized in the calling thread.
+
+Neither helps on a single core, where every mode is slower than serializing
+serially.
+"""
+from itertools import count
+import multiprocessing
+from multiprocessing.pool import Pool, ThreadPool
+import sys
+import threading
+
+from django.db import connections
+
+from drf_hal.concurrency import can_load_concurrently, call_in_every_thread, call_with_connections, \
+    close_connections
+
+
+# Querysets, serializer classes and contexts of the running process pools,
+# by job id. Set before forking, so that the workers inherit them.
+_jobs = {}
+_job_ids = count()
+_jobs_lock = threading.Lock()
+
+
+def is_ordered_by_pk(queryset):
+    """
+    Return whether `queryset` is ordered by ascending primary key, or not ordered.
+    """
+    query = queryset.query
+    if query.extra_order_by:
+        ordering = query.extra_order_by
+    elif query.order_by:
+        ordering = query.order_by
+    elif query.default_ordering:
+        ordering = queryset.model._meta.ordering
+    else:
+        ordering = ()
+    pk = queryset.model._meta.pk
+    return not ordering or list(ordering) in (['pk'], [pk.name], [pk.attname])
+
+
+def get_pk_ranges(queryset, chunk_size):
+    """
+    Return `(first pk, last pk)` of each run of `chunk_size` objects of
+    `queryset`, in order of pk.
+    """
+    ranges = []
+    first = last = None
+    size = 0
+    for pk in queryset.prefetch_related(None).order_by('pk').values_list('pk', flat=True).iterator():
+        if size == chunk_size:
+            ranges.append((first, last))
+            size = 0
+        if size == 0:
+            first = pk
+        last = pk
+        size += 1
+    if size:
+        ranges.append((first, last))
+    return ranges
+
+
+def serialize_range(serializer_class, queryset, context, pk_range):
+    first, last = pk_range
+    objects = queryset.filter(pk__gte=first, pk__lte=last).order_by('pk')
+    return serializer_class(objects, many=True, context=context).data
+
+
+def serialize_job_range(args):
+    job_id, pk_range = args
+    serializer_class, queryset, context = _jobs[job_id]
+    return list(serialize_range(serializer_class, queryset, context, pk_range))
+
+
+def can_fork(using):
+    """
+    Close the connections of the process, unless they are in a transaction,
+    so that forked workers open their own. Return whether workers can be forked.
+    """
+    if sys.platform == 'win32':
+        return False
+    if not can_load_concurrently(using):
+        # Inherited by the workers
+        return True
+    if any(connection.in_atomic_block for connection in connections.all()):
+        return False
+    for connection in connections.all():
+        connection.close()
+    return True
+
+
+def iter_parallel_chunks(serializer_class, queryset, context=None, chunk_size=1000, workers=None,
+                         processes=True):
+    """
+    Yield the natives of the objects of `queryset` in order of pk, serialized
+    `chunk_size` objects at a time by `workers` processes or threads, one per
+    core by default. Querysets ordered otherwise are serialized in one chunk,
+    in the calling thread.
+    """
+    context = context or {}
+    workers = workers or multiprocessing.cpu_count()
+    if queryset.query.low_mark or queryset.query.high_mark is not None or not is_ordered_by_pk(queryset):
+        # Ranges of pks would lose the slice or the order
+        yield list(serializer_class(queryset, many=True, context=context).data)
+        return
+    pk_ranges = get_pk_ranges(queryset, chunk_size)
+    serial = workers < 2 or len(pk_ranges) < 2
+
+    if not serial and not processes and can_load_concurrently(queryset.db):
+        functions = [lambda pk_range=pk_range: list(serialize_range(serializer_class, queryset, context, pk_range))
+                     for pk_range in pk_ranges]
+        workers = min(workers, len(pk_ranges))
+        pool = ThreadPool(workers)
+        try:
+            for chunk in pool.imap(call_with_connections, functions):
+                yield chunk
+            call_in_every_thread(pool, workers, close_connections)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+        return
+
+    if serial or not processes or not can_fork(queryset.db):
+        for pk_range in pk_ranges:
+            yield list(serialize_range(serializer_class, queryset, context, pk_range))
+        return
+
+    get_field_plan = getattr(serializer_class, 'get_field_plan', None)
+    if get_field_plan is not None:
+        get_field_plan()
+    with _jobs_lock:
+        job_id = next(_job_ids)
+        _jobs[job_id] = (serializer_class, queryset, context)
+        try:
+            pool = Pool(min(workers, len(pk_ranges)))
+        finally:
+            del _jobs[job_id]
+    try:
+        for chunk in pool.imap(serialize_job_range, [(job_id, pk_range) for pk_range in pk_ranges]):
+            yield chunk
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def serialize_parallel(serializer_class, queryset, context=None, chunk_size=1000, workers=None, processes=True):
+    """
+    Return the natives of the objects of `queryset` (see `iter_parallel_chunks`).
+    """
+    ret = []
+    for chunk in iter_parallel_chunks(serializer_class, queryset, context, chunk_size, workers, processes):
+        ret.extend(chunk)
+    return ret
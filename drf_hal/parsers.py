@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing of incoming HAL documents.
+
+`HALParser` decodes `application/hal+json` bodies with the standard
+library's `json`, or the `json_backend` it is given (e.g. the opt-in
+`drf_hal.encoders.SimpleJSONBackend`), and returns each object as a
+`HALData`: the decoded dict, with the hrefs of its `_links` and its
+`_embedded` objects split out once so that serializers do not probe the
+nested dicts field by field.
+
+The hrefs are only extracted, not resolved: each relation field still
+resolves its own hrefs to objects, through the resolved-path cache of
+`drf_hal.hrefs`.
+"""
+from django.conf import settings
+from rest_framework import status
+from rest_framework.compat import six
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import BaseParser
+
+from drf_hal.encoders import get_default_json_backend
+from drf_hal.renderers import HALRenderer
+
+
+class RequestEntityTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Request body too large.'
+
+
+class HALData(dict):
+    """
+    A decoded HAL object.
+
+    `links` maps each relation of `_links` to its href, or list of hrefs, and
+    `embedded` is the `_embedded` object. The hrefs of the relations are also
+    set as plain items, unless the object has items with those names, so
+    that the fields restoring the relations find them as with plain JSON.
+    """
+    links = None
+    embedded = None
+
+
+def get_href(link):
+    try:
+        return link.get('href')
+    except AttributeError:
+        return None
+
+
+class HALParser(BaseParser):
+    """
+    Parses HAL documents.
+
+    Bodies longer than `max_body_size` bytes are refused with a 413, and
+    `_embedded` collections with more than `max_embedded_items` objects with
+    a 400. Both are unlimited when None.
+    """
+    media_type = 'application/hal+json'
+    renderer_class = HALRenderer
+    json_backend = None
+    max_body_size = None
+    max_embedded_items = None
+
+    def get_json_backend(self):
+        if self.json_backend is not None:
+            return self.json_backend
+        return get_default_json_backend()
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        body = self.read_body(stream, parser_context.get('request'))
+        try:
+            data = self.get_json_backend().loads(body.decode(encoding))
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % six.text_type(exc))
+        return self.normalize(data)
+
+    def read_body(self, stream, request=None):
+        if self.max_body_size is None:
+            return stream.read()
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH', 0))
+        except (AttributeError, TypeError, ValueError):
+            content_length = 0
+        if content_length > self.max_body_size:
+            raise RequestEntityTooLarge()
+        body = stream.read(self.max_body_size + 1)
+        if len(body) > self.max_body_size:
+            raise RequestEntityTooLarge()
+        return body
+
+    def normalize(self, data):
+        """
+        Return `data` with its objects, and the objects they embed, turned
+        into `HALData`.
+        """
+        if isinstance(data, list):
+            return [self.normalize_object(item) if isinstance(item, dict) else item for item in data]
+        if isinstance(data, dict):
+            return self.normalize_object(data)
+        return data
+
+    def normalize_object(self, data):
+        ret = HALData(data)
+
+        links = data.get('_links')
+        if isinstance(links, dict):
+            ret.links = {}
+            for rel, link in links.items():
+                if isinstance(link, list):
+                    href = [get_href(item) for item in link]
+                else:
+                    href = get_href(link)
+                ret.links[rel] = href
+                if rel != 'self' and rel not in data:
+                    ret[rel] = href
+
+        embedded = data.get('_embedded')
+        if isinstance(embedded, dict):
+            ret.embedded = {}
+            for rel, value in embedded.items():
+                if isinstance(value, list):
+                    if self.max_embedded_items is not None and len(value) > self.max_embedded_items:
+                        raise ParseError('Too many embedded objects in "%s", at most %s are allowed.' % (
+                            rel, self.max_embedded_items))
+                    value = [self.normalize_object(item) if isinstance(item, dict) else item for item in value]
+                elif isinstance(value, dict):
+                    value = self.normalize_object(value)
+                ret.embedded[rel] = value
+            ret['_embedded'] = ret.embedded
+        return ret
@@ -1,7 +1,78 @@
 # -*- coding: utf-8 -*-
+from django.http.multipartparser import parse_header
 from rest_framework.renderers import JSONRenderer
 
+from drf_hal.encoders import HALJSONEncoder, get_default_json_backend
+
 
 class HALRenderer(JSONRenderer):
+    """
+    Renders HAL documents with `json_backend` (see `drf_hal.encoders`), the
+    standard library's encoder by default.
+    """
     media_type = 'application/hal+json'
+    encoder_class = HALJSONEncoder
+    json_backend = None
+
+    def get_json_backend(self):
+        if self.json_backend is not None:
+            return self.json_backend
+        return get_default_json_backend(self.encoder_class)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON.
+        """
+        if data is None:
+            return bytes()
+
+        # If 'indent' is provided in the context, then pretty print the result.
+        # E.g. If we're being called by the BrowsableAPIRenderer.
+        renderer_context = renderer_context or {}
+        indent = renderer_context.get('indent', None)
+
+        if accepted_media_type:
+            # If the media type looks like 'application/json; indent=4',
+            # then pretty print the result.
+            base_media_type, params = parse_header(accepted_media_type.encode('ascii'))
+            indent = params.get('indent', indent)
+            try:
+                indent = max(min(int(indent), 8), 0)
+            except (ValueError, TypeError):
+                indent = None
+
+        return self.get_json_backend().dumps(data, indent=indent, ensure_ascii=self.ensure_ascii)
+
+    def encode(self, value):
+        """
+        Encode a single value -> JSON bytes.
+        """
+        return self.get_json_backend().dumps(value, ensure_ascii=self.ensure_ascii)
+
+    def render_stream(self, data, embedded_name, chunks, trailer=None):
+        """
+        Render a HAL collection incrementally.
+
+        `data` holds the members rendered before `_embedded`, `chunks` is an
+        iterable of lists of serialized items that make up
+        `_embedded[embedded_name]`, and `trailer` is an optional callable
+        returning members rendered after the items, once they are all known.
+        """
+        yield b'{'
+        for key, value in data.items():
+            if key == '_embedded':
+                continue
+            yield self.encode(key) + b': ' + self.encode(value) + b', '
+
+        yield b'"_embedded": {' + self.encode(embedded_name) + b': ['
+        separator = b''
+        for chunk in chunks:
+            if chunk:
+                yield separator + b', '.join(self.encode(item) for item in chunk)
+                separator = b', '
+        yield b']}'
 
+        if trailer is not None:
+            for key, value in trailer().items():
+                yield b', ' + self.encode(key) + b': ' + self.encode(value)
+        yield b'}'
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled link templates.
+
+Resolving a view name through Django's URL resolver is comparatively
+expensive, and HAL documents do it for every link of every object.  Here each
+`view_name` is resolved once into a `LinkTemplate` with named placeholders,
+and hrefs are produced by substituting the lookup values.  View names that
+cannot be templated (namespaced names, several candidate patterns, patterns
+with default arguments) fall back to `rest_framework.reverse.reverse`.
+"""
+import re
+
+from django.core.urlresolvers import NoReverseMatch, get_resolver, get_script_prefix, get_urlconf
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from django.utils.encoding import force_text, iri_to_uri
+from django.utils.http import urlquote
+from django.utils.translation import get_language
+from rest_framework import reverse as drf_reverse
+
+
+_link_templates = {}
+
+
+class LinkTemplate(object):
+    """
+    A URL pattern of a single view, compiled down to a format string.
+    """
+
+    def __init__(self, result, params, pattern):
+        self.result = result
+        self.params = frozenset(params)
+        self.regex = re.compile('^%s' % pattern, re.UNICODE)
+
+    def expand(self, kwargs):
+        """
+        Return the path (without script prefix) for the given URL kwargs.
+
+        Raises `NoReverseMatch` if the kwargs do not fit the pattern.
+        """
+        if self.params != frozenset(kwargs):
+            raise NoReverseMatch()
+        text_kwargs = dict((key, force_text(value)) for key, value in kwargs.items())
+        # Same as Django 1.7.11: match on the unquoted values, then quote them
+        # (earlier 1.7 releases quoted the values before matching).
+        if not self.regex.search(self.result % text_kwargs):
+            raise NoReverseMatch()
+        return self.result % dict((key, urlquote(value)) for key, value in text_kwargs.items())
+
+
+def get_link_template(view_name, urlconf=None):
+    """
+    Return the compiled `LinkTemplate` for `view_name`,
+    or None if the view name cannot be templated.
+    """
+    key = (urlconf, get_language(), view_name)
+    try:
+        return _link_templates[key]
+    except KeyError:
+        pass
+
+    template = None
+    resolver = get_resolver(urlconf)
+    # Populates the resolver, and its dotted paths of views
+    possibilities = resolver.reverse_dict.getlist(view_name) if ':' not in view_name else []
+    # Dotted paths of views reverse differently. The private set exists in
+    # Django 1.7; without it, every view goes through `reverse()`.
+    callback_strs = getattr(resolver, '_callback_strs', None)
+    if callback_strs is not None and view_name not in callback_strs and len(possibilities) == 1:
+        possibility, pattern, defaults = possibilities[0]
+        if len(possibility) == 1 and not defaults:
+            result, params = possibility[0]
+            template = LinkTemplate(result, params, pattern)
+
+    _link_templates[key] = template
+    return template
+
+
+def clear_link_templates():
+    _link_templates.clear()
+
+
+@receiver(setting_changed)
+def root_urlconf_changed(**kwargs):
+    if kwargs['setting'] == 'ROOT_URLCONF':
+        clear_link_templates()
+
+
+def _build_absolute_uri(request, url):
+    # The scheme and host are the same for every link of a request,
+    # so only build them once.
+    base = getattr(request, '_hal_absolute_base', None)
+    if base is None:
+        base = request._hal_absolute_base = request.build_absolute_uri('/')[:-1]
+    return base + url
+
+
+def reverse(viewname, kwargs=None, request=None, format=None):
+    """
+    Same as `rest_framework.reverse.reverse`, but uses the compiled link
+    template of the view when there is one.
+    """
+    kwargs = kwargs or {}
+    if format is not None:
+        kwargs = dict(kwargs, format=format)
+
+    template = get_link_template(viewname, get_urlconf())
+    if template is None:
+        return drf_reverse.reverse(viewname, kwargs=kwargs, request=request)
+
+    try:
+        path = template.expand(kwargs)
+    except NoReverseMatch:
+        return drf_reverse.reverse(viewname, kwargs=kwargs, request=request)
+
+    url = iri_to_uri(urlquote(get_script_prefix()) + path)
+    if url.startswith('//'):
+        # Don't allow construction of scheme relative urls.
+        url = '/%%2F%s' % url[2:]
+    if request:
+        return _build_absolute_uri(request, url)
+    return url
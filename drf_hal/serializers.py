@@ -1,39 +1,379 @@
 # -*- coding: utf-8 -*-
 import copy
 
-from django.core.exceptions import ValidationError
+import warnings
+
+from django.apps import apps
+from django.core.exceptions import ValidationError, ObjectDoesNotExist
+from django.core.paginator import Page
 from django.utils.datastructures import SortedDict
-from django.db import models
-from rest_framework.compat import get_concrete_model
-from rest_framework.fields import Field
+from django.db import models, router, transaction
+from django.db.models.query import QuerySet
+from rest_framework.compat import get_concrete_model, six
+from rest_framework.fields import Field, get_component, is_simple_callable
 from rest_framework.relations import HyperlinkedRelatedField
-from rest_framework.serializers import ModelSerializer, HyperlinkedModelSerializerOptions, _resolve_model
+from rest_framework.serializers import ModelSerializer, HyperlinkedModelSerializerOptions, BaseSerializer, \
+    RelationsList, SerializerMetaclass, _resolve_model
 
-from drf_hal.fields import HALLinksField, HALEmbeddedField, HALLinkField
+from drf_hal.cache import get_representation_cache, invalidate, watch
+from drf_hal.fields import HALLinksField, HALEmbeddedField, HALLinkField, HALHyperlinkedRelatedField, EmbedFallback
+from drf_hal.hrefs import href_to_path, resolve_path
+from drf_hal.instrumentation import get_profile
+from drf_hal.lookups import compile_lookups
+from drf_hal.memo import get_memo
 
 
 class HALModelSerializerOptions(HyperlinkedModelSerializerOptions):
     def __init__(self, meta):
         super(HALModelSerializerOptions, self).__init__(meta)
         self.additional_embedded = getattr(meta, 'additional_embedded', None)
+        self.cache_field_plan = getattr(meta, 'cache_field_plan', True)
+        self.link_templates = getattr(meta, 'link_templates', False)
+        self.many_links_from_values = getattr(meta, 'many_links_from_values', False)
+        self.bulk_create = getattr(meta, 'bulk_create', False)
+        self.bulk_batch_size = getattr(meta, 'bulk_batch_size', 500)
+        self.cache_representation = getattr(meta, 'cache_representation', False)
+        self.memoize_embedded = getattr(meta, 'memoize_embedded', False)
+        self.cache_alias = getattr(meta, 'cache_alias', 'default')
+        self.cache_timeout = getattr(meta, 'cache_timeout', 300)
+        self.max_embed_depth = getattr(meta, 'max_embed_depth', None)
+        self.max_embedded_items = getattr(meta, 'max_embedded_items', None)
+        self.related_collections = getattr(meta, 'related_collections', None) or {}
+        self.embeddable = getattr(meta, 'embeddable', None) or {}
+
+
+def get_relation(opts, name):
+    """
+    Return `(kind, model_field, related_model)` for the attribute `name` of
+    the model of `opts`, where kind is one of 'column', 'forward', 'many',
+    'reverse' or None.
+    """
+    if name == '*' or '.' in name:
+        return None, None, None
+    try:
+        model_field = opts.get_field(name)
+    except models.FieldDoesNotExist:
+        pass
+    else:
+        if not model_field.rel:
+            return 'column', model_field, None
+        related_model = _resolve_model(model_field.rel.to)
+        if isinstance(model_field, models.fields.related.ManyToManyField):
+            return 'many', model_field, related_model
+        return 'forward', model_field, related_model
+
+    for relation in opts.get_all_related_objects():
+        if relation.get_accessor_name() == name:
+            return 'reverse', relation, relation.model
+    for relation in opts.get_all_related_many_to_many_objects():
+        if relation.get_accessor_name() == name:
+            return 'many', relation, relation.model
+    return None, None, None
+
+
+class HALFieldPlan(object):
+    """
+    The compiled field layout of a HALModelSerializer class.
+
+    Holds unbound template fields for the plain fields, the `_links` entries
+    and the `_embedded` entries, so that instances only need to clone them
+    instead of introspecting the model again.
+    """
+    # Queryset plans are kept for at most this many field selections.
+    max_queryset_plans = 100
+
+    def __init__(self, serializer_class):
+        prototype = serializer_class.__new__(serializer_class)
+        prototype.opts = serializer_class._options_class(serializer_class.Meta)
+        prototype.parent = None
+        prototype.root = None
+        prototype.context = {}
+        prototype.partial = False
+        prototype.additional_links = SortedDict()
+        prototype.embedded_fields = SortedDict()
+
+        self.fields = prototype.build_fields()
+        self.additional_links = prototype.additional_links
+        self.embedded_fields = prototype.embedded_fields
+
+        for field in self._iter_templates():
+            field.parent = None
+            field.root = None
+
+        # Queryset plans, keyed by field selection.
+        self.queryset_plans = {}
+        # Fields restoring relations that are not among the fields, by name.
+        self.leftover_fields = {}
+        # Fields linking the embedded relations cut by the embed limits, by name.
+        self.fallback_link_fields = {}
+
+    def _iter_templates(self):
+        for key, field in self.items():
+            yield field
+
+    def items(self):
+        """
+        Yield `(name, field)` for every distinct template field.
+        """
+        seen = set()
+        for fields in (self.fields, self.additional_links, self.embedded_fields):
+            for key, field in fields.items():
+                if id(field) not in seen:
+                    seen.add(id(field))
+                    yield key, field
+
+    @property
+    def link_names(self):
+        return list(self.additional_links.keys())
+
+    @property
+    def embedded_names(self):
+        return list(self.embedded_fields.keys())
+
+    @property
+    def plain_names(self):
+        return [key for key in self.fields.keys()
+                if key not in self.additional_links and key not in self.embedded_fields]
+
+    @property
+    def read_only_names(self):
+        return [key for key, field in self.fields.items() if field.read_only]
+
+    @property
+    def write_only_names(self):
+        return [key for key, field in self.fields.items() if getattr(field, 'write_only', False)]
+
+    def clone(self, serializer, selection=None):
+        """
+        Copy the template fields onto `serializer` and return its fields.
+        Fields shared between the sections stay shared in the copy. Only
+        the fields included in `selection`, if given, are copied.
+        """
+        memo = {}
+
+        def copy_fields(fields):
+            return SortedDict((key, copy.deepcopy(field, memo)) for key, field in fields.items()
+                              if selection is None or selection.includes(key))
+        serializer.additional_links = copy_fields(self.additional_links)
+        serializer.embedded_fields = copy_fields(self.embedded_fields)
+        ret = copy_fields(self.fields)
+
+        for fields in (serializer.additional_links, serializer.embedded_fields, ret):
+            for key, field in fields.items():
+                field.initialize(parent=serializer, field_name=key)
+        return ret
 
 
-class HALModelSerializer(ModelSerializer):
+class HALQuerysetPlan(object):
+    """
+    The joins, prefetches and columns a HALModelSerializer class reads,
+    derived from its field plan.
+
+    `only` is None when the columns cannot be restricted safely, e.g. when
+    the serializer has method fields or `transform_<field>` methods.
+
+    With a `FieldSelection`, only the selected fields are read, and the
+    relations it embeds are joined or prefetched.
+
+    Relations past `max_embed_depth` are only linked, so they are not joined
+    or prefetched with their serializer: to-many relations with a collection
+    in `related_collections` are not loaded at all, and the others are
+    prefetched for their links only. `max_embedded_items` does not limit the
+    prefetches: whole relations are loaded, and only the first items of each
+    serialized.
+    """
+
+    def __init__(self, serializer_class, required=(), selection=None, parent_depth=None):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = list(required)
+        self.add_serializer(serializer_class, '', selection, parent_depth)
+
+    def add_column(self, name):
+        if self.only is not None and name not in self.only:
+            self.only.append(name)
+
+    def add_serializer(self, serializer_class, prefix, selection=None, parent_depth=None):
+        opts = get_concrete_model(serializer_class.Meta.model)._meta
+        meta_opts = serializer_class._options_class(serializer_class.Meta)
+        field_plan = serializer_class.get_field_plan()
+
+        # The levels of `_embedded` left below this serializer, as in `HALModelSerializer.get_embed_limits`
+        depth = meta_opts.max_embed_depth
+        if parent_depth is not None:
+            depth = parent_depth - 1 if depth is None else min(depth, parent_depth - 1)
+        embed = depth is None or depth > 0
+
+        self.add_column(prefix + opts.pk.name)
+        if any(name.startswith('transform_') for name in dir(serializer_class)):
+            self.only = None
+
+        # The self link
+        for lookup_field, accessor in compile_lookups(meta_opts.lookup_field or 'pk'):
+            column = accessor.get_column(opts.concrete_model)
+            if column is not None:
+                self.add_column(prefix + accessor.path[-2])
+            elif len(accessor.path) > 1:
+                self.select_related.append(prefix + '__'.join(accessor.path[:-1]))
+                self.only = None
+            elif accessor.path[0] != 'pk':
+                self.add_column(prefix + accessor.path[0])
+
+        for key, field in field_plan.items():
+            if key in ('_links', '_embedded') or getattr(field, 'write_only', False):
+                continue
+            if selection is not None and not selection.includes(key):
+                continue
+            if selection is not None and key in selection.embed and (
+                    key in field_plan.embedded_fields or key in meta_opts.embeddable):
+                continue
+            if not embed and isinstance(field, HALModelSerializer):
+                self.add_links(opts, key, field.source or key, prefix, meta_opts)
+                continue
+            self.add_field(opts, key, field, prefix, depth)
+
+        if selection is not None:
+            for key, embedded_selection in selection.get_embedded():
+                field = field_plan.embedded_fields.get(key)
+                if field is None:
+                    link = field_plan.additional_links.get(key)
+                    source = link and link.source or key
+                    embed_serializer_class = meta_opts.embeddable.get(key)
+                    if embed_serializer_class is not None and get_relation(opts, source)[2] is not None:
+                        if not embed:
+                            self.add_links(opts, key, source, prefix, meta_opts)
+                        else:
+                            self.add_nested(opts, source, embed_serializer_class, prefix, embedded_selection, depth)
+                elif isinstance(field, HALModelSerializer):
+                    if not embed:
+                        self.add_links(opts, key, field.source or key, prefix, meta_opts)
+                    else:
+                        self.add_nested(opts, field.source or key, field.__class__, prefix, embedded_selection, depth)
+                else:
+                    self.add_field(opts, key, field, prefix, depth)
+
+    def add_nested(self, opts, source, serializer_class, prefix, selection=None, depth=None):
+        """
+        Join or prefetch the relation `source`, serialized with `serializer_class`.
+        """
+        kind, model_field, related_model = get_relation(opts, source)
+        if kind == 'forward':
+            self.add_column(prefix + source)
+            self.select_related.append(prefix + source)
+            self.add_serializer(serializer_class, prefix + source + '__', selection, depth)
+        elif kind in ('many', 'reverse'):
+            required = ()
+            if kind == 'reverse':
+                required = (model_field.field.name,)
+            self.prefetch_related.append((prefix + source, related_model,
+                                          HALQuerysetPlan(serializer_class, required, selection, depth)))
+        else:
+            self.only = None
+
+    def add_links(self, opts, key, source, prefix, meta_opts):
+        """
+        Read what the links replacing the embedded relation `source` need, past
+        `max_embed_depth`.
+        """
+        kind, model_field, related_model = get_relation(opts, source)
+        collection = meta_opts.related_collections.get(key)
+        if kind == 'forward':
+            self.add_column(prefix + source)
+        elif kind in ('many', 'reverse') and collection is not None:
+            view_name, lookup_mapping = collection
+            for attribute in lookup_mapping.values():
+                if get_relation(opts, attribute)[0] in ('column', 'forward'):
+                    self.add_column(prefix + attribute)
+                elif attribute != 'pk':
+                    self.only = None
+        elif kind in ('many', 'reverse'):
+            self.prefetch_related.append((prefix + source, related_model, None))
+        else:
+            self.only = None
+
+    def add_field(self, opts, key, field, prefix, depth=None):
+        source = field.source or key
+        kind, model_field, related_model = get_relation(opts, source)
+        nested = isinstance(field, BaseSerializer)
+        nested_hal = isinstance(field, HALModelSerializer)
+
+        if kind is None:
+            # Method fields, properties and dotted sources read unknown attributes
+            self.only = None
+        elif kind == 'column':
+            self.add_column(prefix + source)
+        elif nested_hal:
+            self.add_nested(opts, source, field.__class__, prefix, depth=depth)
+        elif kind == 'forward':
+            self.add_column(prefix + source)
+            if not nested and isinstance(field, HALHyperlinkedRelatedField) and \
+                    field.get_local_column(opts.concrete_model, key) is not None:
+                pass
+            else:
+                self.select_related.append(prefix + source)
+                self.only = None
+        elif getattr(field, 'many_links_from_values', False):
+            # Fetched with a values_list query by the field itself
+            pass
+        else:
+            self.prefetch_related.append((prefix + source, related_model, None))
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            lookups = []
+            for lookup, related_model, plan in self.prefetch_related:
+                if plan is None:
+                    lookups.append(lookup)
+                else:
+                    lookups.append(models.Prefetch(lookup, queryset=plan.apply(related_model._default_manager.all())))
+            queryset = queryset.prefetch_related(*lookups)
+        if self.only is not None:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+class HALSerializerMetaclass(SerializerMetaclass):
+    """
+    Watches the models that the cached representations of a serializer with
+    the `cache_representation` option depend on, once its class is defined
+    (see `drf_hal.cache.watch`).
+    """
+    def __init__(cls, name, bases, attrs):
+        super(HALSerializerMetaclass, cls).__init__(name, bases, attrs)
+        meta = getattr(cls, 'Meta', None)
+        if getattr(meta, 'cache_representation', False) and getattr(meta, 'model', None) and apps.models_ready:
+            serializer = cls()
+            watch((serializer.opts.model,) + serializer.get_cache_dependencies())
+
+
+class HALModelSerializer(six.with_metaclass(HALSerializerMetaclass, ModelSerializer)):
     """
     A subclass of ModelSerializer that follows the HAL specs (http://stateless.co/hal_specification.html).
     """
     _options_class = HALModelSerializerOptions
     _default_view_name = '%(model_name)s-detail'
-    _hyperlink_field_class = HyperlinkedRelatedField
+    _hyperlink_field_class = HALHyperlinkedRelatedField
 
     # Just a placeholder to ensure '_links' is the first field
     # The field itself is actually created on initialization,
     # when the view_name and lookup_field arguments are available.
     _links = Field()
 
+    # Compiled field layouts, keyed by serializer class.
+    _field_plans = {}
+
+    # Forward relations, keyed by model.
+    _model_relations = {}
+
+    # Models embedded in the representations, keyed by serializer class and field selection.
+    _cache_dependencies = {}
+
     def __init__(self, *args, **kwargs):
         self.additional_links = {}
         self.embedded_fields = {}
+        self.selection = kwargs.pop('selection', None)
 
         super(HALModelSerializer, self).__init__(*args, **kwargs)
 
@@ -44,6 +384,7 @@ class HALModelSerializer(ModelSerializer):
             view_name=self.opts.view_name,
             lookup_field=self.opts.lookup_field,
             additional_links=self.additional_links,
+            link_templates=self.opts.link_templates,
             )
         _links.initialize(self, '_links')
         self.fields['_links'] = _links
@@ -75,7 +416,9 @@ class HALModelSerializer(ModelSerializer):
         kwargs = {
             'queryset': related_model._default_manager,
             'view_name': self._get_default_view_name(related_model),
-            'many': to_many
+            'many': to_many,
+            'link_templates': self.opts.link_templates,
+            'many_links_from_values': self.opts.many_links_from_values,
         }
 
         if model_field:
@@ -88,11 +431,54 @@ class HALModelSerializer(ModelSerializer):
         This hook is required for bulk update.
         We need to override the default, to use the _links as the identity.
         """
+        links = getattr(data, 'links', None)
+        if links is not None:
+            # Split out by `HALParser`
+            return links.get('self')
         try:
             return data.get('_links', None) and data['_links'].get('self') and data['_links']['self'].get('href')
         except AttributeError:
             return None
 
+    def get_object_identity(self, obj):
+        """
+        Return the identity of an existing object, its self href, without
+        serializing the whole object.
+        """
+        links = self.fields['_links']
+        return links.get_url(obj, links.view_name, self.context.get('request'), self.context.get('format'))
+
+    def get_identity_objects(self, data, queryset):
+        """
+        Return the objects of `queryset` that the items of `data` identify
+        with their `_links.self.href`, fetched in one query.
+        """
+        lookup_fields = self.fields['_links'].lookup_field
+        if not isinstance(lookup_fields, (list, tuple)):
+            lookup_fields = (lookup_fields,)
+
+        lookups = set()
+        for item in data:
+            identity = self.get_identity(item) if isinstance(item, dict) else None
+            if not isinstance(identity, six.string_types):
+                continue
+            match = resolve_path(href_to_path(identity))
+            if match is None or match.view_name != self.opts.view_name:
+                continue
+            try:
+                lookups.add(tuple(match.kwargs[name] for name in lookup_fields))
+            except KeyError:
+                continue
+
+        if not lookups:
+            return []
+        if len(lookup_fields) == 1:
+            return list(queryset.filter(**{'%s__in' % lookup_fields[0]: [values[0] for values in lookups]}))
+        condition = models.Q()
+        for values in lookups:
+            condition |= models.Q(**dict(zip(lookup_fields, values)))
+        return list(queryset.filter(condition))
+
     def add_field_to_links(self, field_name, field):
         field.initialize(parent=self, field_name=field_name)
         self.additional_links[field_name] = field
@@ -224,10 +610,121 @@ class HALModelSerializer(ModelSerializer):
 
         return ret
 
+    @classmethod
+    def get_field_plan(cls):
+        """
+        Return the compiled field layout for this serializer class,
+        computing it on first use.
+        """
+        plan = cls._field_plans.get(cls)
+        if plan is None:
+            plan = cls._field_plans[cls] = HALFieldPlan(cls)
+        return plan
+
+    @classmethod
+    def invalidate_field_plan(cls):
+        """
+        Drop the compiled field layout of this class and its subclasses,
+        e.g. after mutating `Meta` in tests.
+        """
+        for serializer_class in list(cls._field_plans.keys()):
+            if issubclass(serializer_class, cls):
+                cls._field_plans.pop(serializer_class, None)
+        for key in list(cls._cache_dependencies.keys()):
+            if issubclass(key[0], cls):
+                cls._cache_dependencies.pop(key, None)
+
+    @classmethod
+    def optimize_queryset(cls, queryset, selection=None):
+        """
+        Return `queryset` with the `select_related`, `prefetch_related` and
+        `only` calls needed to serialize its objects with a constant number
+        of queries, reading only what `selection` asks for if given.
+        """
+        field_plan = cls.get_field_plan()
+        key = selection.key if selection is not None else None
+        queryset_plan = field_plan.queryset_plans.get(key)
+        if queryset_plan is None:
+            queryset_plan = HALQuerysetPlan(cls, selection=selection)
+            if len(field_plan.queryset_plans) < field_plan.max_queryset_plans:
+                field_plan.queryset_plans[key] = queryset_plan
+        return queryset_plan.apply(queryset)
+
+    def get_field_selection(self):
+        """
+        Return the `FieldSelection` of this serializer, given as `selection`
+        or in the `hal_fields` entry of the context, or None.
+        """
+        if self.selection is not None:
+            return self.selection
+        return self.context.get('hal_fields')
+
     def get_fields(self):
         """
         Returns the complete set of fields for the object as a dict.
 
+        The layout is taken from the cached field plan of the class unless
+        `cache_field_plan = False` is set on `Meta`, and pruned to the
+        field selection if there is one.
+        """
+        selection = self.get_field_selection()
+        if not self.opts.cache_field_plan:
+            ret = self.build_fields()
+        else:
+            ret = self.get_field_plan().clone(self, selection)
+        if selection is not None:
+            self.select_fields(ret, selection)
+        return ret
+
+    def select_fields(self, fields, selection):
+        """
+        Drop the fields, links and embedded fields that `selection` leaves
+        out, and embed the relations it asks for.
+        """
+        for section in (fields, self.additional_links, self.embedded_fields):
+            for key in list(section.keys()):
+                if not selection.includes(key):
+                    del section[key]
+        for field_name, embedded_selection in selection.get_embedded():
+            self.embed_field(fields, field_name, embedded_selection)
+
+    def embed_field(self, fields, field_name, selection=None):
+        """
+        Embed the relation `field_name` instead of linking it, or narrow an
+        embedded serializer down to `selection`.
+
+        Only the relations listed in `Meta.embeddable`, mapped to the
+        serializer class to embed them with, are embedded on demand; other
+        names are ignored.
+        """
+        field = self.embedded_fields.get(field_name)
+        if field is not None:
+            if selection is None or not isinstance(field, HALModelSerializer):
+                return
+            serializer_class, many, source = field.__class__, field.many, field.source
+        else:
+            serializer_class = self.opts.embeddable.get(field_name)
+            if serializer_class is None:
+                return
+            link = self.additional_links.get(field_name)
+            source = link and link.source
+            kind, model_field, related_model = get_relation(get_concrete_model(self.opts.model)._meta,
+                                                            source or field_name)
+            if related_model is None:
+                return
+            many = kind != 'forward'
+            self.additional_links.pop(field_name, None)
+            fields.pop(field_name, None)
+
+        field = serializer_class(many=many, source=source, read_only=True, selection=selection)
+        self.add_field_to_embedded(field_name, field)
+        if field_name in fields:
+            fields[field_name] = field
+
+    def build_fields(self):
+        """
+        Computes the complete set of fields for the object as a dict.
+
         This will be the set of any explicitly declared fields,
         plus the set of fields returned by get_default_fields().
         """
@@ -277,7 +774,10 @@ class HALModelSerializer(ModelSerializer):
         return ret
 
     def restore_initialize_field(self, field_name, field, data, files, reverted_data):
-        field.initialize(parent=self, field_name=field_name)
+        # Fields keep their parent between items of a list, so they only
+        # need initializing once per serializer.
+        if getattr(field, 'parent', None) is not self or field.root is not (self.root or self):
+            field.initialize(parent=self, field_name=field_name)
         try:
             field.field_from_native(data, files, field_name, reverted_data)
         except ValidationError as err:
@@ -287,45 +787,372 @@ class HALModelSerializer(ModelSerializer):
             else:
                 self._errors[field_name] = list(err.messages)
 
+    @classmethod
+    def get_model_relations(cls, model):
+        """
+        Return `{name: (model_field, related_model, to_many)}` for the
+        forward relations of `model`, computed once per model.
+        """
+        try:
+            return cls._model_relations[model]
+        except KeyError:
+            pass
+        opts = get_concrete_model(model)._meta
+        relations = {}
+        for model_field in opts.fields + opts.many_to_many:
+            if model_field.rel:
+                to_many = isinstance(model_field, models.fields.related.ManyToManyField)
+                relations[model_field.name] = (model_field, _resolve_model(model_field.rel.to), to_many)
+        cls._model_relations[model] = relations
+        return relations
+
+    def get_leftover_field(self, field_name):
+        """
+        Return the field restoring a relation that is in the data but not
+        among the fields, built on first use.
+        """
+        try:
+            return self._leftover_fields[field_name]
+        except AttributeError:
+            self._leftover_fields = {}
+        except KeyError:
+            pass
+        if not self.opts.cache_field_plan:
+            field = self.build_leftover_field(field_name)
+        else:
+            templates = self.get_field_plan().leftover_fields
+            template = templates.get(field_name)
+            if template is None:
+                template = templates[field_name] = self.build_leftover_field(field_name)
+            field = copy.deepcopy(template)
+        self._leftover_fields[field_name] = field
+        return field
+
+    def build_leftover_field(self, field_name):
+        model_field, related_model, to_many = self.get_model_relations(self.opts.model)[field_name]
+        if self.opts.depth:
+            return self.get_nested_field(model_field, related_model, to_many)
+        return self.get_related_field(model_field, related_model, to_many)
+
     def restore_fields(self, data, files):
         """
         Core of deserialization, together with `restore_object`.
         Converts a dictionary of data into a dictionary of deserialized fields.
         """
         reverted_data = {}
-        copy_data = data.copy()
 
         if data is not None and not isinstance(data, dict):
             self._errors['non_field_errors'] = ['Invalid data']
             return None
 
         for field_name, field in self.fields.items():
-            copy_data.pop(field_name, None)
             self.restore_initialize_field(field_name, field, data, files, reverted_data)
 
         # what's left of the data
         cls = self.opts.model
         assert cls is not None, \
             "Serializer class '%s' is missing 'model' Meta option" % self.__class__.__name__
-        opts = get_concrete_model(cls)._meta
-        nested = bool(self.opts.depth)
-        for field_name in copy_data.keys():
+        if data:
+            relations = self.get_model_relations(cls)
+            for field_name in data:
+                if field_name in relations and field_name not in self.fields:
+                    field = self.get_leftover_field(field_name)
+                    self.restore_initialize_field(field_name, field, data, files, reverted_data)
+
+        return reverted_data
+
+    def prepare_data(self, data):
+        """
+        Give the fields a chance to look up what the items of `data` refer
+        to all at once before they are restored one by one.
+        """
+        fields = list(self.fields.items())
+        relations = self.get_model_relations(self.opts.model)
+        leftover_names = set(field_name for item in data if isinstance(item, dict) for field_name in item
+                             if field_name in relations and field_name not in self.fields)
+        fields.extend((field_name, self.get_leftover_field(field_name)) for field_name in sorted(leftover_names))
+
+        seen = set()
+        for field_name, field in fields:
+            prefetch_data = getattr(field, 'prefetch_data', None)
+            if prefetch_data is not None and id(field) not in seen:
+                seen.add(id(field))
+                field.initialize(parent=self, field_name=field_name)
+                prefetch_data(data, field_name)
+
+    def clear_prepared_data(self):
+        for field in self.fields.values() + getattr(self, '_leftover_fields', {}).values():
+            clear_prefetched_data = getattr(field, 'clear_prefetched_data', None)
+            if clear_prefetched_data is not None:
+                clear_prefetched_data()
+
+    @property
+    def errors(self):
+        """
+        Same as `BaseSerializer.errors`, but the items of a list are prepared
+        in one go (see `prepare_data`), and the objects a list updates are
+        identified with `get_object_identity` instead of being serialized.
+        """
+        data = self.init_data
+        if self._errors is not None or not self.many or not hasattr(data, '__iter__') or \
+                isinstance(data, (dict, six.text_type)):
+            return super(HALModelSerializer, self).errors
+
+        self.init_data = data = list(data)
+        self.prepare_data(data)
+        # `BaseSerializer.errors` identifies the objects by `to_native(obj)`
+        self.to_native = self.identity_native
+        try:
+            return super(HALModelSerializer, self).errors
+        finally:
+            del self.to_native
+            self.clear_prepared_data()
+
+    def identity_native(self, obj):
+        return {'_links': {'self': {'href': self.get_object_identity(obj)}}}
+
+    def get_prefetched_foreign_keys(self, instance):
+        """
+        Return the foreign keys of `instance` to objects fetched by
+        `prepare_data`; they are known to exist, so model validation need not
+        query them again.
+        """
+        ret = []
+        opts = get_concrete_model(self.opts.model)._meta
+        for field_name, field in self.fields.items():
+            is_prefetched = getattr(field, 'is_prefetched', None)
+            if is_prefetched is None:
+                continue
+            source = field.source or field_name
             try:
-                model_field_tuple = opts.get_field_by_name(field_name)
-                model_field = model_field_tuple[0]
+                model_field = opts.get_field(source)
             except models.FieldDoesNotExist:
                 continue
-            if model_field.rel:
-                related_model = _resolve_model(model_field.rel.to)
-                to_many = isinstance(model_field,
-                                     models.fields.related.ManyToManyField)
-                if nested:
-                    field = self.get_nested_field(model_field, related_model, to_many)
-                else:
-                    field = self.get_related_field(model_field, related_model, to_many)
-                self.restore_initialize_field(field_name, field, data, files, reverted_data)
+            if isinstance(model_field, models.ForeignKey) and not model_field.rel.limit_choices_to and \
+                    is_prefetched(getattr(instance, source, None)):
+                ret.append(source)
+        return ret
 
-        return reverted_data
+    def full_clean(self, instance):
+        """
+        Leave the foreign keys returned by `get_prefetched_foreign_keys` out of
+        the field validation of the model, which would query them again. They
+        are still part of the unique checks.
+        """
+        prefetched = self.get_prefetched_foreign_keys(instance)
+        if not prefetched:
+            return super(HALModelSerializer, self).full_clean(instance)
+
+        clean_fields = instance.clean_fields
+        instance.clean_fields = lambda exclude=None: clean_fields(exclude=list(exclude or ()) + prefetched)
+        try:
+            return super(HALModelSerializer, self).full_clean(instance)
+        finally:
+            del instance.clean_fields
+
+    def has_nested_data(self, obj):
+        return bool(getattr(obj, '_nested_forward_relations', None) or getattr(obj, '_m2m_data', None) or
+                    getattr(obj, '_related_data', None))
+
+    def save_objects(self, objects, **kwargs):
+        """
+        Save a list of deserialized objects.
+
+        With the `bulk_create` option, new objects without nested or
+        many-to-many data are inserted with `bulk_insert`. As `bulk_create`
+        sends no `post_save`, the cached representations of the model are
+        invalidated here.
+        """
+        created = []
+        for obj in objects:
+            if self.opts.bulk_create and obj._state.adding and not kwargs and not self.has_nested_data(obj):
+                created.append(obj)
+            else:
+                self.save_object(obj, **kwargs)
+        if created:
+            self.bulk_insert(created)
+            invalidate(self.opts.model, [obj.pk for obj in created if obj.pk is not None])
+
+    def bulk_insert(self, objects):
+        """
+        Insert `objects` with `bulk_create`, `bulk_batch_size` at a time, and
+        set their primary key, which `bulk_create` does not do on Django 1.7.
+
+        The keys of an `AutoField` are read back in one query: the rows above
+        the highest key before the insert, in key order, which is the order of
+        insertion. This runs in the transaction of `save`; if other rows show
+        up in the meantime the count differs and the objects are left without
+        a key, as they are with any other kind of primary key.
+        """
+        model = self.opts.model
+        using = router.db_for_write(model)
+        manager = model._default_manager.db_manager(using)
+        if not isinstance(model._meta.pk, models.AutoField) or any(obj.pk is not None for obj in objects):
+            manager.bulk_create(objects, batch_size=self.opts.bulk_batch_size)
+            return
+
+        last_pk = manager.aggregate(last_pk=models.Max('pk'))['last_pk']
+        manager.bulk_create(objects, batch_size=self.opts.bulk_batch_size)
+        inserted = manager.all() if last_pk is None else manager.filter(pk__gt=last_pk)
+        pks = list(inserted.order_by('pk').values_list('pk', flat=True))
+        if len(pks) != len(objects):
+            return
+        for obj, pk in zip(objects, pks):
+            obj.pk = pk
+            obj._state.adding = False
+            obj._state.db = using
+
+    def save(self, **kwargs):
+        """
+        Save the deserialized object and return it. Lists of objects are
+        saved in one transaction with `save_objects`.
+        """
+        if not isinstance(self.object, list):
+            return super(HALModelSerializer, self).save(**kwargs)
+
+        # Clear cached _data, which may be invalidated by `save()`
+        self._data = None
+        with transaction.atomic():
+            self.save_objects(self.object, **kwargs)
+            if getattr(self.object, '_deleted', None):
+                [self.delete_object(item) for item in self.object._deleted]
+        return self.object
+
+    def prepare_objects(self, objects):
+        """
+        Give the fields a chance to fetch data for all `objects` at once
+        before they are serialized one by one.
+        """
+        seen = set()
+        for fields in (self.additional_links, self.fields):
+            for field_name, field in fields.items():
+                prefetch_objects = getattr(field, 'prefetch_objects', None)
+                if prefetch_objects is not None and id(field) not in seen:
+                    seen.add(id(field))
+                    prefetch_objects(objects, field_name)
+
+    def clear_prepared_objects(self):
+        for fields in (self.additional_links, self.fields):
+            for field in fields.values():
+                clear_prefetched_objects = getattr(field, 'clear_prefetched_objects', None)
+                if clear_prefetched_objects is not None:
+                    clear_prefetched_objects()
+
+    def serialize_many(self, objects):
+        """
+        Serialize an iterable of objects -> list of primitives.
+        """
+        objects = list(objects)
+        if self.opts.cache_representation and all(getattr(obj, 'pk', None) is not None for obj in objects):
+            return self.serialize_cached(objects, self.serialize_objects)
+        return self.serialize_objects(objects)
+
+    def serialize_objects(self, objects):
+        self.prepare_objects(objects)
+        try:
+            return [self.to_native(item) for item in objects]
+        finally:
+            # What was fetched for `objects` must not outlive them
+            self.clear_prepared_objects()
+
+    def represent(self, obj):
+        """
+        Serialize a single object, through the representation cache with the
+        `cache_representation` option.
+        """
+        if not self.opts.cache_representation or getattr(obj, 'pk', None) is None:
+            return self.to_native(obj)
+        return self.serialize_cached([obj], lambda objects: [self.to_native(objects[0])])[0]
+
+    def serialize_cached(self, objects, serialize):
+        """
+        Return the natives of `objects` from the representation cache,
+        serializing the missing ones with `serialize` (see `drf_hal.cache`).
+        """
+        request = self.context.get('request')
+        selection = self.get_field_selection()
+        identity = (self.__class__.__module__, self.__class__.__name__, selection and selection.key,
+                    request.build_absolute_uri('/') if request is not None else None, self.context.get('format'),
+                    self.get_embed_limits())
+        return get_representation_cache(self.opts.cache_alias).serialize(
+            objects, serialize, identity, self.opts.model, self.get_cache_dependencies(), self.opts.cache_timeout)
+
+    def get_cache_dependencies(self):
+        """
+        Return the models whose objects are embedded or listed in the
+        representation, so that changes to them invalidate it.
+        """
+        selection = self.get_field_selection()
+        key = (self.__class__, selection and selection.key)
+        dependencies = self._cache_dependencies.get(key)
+        if dependencies is None:
+            dependencies = set()
+            opts = get_concrete_model(self.opts.model)._meta
+            for fields in (self.fields, self.additional_links, self.embedded_fields):
+                for field_name, field in fields.items():
+                    if field_name in ('_links', '_embedded'):
+                        continue
+                    kind, model_field, related_model = get_relation(opts, field.source or field_name)
+                    if isinstance(field, HALModelSerializer):
+                        dependencies.add(field.opts.model)
+                        dependencies.update(field.get_cache_dependencies())
+                    elif kind in ('many', 'reverse'):
+                        dependencies.add(related_model)
+            dependencies = self._cache_dependencies[key] = tuple(
+                sorted(dependencies, key=lambda model: model._meta.db_table))
+        return dependencies
+
+    @property
+    def data(self):
+        """
+        Returns the serialized data on the serializer, with lists serialized
+        by `serialize_many` and objects through `represent`.
+        """
+        if self._data is None:
+            if self.many:
+                self._data = self.serialize_many(self.object)
+            elif isinstance(self.object, models.Model):
+                self._data = self.represent(self.object)
+        return super(HALModelSerializer, self).data
+
+    def field_to_native(self, obj, field_name):
+        """
+        Override default so that lists of nested objects go through
+        `serialize_many`, and nested objects through `embed_native`.
+        """
+        if self.write_only or self.source == '*' or '.' in (self.source or ''):
+            return super(HALModelSerializer, self).field_to_native(obj, field_name)
+        try:
+            value = get_component(obj, self.source or field_name)
+        except ObjectDoesNotExist:
+            return None
+        if is_simple_callable(getattr(value, 'all', None)):
+            return self.serialize_many(value.all())
+        if isinstance(value, models.Model):
+            return self.embed_native(value)
+        if self.many and value is not None:
+            return self.serialize_many(value)
+        return super(HALModelSerializer, self).field_to_native(obj, field_name)
+
+    def embed_native(self, obj):
+        """
+        Serialize an embedded object, once per request when the same object
+        is embedded several times and the `memoize_embedded` option is set
+        (see `drf_hal.memo`).
+        """
+        if not self.opts.memoize_embedded:
+            return self.represent(obj)
+        memo = get_memo(self.context)
+        pk = getattr(obj, 'pk', None)
+        if memo is None or pk is None:
+            return self.represent(obj)
+        key = (self.__class__, pk, self.selection and self.selection.key, self.get_embed_limits(),
+               self.context.get('format'))
+        native = memo.get_object(key)
+        if native is None:
+            native = self.represent(obj)
+            memo.set_object(key, native)
+        return native
 
     def to_native(self, obj):
         """
@@ -333,20 +1160,205 @@ class HALModelSerializer(ModelSerializer):
         """
         ret = self._dict_class()
         ret.fields = self._dict_class()
+        profile = get_profile(self.context)
 
-        for field_name, field in self.fields.items():
-            if field.read_only and obj is None or \
-                            field_name in self.additional_links or \
-                            field_name in self.embedded_fields:
+        for field_name, field, key, transform, write_only, profile_name in self.get_active_fields():
+            if obj is None and field.read_only:
                 continue
-            field.initialize(parent=self, field_name=field_name)
-            key = self.get_field_key(field_name)
-            value = field.field_to_native(obj, field_name)
-            method = getattr(self, 'transform_%s' % field_name, None)
-            if callable(method):
-                value = method(obj, value)
-            if not getattr(field, 'write_only', False):
+            if profile is None:
+                value = field.field_to_native(obj, field_name)
+            else:
+                value = profile.record(profile_name, field.field_to_native, obj, field_name)
+            if transform is not None:
+                value = transform(obj, value)
+            if not write_only:
                 ret[key] = value
             ret.fields[key] = self.augment_field(field, field_name, key, value)
 
+        embedded = ret.get('_embedded')
+        if embedded and self.get_embed_limits() is not None:
+            self.apply_embed_fallbacks(ret, embedded)
         return ret
+
+    def get_active_fields(self):
+        """
+        Return `(field_name, field, key, transform, write_only, profile name)`
+        for each field `to_native` serializes, with the fields initialized.
+
+        Computed once per serializer and root, as fields keep their parent
+        from one object to the next.
+        """
+        root = self.root or self
+        active_fields = getattr(self, '_active_fields', None)
+        if active_fields is not None and self._active_fields_root is root:
+            return active_fields
+        active_fields = []
+        for field_name, field in self.fields.items():
+            if field_name in self.additional_links or field_name in self.embedded_fields:
+                continue
+            field.initialize(parent=self, field_name=field_name)
+            transform = getattr(self, 'transform_%s' % field_name, None)
+            active_fields.append((field_name, field, self.get_field_key(field_name),
+                                  transform if callable(transform) else None, getattr(field, 'write_only', False),
+                                  '%s.%s' % (self.__class__.__name__, field_name)))
+        self._active_fields = active_fields
+        self._active_fields_root = root
+        return active_fields
+
+    def get_embed_limits(self):
+        """
+        Return `(embed, max_items)` for the relations this serializer embeds,
+        or None when no limits apply.
+
+        `max_embed_depth` bounds the levels of `_embedded` below a serializer,
+        so relations are only embedded when every serializer above allows one
+        more level; the others are linked, to-many relations to their
+        collection of `related_collections` if they have one.
+        `max_embedded_items` bounds the items of each to-many relation the
+        serializer embeds; past it, the relation is linked to the collection
+        of `related_collections` and its size given as `<relation>_count`.
+        """
+        try:
+            return self._embed_limits
+        except AttributeError:
+            pass
+        embed, limited = True, False
+        serializer, levels = self, 1
+        while serializer is not None:
+            if isinstance(serializer, HALModelSerializer):
+                max_embed_depth = serializer.opts.max_embed_depth
+                if max_embed_depth is not None:
+                    limited = True
+                    embed = embed and levels <= max_embed_depth
+                levels += 1
+            serializer = getattr(serializer, 'parent', None)
+        max_items = self.opts.max_embedded_items
+        limits = (embed, max_items) if limited or max_items is not None else None
+        if self.parent is not None or self.root is self:
+            # The chain of parents is known once the serializer is bound
+            self._embed_limits = limits
+        return limits
+
+    def embed_field_to_native(self, field, obj, field_name):
+        """
+        Serialize the embedded `field`, or, past the embed limits, return an
+        `EmbedFallback` emitting the relation in `_links`.
+        """
+        limits = self.get_embed_limits()
+        if limits is None:
+            return field.field_to_native(obj, field_name)
+        embed, max_items = limits
+        link_field = self.get_fallback_link_field(field, field_name)
+        if link_field is None:
+            # Not a relation of the model, e.g. a method field
+            return field.field_to_native(obj, field_name)
+        if not embed:
+            collection_link = self.get_collection_link(obj, field_name) if link_field.many else None
+            if collection_link is not None:
+                return EmbedFallback(links=collection_link)
+            return EmbedFallback(links=self.get_fallback_links(link_field, obj, field_name))
+        if max_items is None or not getattr(field, 'many', False):
+            return field.field_to_native(obj, field_name)
+
+        try:
+            value = get_component(obj, field.source or field_name)
+        except ObjectDoesNotExist:
+            return None
+        if value is None:
+            return None
+        if is_simple_callable(getattr(value, 'all', None)):
+            value = value.all()
+        items = list(value[:max_items + 1])
+        truncated = len(items) > max_items
+        items = items[:max_items]
+        serialize_many = getattr(field, 'serialize_many', None)
+        native = serialize_many(items) if serialize_many is not None else [field.to_native(item) for item in items]
+        if not truncated:
+            return native
+        count = value.count() if isinstance(value, QuerySet) else len(value)
+        return EmbedFallback(native, self.get_collection_link(obj, field_name), count)
+
+    def get_fallback_link_field(self, field, field_name):
+        """
+        Return the field linking the embedded relation `field_name`, or None
+        if it is not a relation of the model.
+        """
+        try:
+            fallback_link_fields = self._fallback_link_fields
+        except AttributeError:
+            fallback_link_fields = self._fallback_link_fields = {}
+        try:
+            return fallback_link_fields[field_name]
+        except KeyError:
+            pass
+        if not self.opts.cache_field_plan:
+            link_field = self.build_fallback_link_field(field, field_name)
+        else:
+            templates = self.get_field_plan().fallback_link_fields
+            if field_name not in templates:
+                templates[field_name] = self.build_fallback_link_field(field, field_name)
+            link_field = copy.deepcopy(templates[field_name])
+        if link_field is not None:
+            link_field.initialize(parent=self, field_name=field_name)
+        fallback_link_fields[field_name] = link_field
+        return link_field
+
+    def build_fallback_link_field(self, field, field_name):
+        source = field.source or field_name
+        kind, model_field, related_model = get_relation(get_concrete_model(self.opts.model)._meta, source)
+        if related_model is None:
+            return None
+        if not isinstance(model_field, models.Field):
+            model_field = None
+        link_field = self.get_related_field(model_field, related_model, kind != 'forward')
+        link_field.source = field.source
+        return link_field
+
+    def get_fallback_links(self, link_field, obj, field_name):
+        href = link_field.field_to_native(obj, field_name)
+        if link_field.many:
+            return [{'href': link} for link in href]
+        return {'href': href} if href is not None else None
+
+    def get_collection_link(self, obj, field_name):
+        """
+        Return the link to the collection of objects related to `obj` by
+        `field_name`, given in `related_collections` as `(view_name,
+        lookup_mapping)` as for `HALLinkField`, or None.
+        """
+        try:
+            collection_link_fields = self._collection_link_fields
+        except AttributeError:
+            collection_link_fields = self._collection_link_fields = {}
+        try:
+            link_field = collection_link_fields[field_name]
+        except KeyError:
+            link_field = None
+            collection = self.opts.related_collections.get(field_name)
+            if collection is not None:
+                view_name, lookup_mapping = collection
+                link_field = HALLinkField(view_name=view_name, lookup_mapping=lookup_mapping)
+                link_field.initialize(parent=self, field_name=field_name)
+            collection_link_fields[field_name] = link_field
+        if link_field is None:
+            return None
+        href = link_field.field_to_native(obj, field_name)
+        return {'href': href} if href is not None else None
+
+    def apply_embed_fallbacks(self, ret, embedded):
+        """
+        Move the relations cut by the embed limits from `_embedded` to `_links`.
+        """
+        for key, value in list(embedded.items()):
+            if not isinstance(value, EmbedFallback):
+                continue
+            if value.links is not None:
+                ret['_links'][key] = value.links
+            if value.count is not None:
+                ret['%s_count' % key] = value.count
+            if value.native is None:
+                del embedded[key]
+            else:
+                embedded[key] = value.native
+        if not embedded:
+            del ret['_embedded']
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.contrib.auth.models import Group
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from rest_framework.request import Request
+
+from drf_hal.cache import get_representation_cache
+from drf_hal.fieldsets import FieldSelection
+from drf_hal.serializers import HALModelSerializer
+from sample_app.models import Channel, Choice, Partner, Poll
+
+
+class CachedChoiceSerializer(HALModelSerializer):
+    class Meta:
+        model = Choice
+        cache_representation = True
+
+
+class CachedPollSerializer(HALModelSerializer):
+    choices = CachedChoiceSerializer(many=True)
+
+    class Meta:
+        model = Poll
+        cache_representation = True
+
+
+class CachedChannelSerializer(HALModelSerializer):
+    class Meta:
+        model = Channel
+        cache_representation = True
+
+
+class BulkCachedChoiceSerializer(HALModelSerializer):
+    class Meta:
+        model = Choice
+        bulk_create = True
+
+
+class TestRepresentationCache(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.representation_cache = get_representation_cache()
+        self.representation_cache.reset_stats()
+        self.poll = Poll.objects.create(question='Poll', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.choice = Choice.objects.create(poll=self.poll, choice_text='Choice')
+        self.context = {'request': Request(RequestFactory().get('/'))}
+
+    def tearDown(self):
+        caches['default'].clear()
+
+    def serialize(self, serializer_class, obj, **context):
+        context.update(self.context)
+        return serializer_class(obj, context=context).data
+
+    def test_hit_skips_serialization(self):
+        poll = Poll.objects.get(pk=self.poll.pk)
+        data = self.serialize(CachedPollSerializer, poll)
+        # the poll and its choice
+        self.assertEqual(self.representation_cache.get_stats()['misses'], 2)
+
+        with self.assertNumQueries(0):
+            cached = self.serialize(CachedPollSerializer, poll)
+        self.assertEqual(cached, data)
+        self.assertEqual(self.representation_cache.get_stats(), {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3.0})
+
+    def test_many(self):
+        choices = list(Choice.objects.all())
+        CachedChoiceSerializer(choices, many=True, context=self.context).data
+        data = CachedChoiceSerializer(choices, many=True, context=self.context).data
+        self.assertEqual(data[0]['choice_text'], 'Choice')
+        self.assertEqual(self.representation_cache.hits, 1)
+
+    def test_save_invalidates_object(self):
+        self.serialize(CachedPollSerializer, self.poll)
+        self.poll.question = 'Updated'
+        self.poll.save()
+        self.assertEqual(self.serialize(CachedPollSerializer, self.poll)['question'], 'Updated')
+
+    def test_other_objects_stay_cached(self):
+        other = Poll.objects.create(question='Other', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.serialize(CachedPollSerializer, self.poll)
+        other.save()
+        self.serialize(CachedPollSerializer, self.poll)
+        self.assertEqual(self.representation_cache.hits, 1)
+
+    def test_embedded_model_change_invalidates(self):
+        self.serialize(CachedPollSerializer, self.poll)
+        Choice.objects.create(poll=self.poll, choice_text='New')
+        data = self.serialize(CachedPollSerializer, self.poll)
+        self.assertEqual(len(data['_embedded']['choices']), 2)
+
+    def test_delete_invalidates(self):
+        self.serialize(CachedPollSerializer, self.poll)
+        self.choice.delete()
+        data = self.serialize(CachedPollSerializer, self.poll)
+        self.assertEqual(data['_embedded']['choices'], [])
+
+    def test_invalidate_bumps_versions_of_models_not_cached_in_the_process(self):
+        key = self.representation_cache.object_version_key(Partner, 1)
+        version = self.representation_cache.get_versions([key])[key]
+        Partner.objects.create(pk=1, name='Partner')
+        self.assertNotEqual(self.representation_cache.get_versions([key])[key], version)
+
+    def test_models_without_cached_representations_are_not_watched(self):
+        Session.objects.create(session_key='key', session_data='', expire_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.assertIsNone(caches['default'].get(self.representation_cache.model_version_key(Session)))
+
+    def test_models_are_watched_once_the_serializer_is_defined(self):
+        class CachedGroupSerializer(HALModelSerializer):
+            class Meta:
+                model = Group
+                cache_representation = True
+
+        Group.objects.create(name='Group')
+        self.assertIsNotNone(caches['default'].get(self.representation_cache.model_version_key(Group)))
+
+    def test_bulk_create_invalidates(self):
+        self.serialize(CachedPollSerializer, self.poll)
+        data = [{'poll': 'http://testserver/poll/%s' % self.poll.pk, 'choice_text': 'New'}]
+        serializer = BulkCachedChoiceSerializer(data=data, many=True, context=self.context)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        data = self.serialize(CachedPollSerializer, self.poll)
+        self.assertEqual(len(data['_embedded']['choices']), 2)
+
+    def test_m2m_change_invalidates(self):
+        channel = Channel.objects.create(name='Channel')
+        partner = Partner.objects.create(name='Partner')
+        self.assertEqual(self.serialize(CachedChannelSerializer, channel)['_links']['partner'], [])
+        channel.partner.add(partner)
+        links = self.serialize(CachedChannelSerializer, channel)['_links']['partner']
+        self.assertEqual(links, [{'href': 'http://testserver/partner/%s' % partner.pk}])
+
+    def test_selection_is_part_of_the_key(self):
+        self.serialize(CachedPollSerializer, self.poll)
+        data = self.serialize(CachedPollSerializer, self.poll, hal_fields=FieldSelection.parse('question'))
+        self.assertEqual(set(data.keys()), set(['_links', 'question']))
+
+    def test_dependencies(self):
+        self.assertEqual(CachedPollSerializer().get_cache_dependencies(), (Choice,))
+        self.assertEqual(CachedChannelSerializer().get_cache_dependencies(), (Partner,))
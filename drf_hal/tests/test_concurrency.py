@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+import threading
+
+from django.contrib.auth.models import Group, User
+from django.db import connections
+from django.db.models import Prefetch
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from mock import patch
+from rest_framework.generics import RetrieveAPIView
+
+from drf_hal.concurrency import ConcurrentPrefetchQuerySet, _pools, can_load_concurrently, close_pools, \
+    group_lookups, prefetch_concurrently, prefetch_related_objects_concurrently, run_concurrently
+from drf_hal.mixins import ConcurrentPrefetchMixin, OptimizedQuerysetMixin
+from drf_hal.serializers import HALModelSerializer
+from sample_app.models import Choice, Poll, UserProfile
+from sample_app.serializers import CreatePollWithChoicesSerializer
+
+
+class PollView(ConcurrentPrefetchMixin, OptimizedQuerysetMixin, RetrieveAPIView):
+    model = Poll
+    serializer_class = CreatePollWithChoicesSerializer
+    prefetch_workers = 2
+
+
+class TestConcurrency(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        self.poll = Poll.objects.create(question='Poll', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        for index in xrange(3):
+            Choice.objects.create(poll=self.poll, choice_text='Choice%s' % index)
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def test_group_lookups(self):
+        choices = Prefetch('choices', queryset=Choice.objects.all())
+        self.assertEqual(group_lookups(['groups', choices, 'groups__permissions', 'user_permissions']),
+                         [['groups', 'groups__permissions'], [choices], ['user_permissions']])
+
+    def test_run_concurrently(self):
+        barrier = threading.Event()
+        threads = []
+
+        def wait():
+            threads.append(threading.current_thread())
+            # Only returns if the other function runs at the same time
+            return barrier.wait(5)
+
+        def release():
+            threads.append(threading.current_thread())
+            barrier.set()
+            return True
+
+        self.assertEqual(run_concurrently([wait, release], workers=2), [True, True])
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_run_single_function_inline(self):
+        self.assertEqual(run_concurrently([threading.current_thread]), [threading.current_thread()])
+
+    def test_connections_are_kept_by_the_threads(self):
+        def get_connection():
+            connection = connections['default']
+            connection.cursor().execute('SELECT 1')
+            return threading.current_thread(), connection.connection
+
+        thread_connections = {}
+        for index in xrange(3):
+            for thread, connection in run_concurrently([get_connection, get_connection], workers=2):
+                thread_connections.setdefault(thread, set()).add(connection)
+        self.assertTrue(all(len(seen) == 1 for seen in thread_connections.values()))
+
+        close_pools()
+        self.assertEqual(_pools, {})
+        self.assertTrue(all(not thread.is_alive() for thread in thread_connections))
+
+    def test_old_connections_are_closed_around_each_call(self):
+        lock = threading.Lock()
+        calls = {}
+
+        def record(name):
+            with lock:
+                calls.setdefault(threading.current_thread(), []).append(name)
+            return name
+
+        with patch('drf_hal.concurrency.close_old_connections', lambda: record('close_old_connections')):
+            self.assertEqual(run_concurrently([lambda: record('function')] * 4, workers=2), ['function'] * 4)
+        self.assertEqual(sum(len(names) for names in calls.values()), 12)
+        for names in calls.values():
+            self.assertEqual(names, ['close_old_connections', 'function', 'close_old_connections'] * (len(names) // 3))
+
+    def test_prefetch_in_threads(self):
+        user = User.objects.create(username='user')
+        user.groups.add(Group.objects.create(name='group'))
+        UserProfile.objects.create(user=user)
+        users = list(User.objects.all())
+
+        # The in-memory test database is shared with the threads, one query at a time
+        connection = connections['default']
+        lock = threading.Lock()
+        threads = set()
+
+        def call_with_test_connection(function):
+            connections['default'] = connection
+            threads.add(threading.current_thread())
+            try:
+                with lock:
+                    return function()
+            finally:
+                del connections['default']
+
+        connection.allow_thread_sharing = True
+        try:
+            with patch('drf_hal.concurrency.call_with_connections', call_with_test_connection):
+                prefetch_related_objects_concurrently(users, ['groups', 'profile', 'user_permissions'], workers=2)
+        finally:
+            connection.allow_thread_sharing = False
+        self.assertNotIn(threading.current_thread(), threads)
+        with self.assertNumQueries(0):
+            self.assertEqual([group.name for group in users[0].groups.all()], ['group'])
+            self.assertEqual(len(users[0].profile.all()), 1)
+            self.assertEqual(list(users[0].user_permissions.all()), [])
+
+    def test_in_memory_database_is_loaded_serially(self):
+        self.assertFalse(can_load_concurrently('default'))
+        poll = prefetch_concurrently(Poll.objects.prefetch_related('choices')).get()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(poll.choices.all()), 3)
+
+    def test_workers_are_kept_by_clones(self):
+        queryset = prefetch_concurrently(Poll.objects.all(), 2).filter(pk=self.poll.pk)
+        self.assertIsInstance(queryset, ConcurrentPrefetchQuerySet)
+        self.assertEqual(queryset.prefetch_workers, 2)
+
+    def test_view(self):
+        view = PollView()
+        view.request = RequestFactory().get('/')
+        view.kwargs = {}
+        queryset = view.get_queryset()
+        self.assertIsInstance(queryset, ConcurrentPrefetchQuerySet)
+        self.assertEqual(queryset._prefetch_related_lookups[0].prefetch_through, 'choices')
+        response = PollView.as_view()(RequestFactory().get('/'), pk=self.poll.pk)
+        self.assertEqual(len(response.data['_embedded']['choices']), 3)
+
+    def test_view_write_is_not_concurrent(self):
+        view = PollView()
+        view.request = RequestFactory().put('/')
+        view.kwargs = {}
+        self.assertNotIsInstance(view.get_queryset(), ConcurrentPrefetchQuerySet)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from drf_hal.counts import CachedCount, EstimatedCount, ExactCount
+from sample_app.models import Poll
+
+
+class FixedEstimateCount(EstimatedCount):
+    def __init__(self, estimate, *args, **kwargs):
+        self.fixed_estimate = estimate
+        super(FixedEstimateCount, self).__init__(*args, **kwargs)
+
+    def estimate(self, queryset):
+        return self.fixed_estimate
+
+
+class TestCountStrategies(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        for index in xrange(0, 5):
+            Poll.objects.create(question='Poll%s' % index, pub_date=date(2014, 8, 8))
+
+    def tearDown(self):
+        caches['default'].clear()
+
+    def test_exact_count(self):
+        self.assertEqual(ExactCount()(Poll.objects.all()), (5, False))
+
+    def test_cached_count_is_keyed_on_query(self):
+        strategy = CachedCount(timeout=60)
+        self.assertEqual(strategy(Poll.objects.all()), (5, False))
+        with self.assertNumQueries(0):
+            self.assertEqual(strategy(Poll.objects.all()), (5, False))
+        self.assertEqual(strategy(Poll.objects.filter(question='Poll1')), (1, False))
+
+    def test_cached_count_of_empty_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedCount()(Poll.objects.filter(pk__in=[])), (0, False))
+
+    def test_estimated_count_above_threshold(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(FixedEstimateCount(20000, threshold=10000)(Poll.objects.all()), (20000, True))
+
+    def test_estimated_count_below_threshold_is_exact(self):
+        self.assertEqual(FixedEstimateCount(50, threshold=10000)(Poll.objects.all()), (5, False))
+
+    def test_estimated_count_without_estimate_is_exact(self):
+        self.assertEqual(EstimatedCount(threshold=0)(Poll.objects.all()), (5, False))
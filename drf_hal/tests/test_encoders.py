@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils.datastructures import SortedDict
+from django.utils.timezone import utc
+from django.utils.translation import ugettext_lazy
+
+from drf_hal.encoders import HALJSONEncoder, SimpleJSONBackend, StdlibJSONBackend, get_default_json_backend
+from drf_hal.renderers import HALRenderer
+
+
+class TestJSONBackends(TestCase):
+    def setUp(self):
+        self.value = SortedDict([
+            ('_links', {'self': {'href': 'http://testserver/poll/1'}}),
+            ('question', ugettext_lazy('Question')),
+            ('text', u'Café'),
+            ('pub_date', datetime(2014, 1, 3, 10, 30, 0, 123456, tzinfo=utc)),
+            ('day', date(2014, 1, 3)),
+            ('price', Decimal('1.10')),
+            ('pair', (1, 2)),
+        ])
+        self.expected = (b'{"_links": {"self": {"href": "http://testserver/poll/1"}}, "question": "Question", '
+                         b'"text": "Caf\\u00e9", "pub_date": "2014-01-03T10:30:00.123Z", "day": "2014-01-03", '
+                         b'"price": "1.10", "pair": [1, 2]}')
+
+    def test_stdlib(self):
+        self.assertEqual(StdlibJSONBackend().dumps(self.value), self.expected)
+
+    def test_simplejson(self):
+        self.assertEqual(SimpleJSONBackend().dumps(self.value), self.expected)
+
+    def test_backends_agree_without_ascii(self):
+        self.assertEqual(StdlibJSONBackend().dumps(self.value, ensure_ascii=False),
+                         SimpleJSONBackend().dumps(self.value, ensure_ascii=False))
+
+    def test_backends_agree_when_indented(self):
+        self.assertEqual(StdlibJSONBackend().dumps(self.value, indent=2),
+                         SimpleJSONBackend().dumps(self.value, indent=2))
+
+    def test_simplejson_refuses_encode_overrides(self):
+        class Encoder(HALJSONEncoder):
+            def iterencode(self, o, _one_shot=False):
+                return super(Encoder, self).iterencode(o, _one_shot)
+        self.assertRaises(ValueError, SimpleJSONBackend, Encoder)
+
+    def test_default_backend_is_stdlib(self):
+        self.assertIsInstance(get_default_json_backend(), StdlibJSONBackend)
+
+
+class TestHALRenderer(TestCase):
+    def test_render_with_backend(self):
+        class Backend(object):
+            def dumps(self, value, indent=None, ensure_ascii=True):
+                return b'%s' % indent
+
+        class Renderer(HALRenderer):
+            json_backend = Backend()
+        self.assertEqual(Renderer().render({}, 'application/hal+json; indent=2'), b'2')
+
+    def test_render_none(self):
+        self.assertEqual(HALRenderer().render(None), b'')
+
+    def test_encode(self):
+        self.assertEqual(HALRenderer().encode({'price': Decimal('2')}), b'{"price": "2"}')
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from mock import patch
+from rest_framework.request import Request
+
+from drf_hal.fields import HALEmbeddedFieldValidationError
+from drf_hal.serializers import HALModelSerializer
+from sample_app.models import Choice, Poll
+from sample_app.serializers import ChoiceRelatedSerializer, CreatePollWithChoicesSerializer
+
+
+class TestHALEmbeddedField(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        pub_date = datetime(2014, 1, 3, tzinfo=utc)
+        self.polls = [Poll.objects.create(question='Poll%s' % index, pub_date=pub_date) for index in xrange(3)]
+        for poll in self.polls[:2]:
+            for index in xrange(2):
+                Choice.objects.create(poll=poll, choice_text='%s.Choice%s' % (poll.question, index))
+        self.context = {'request': Request(RequestFactory().get('/polls')), 'hal_memo': None}
+        self.queryset = CreatePollWithChoicesSerializer.optimize_queryset(Poll.objects.order_by('pk'))
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def test_embedded_fields_are_initialized_once(self):
+        serializer = CreatePollWithChoicesSerializer(context=self.context)
+        embedded = serializer.fields['_embedded']
+        with patch.object(ChoiceRelatedSerializer, 'initialize', autospec=True) as mock_initialize:
+            for poll in self.polls:
+                serializer.to_native(poll)
+        self.assertEqual(mock_initialize.call_count, 0)
+        self.assertIs(embedded.embedded_fields['choices'].parent, serializer)
+
+    def test_embedded_lists_are_serialized_in_one_batch(self):
+        with patch.object(ChoiceRelatedSerializer, 'serialize_many', autospec=True,
+                          side_effect=ChoiceRelatedSerializer.serialize_many) as mock_serialize_many:
+            data = CreatePollWithChoicesSerializer(self.queryset, many=True, context=self.context).data
+        self.assertEqual(mock_serialize_many.call_count, 1)
+        self.assertEqual([[choice['choice_text'] for choice in poll['_embedded']['choices']] for poll in data],
+                         [['Poll0.Choice0', 'Poll0.Choice1'], ['Poll1.Choice0', 'Poll1.Choice1'], []])
+
+    def test_batch_matches_single_objects(self):
+        data = CreatePollWithChoicesSerializer(self.queryset, many=True, context=self.context).data
+        self.assertEqual(data, [CreatePollWithChoicesSerializer(poll, context=self.context).data
+                                for poll in self.queryset])
+
+    def test_validation_errors_are_aggregated(self):
+        serializer = CreatePollWithChoicesSerializer(context=self.context)
+        embedded = serializer.fields['_embedded']
+        with self.assertRaises(HALEmbeddedFieldValidationError) as context:
+            embedded.field_from_native({'_embedded': {'choices': [{'votes': 'many'}]}}, None, '_embedded', {})
+        self.assertEqual(list(context.exception.error_dict.keys()), ['choices'])
+        embedded.field_from_native({'_embedded': {'choices': [{'choice_text': 'Sushi'}]}}, None, '_embedded', {})
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from mock import patch
+from rest_framework.request import Request
+
+from drf_hal.serializers import HALModelSerializer
+from sample_app.models import Channel, Choice, Partner, Poll
+from sample_app.serializers import ChannelSerializer, ChoiceSerializer
+
+
+class TestHALHyperlinkedRelatedFieldFieldToNative(TestCase):
+    def setUp(self):
+        self.poll = Poll.objects.create(question='What is your favorite food?',
+                                        pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        choice = Choice.objects.create(poll=self.poll, choice_text='Sushi')
+        self.choice = Choice.objects.get(pk=choice.pk)
+        self.request = Request(RequestFactory().get('/'))
+
+    def test_foreign_key_link_does_not_load_related_object(self):
+        serializer = ChoiceSerializer(self.choice, context={'request': self.request})
+        with self.assertNumQueries(0):
+            links = serializer.data['_links']
+        self.assertEqual(links['poll'], {'href': 'http://testserver/poll/%s' % self.poll.pk})
+
+    def test_foreign_key_link_is_none_without_related_object(self):
+        choice = Choice(choice_text='Sushi')
+        serializer = ChoiceSerializer(choice, context={'request': self.request})
+        self.assertEqual(serializer.data['_links']['poll'], {'href': None})
+
+
+class ValuesChannelSerializer(HALModelSerializer):
+    class Meta:
+        model = Channel
+        many_links_from_values = True
+
+
+class TestHALHyperlinkedRelatedFieldManyLinksFromValues(TestCase):
+    def setUp(self):
+        self.channels = []
+        for index in xrange(3):
+            channel = Channel.objects.create(name='Channel%s' % index)
+            for partner_index in xrange(4):
+                channel.partner.add(Partner.objects.create(name='Partner%s-%s' % (index, partner_index)))
+            self.channels.append(channel)
+        Channel.objects.create(name='Empty')
+        self.context = {'request': Request(RequestFactory().get('/'))}
+
+    def test_many_links_are_the_same_as_from_instances(self):
+        expected = ChannelSerializer(Channel.objects.all(), many=True, context=self.context).data
+        data = ValuesChannelSerializer(Channel.objects.all(), many=True, context=self.context).data
+        for item, expected_item in zip(data, expected):
+            self.assertEqual(sorted(link['href'] for link in item['_links']['partner']),
+                             sorted(link['href'] for link in expected_item['_links']['partner']))
+        self.assertEqual(data[-1]['_links']['partner'], [])
+
+    def test_many_links_of_a_list_take_one_query(self):
+        # channels + partner lookup values
+        with self.assertNumQueries(2):
+            ValuesChannelSerializer(Channel.objects.all(), many=True, context=self.context).data
+
+    def test_lookup_values_do_not_outlive_the_list(self):
+        serializer = ValuesChannelSerializer(Channel.objects.all(), many=True, context=self.context)
+        serializer.data
+        self.channels[0].partner.clear()
+        self.assertEqual(serializer.to_native(self.channels[0])['_links']['partner'], [])
+
+    def test_many_links_do_not_instantiate_related_objects(self):
+        with patch.object(Partner, '__init__') as mock_init:
+            data = ValuesChannelSerializer(self.channels[0], context=self.context).data
+        self.assertFalse(mock_init.called)
+        self.assertEqual(len(data['_links']['partner']), 4)
+
+
+class TestHALHyperlinkedRelatedFieldFromNative(TestCase):
+    def setUp(self):
+        self.partners = [Partner.objects.create(name='Partner%s' % index) for index in xrange(20)]
+        self.hrefs = ['http://testserver/partner/%s' % partner.pk for partner in self.partners]
+        self.field = ChannelSerializer().fields['partner']
+
+    def test_hrefs_are_fetched_in_one_query(self):
+        into = {}
+        with self.assertNumQueries(1):
+            self.field.field_from_native({'partner': self.hrefs}, None, 'partner', into)
+        self.assertEqual(into['partner'], self.partners)
+
+    def test_serializer_restores_partners(self):
+        serializer = ChannelSerializer(data={'name': 'ABC', 'partner': self.hrefs})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.object._m2m_data['partner'], self.partners)
+
+    def test_missing_object(self):
+        hrefs = self.hrefs + ['http://testserver/partner/999']
+        with self.assertRaises(ValidationError) as context:
+            self.field.from_native_many(hrefs)
+        self.assertEqual(context.exception.messages, [unicode(self.field.error_messages['does_not_exist'])])
+
+    def test_first_error_wins(self):
+        hrefs = ['http://testserver/partner/999', 'http://testserver/poll/1', 'bad']
+        with self.assertRaises(ValidationError) as context:
+            self.field.from_native_many(hrefs)
+        self.assertEqual(context.exception.messages, [unicode(self.field.error_messages['does_not_exist'])])
+
+        with self.assertRaises(ValidationError) as context:
+            self.field.from_native_many(self.hrefs[:1] + ['http://testserver/poll/1'])
+        self.assertEqual(context.exception.messages, [unicode(self.field.error_messages['incorrect_match'])])
+
+    def test_incorrect_type(self):
+        with self.assertRaises(ValidationError) as context:
+            self.field.from_native_many([1])
+        self.assertEqual(context.exception.messages, [self.field.error_messages['incorrect_type'] % 'int'])
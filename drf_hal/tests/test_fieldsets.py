@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+
+from drf_hal.fieldsets import FieldSelection
+
+
+class TestFieldSelection(TestCase):
+    def test_parse_nothing(self):
+        self.assertIsNone(FieldSelection.parse())
+        self.assertIsNone(FieldSelection.parse('', ' , ', None))
+
+    def test_parse_fields_and_exclude(self):
+        selection = FieldSelection.parse('id, question', 'votes')
+        self.assertEqual(selection.fields, frozenset(['id', 'question']))
+        self.assertEqual(selection.exclude, frozenset(['votes']))
+        self.assertEqual(selection.embed, {})
+
+    def test_parse_dotted_embed(self):
+        selection = FieldSelection.parse(embed='poll.choices,poll.choices.poll,channel')
+        self.assertIsNone(selection.fields)
+        self.assertIsNone(selection.embed['channel'])
+        self.assertEqual(selection.embed['poll'], FieldSelection(embed={'choices': FieldSelection(embed={'poll': None})}))
+
+    def test_parse_embed_levels(self):
+        selection = FieldSelection.parse(embed='poll.choices.poll', max_embed_levels=2)
+        self.assertEqual(selection.embed['poll'], FieldSelection(embed={'choices': None}))
+
+    def test_includes(self):
+        selection = FieldSelection.parse('question', 'votes', 'choices')
+        self.assertTrue(selection.includes('question'))
+        self.assertTrue(selection.includes('choices'))
+        self.assertTrue(selection.includes('_links'))
+        self.assertFalse(selection.includes('votes'))
+        self.assertFalse(selection.includes('pub_date'))
+
+    def test_excluded_relations_are_not_embedded(self):
+        selection = FieldSelection.parse(exclude='poll', embed='poll,choices')
+        self.assertFalse(selection.includes('poll'))
+        self.assertEqual(selection.get_embedded(), [('choices', None)])
+
+    def test_key(self):
+        self.assertEqual(FieldSelection.parse('b,a', embed='c.d').key, FieldSelection.parse('a,b', embed='c.d').key)
+        self.assertNotEqual(FieldSelection.parse('a', embed='c.d').key, FieldSelection.parse('a', embed='c').key)
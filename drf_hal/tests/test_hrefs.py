@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from django.test import TestCase
+from mock import patch
+
+from drf_hal import hrefs
+from drf_hal.hrefs import clear_resolved_paths, href_to_path, resolve_path
+
+
+class TestHrefs(TestCase):
+    def setUp(self):
+        clear_resolved_paths()
+
+    def tearDown(self):
+        clear_resolved_paths()
+
+    def test_href_to_path(self):
+        self.assertEqual(href_to_path('http://testserver/poll/1'), '/poll/1')
+        self.assertEqual(href_to_path('/poll/1'), '/poll/1')
+        self.assertRaises(AttributeError, href_to_path, 1)
+
+    def test_resolve_path(self):
+        match = resolve_path('/poll/1')
+        self.assertEqual(match.view_name, 'poll-detail')
+        self.assertEqual(match.kwargs, {'pk': '1'})
+        self.assertIsNone(resolve_path('/nowhere'))
+
+    def test_matches_are_cached(self):
+        with patch.object(hrefs, 'resolve', side_effect=hrefs.resolve) as mock_resolve:
+            resolve_path('/poll/1')
+            resolve_path('/poll/1')
+        self.assertEqual(mock_resolve.call_count, 1)
+
+    def test_least_recently_used_is_evicted(self):
+        with patch.object(hrefs, 'MAX_RESOLVED_PATHS', 2):
+            resolve_path('/poll/1')
+            resolve_path('/poll/2')
+            resolve_path('/poll/1')
+            resolve_path('/poll/3')
+        self.assertEqual([path for urlconf, path in hrefs._resolved_paths], ['/poll/1', '/poll/3'])
+
+    def test_concurrent_resolution(self):
+        errors = []
+
+        def resolve_paths(offset):
+            try:
+                for index in xrange(200):
+                    self.assertEqual(resolve_path('/poll/%s' % ((index + offset) % 8)).view_name, 'poll-detail')
+            except Exception as exc:
+                errors.append(exc)
+
+        with patch.object(hrefs, 'MAX_RESOLVED_PATHS', 4):
+            threads = [threading.Thread(target=resolve_paths, args=(offset,)) for offset in xrange(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(hrefs._resolved_paths), 4)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from rest_framework.request import Request
+
+from drf_hal.instrumentation import Profile, get_profile
+from sample_app.models import Choice, Poll
+from sample_app.serializers import ChoiceSerializer, CreatePollWithChoicesSerializer
+
+
+class TestProfile(TestCase):
+    def setUp(self):
+        poll = Poll.objects.create(question='Poll', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        for index in xrange(2):
+            Choice.objects.create(poll=poll, choice_text='Choice%s' % index)
+        self.request = Request(RequestFactory().get('/'))
+
+    def test_get_profile(self):
+        profile = Profile()
+        self.assertIs(get_profile({'hal_profile': profile}), profile)
+        self.assertIsNone(get_profile({'request': self.request}))
+        self.request._hal_profile = profile
+        self.assertIs(get_profile({'request': self.request}), profile)
+
+    def test_records_fields_links_and_embedded(self):
+        profile = Profile()
+        profile.enable_query_log()
+        try:
+            CreatePollWithChoicesSerializer(Poll.objects.all(), many=True,
+                                            context={'request': self.request, 'hal_profile': profile}).data
+        finally:
+            profile.disable_query_log()
+
+        stats = profile.as_dict()
+        self.assertEqual(stats['CreatePollWithChoicesSerializer.question']['calls'], 1)
+        self.assertEqual(stats['CreatePollWithChoicesSerializer._embedded.choices']['queries'], 1)
+        self.assertEqual(stats['ChoiceRelatedSerializer.choice_text']['calls'], 2)
+        self.assertEqual(stats['ChoiceRelatedSerializer._links']['calls'], 2)
+
+    def test_records_links(self):
+        profile = Profile()
+        ChoiceSerializer(Choice.objects.all(), many=True,
+                         context={'request': self.request, 'hal_profile': profile}).data
+        self.assertEqual(profile.stats['ChoiceSerializer._links.poll'].calls, 2)
+        self.assertEqual(profile.stats['ChoiceSerializer._links.poll'].queries, 0)
+
+    def test_server_timing(self):
+        profile = Profile()
+        profile.record('slow', lambda: sum(xrange(10000)))
+        profile.record('fast', lambda: None)
+        header = profile.as_server_timing(1)
+        self.assertTrue(header.startswith('slow;dur='), header)
+        self.assertIn('desc="1 calls, 0 queries"', header)
+        self.assertNotIn('fast', header)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils.timezone import utc
+from mock import Mock
+
+from drf_hal.lookups import LookupAccessor, compile_lookups, get_accessor
+from sample_app.models import Choice, Poll, UserProfile
+
+
+class TestLookupAccessor(TestCase):
+    def setUp(self):
+        self.poll = Poll.objects.create(question='What is your favorite food?',
+                                        pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.choice = Choice.objects.create(poll=self.poll, choice_text='Sushi')
+
+    def test_single_attribute(self):
+        self.assertEqual(LookupAccessor('choice_text')(self.choice), 'Sushi')
+
+    def test_foreign_key_pk_reads_local_column(self):
+        accessor = LookupAccessor('poll__pk')
+        self.assertEqual(accessor.get_column(Choice), 'poll_id')
+
+        choice = Choice.objects.get(pk=self.choice.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(accessor(choice), self.poll.pk)
+
+    def test_foreign_key_target_field_reads_local_column(self):
+        self.assertEqual(LookupAccessor('poll__id').get_column(Choice), 'poll_id')
+
+    def test_foreign_key_other_field_follows_relation(self):
+        user = get_user_model().objects.create_user('testuser', 'test@test.com', 'testuser')
+        profile = UserProfile.objects.create(user=user)
+        accessor = LookupAccessor('user__username')
+        self.assertIsNone(accessor.get_column(UserProfile))
+        self.assertEqual(accessor(profile), 'testuser')
+
+    def test_missing_attribute_returns_none(self):
+        self.assertIsNone(LookupAccessor('poll__missing')(self.choice))
+        self.assertIsNone(LookupAccessor('missing')(self.choice))
+
+    def test_non_model_object(self):
+        obj = Mock()
+        obj.poll.pk = 5
+        self.assertEqual(LookupAccessor('poll__pk')(obj), 5)
+
+
+class TestCompileLookups(TestCase):
+    def test_single_lookup_field(self):
+        self.assertEqual(compile_lookups('pk'), [('pk', get_accessor('pk'))])
+
+    def test_tuple_of_lookup_fields(self):
+        self.assertEqual(compile_lookups(('pk', 'poll__pk')),
+                         [('pk', get_accessor('pk')), ('poll__pk', get_accessor('poll__pk'))])
+
+    def test_accessors_are_shared(self):
+        self.assertIs(get_accessor('poll__pk'), get_accessor('poll__pk'))
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from mock import patch
+from rest_framework import reverse
+from rest_framework.request import Request
+
+from drf_hal.memo import RenderMemo, get_memo
+from sample_app.models import Choice, Poll
+from sample_app.serializers import ChoiceEmbedPollSerializer, ChoiceSerializer, PollSerializer
+
+
+class TestGetMemo(TestCase):
+    def test_memo_is_kept_on_request(self):
+        request = Request(RequestFactory().get('/'))
+        memo = get_memo({'request': request})
+        self.assertIsInstance(memo, RenderMemo)
+        self.assertIs(get_memo({'request': request}), memo)
+        self.assertIsNot(get_memo({'request': Request(RequestFactory().get('/'))}), memo)
+
+    def test_no_request_no_memo(self):
+        self.assertIsNone(get_memo({}))
+        self.assertIsNone(get_memo(None))
+
+    def test_explicit_memo(self):
+        memo = RenderMemo()
+        request = Request(RequestFactory().get('/'))
+        self.assertIs(get_memo({'request': request, 'hal_memo': memo}), memo)
+        self.assertIsNone(get_memo({'request': request, 'hal_memo': None}))
+
+    def test_bounds(self):
+        memo = RenderMemo(max_links=1, max_objects=1)
+        memo.set_link('a', '/a')
+        memo.set_link('b', '/b')
+        memo.set_object('a', {})
+        memo.set_object('b', {})
+        self.assertEqual(memo.links, {'a': '/a'})
+        self.assertEqual(memo.objects, {'a': {}})
+
+
+class MemoizedPollSerializer(PollSerializer):
+    class Meta:
+        model = Poll
+        memoize_embedded = True
+
+
+class ChoiceEmbedMemoizedPollSerializer(ChoiceEmbedPollSerializer):
+    poll = MemoizedPollSerializer()
+
+    class Meta:
+        model = Choice
+
+
+class TestRenderMemo(TestCase):
+    def setUp(self):
+        self.poll = Poll.objects.create(question='What is your favorite food?',
+                                        pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        for index in xrange(5):
+            Choice.objects.create(poll=self.poll, choice_text='Choice%s' % index)
+        self.request = Request(RequestFactory().get('/choices'))
+
+    def test_repeated_embedded_object_is_serialized_once(self):
+        choices = Choice.objects.select_related('poll')
+        with patch.object(MemoizedPollSerializer, 'to_native', autospec=True,
+                          side_effect=MemoizedPollSerializer.to_native) as mock_to_native:
+            data = ChoiceEmbedMemoizedPollSerializer(choices, many=True, context={'request': self.request}).data
+        self.assertEqual(mock_to_native.call_count, 1)
+        self.assertEqual([item['_embedded']['poll']['question'] for item in data], [self.poll.question] * 5)
+
+    def test_embedded_objects_are_not_memoized_by_default(self):
+        choices = Choice.objects.select_related('poll')
+        data = ChoiceEmbedPollSerializer(choices, many=True, context={'request': self.request}).data
+        data[0]['_embedded']['poll']['question'] = 'Changed'
+        self.assertEqual(data[1]['_embedded']['poll']['question'], self.poll.question)
+
+    def test_repeated_link_is_reversed_once(self):
+        with patch.object(reverse, 'reverse', side_effect=reverse.reverse) as mock_reverse:
+            data = ChoiceSerializer(Choice.objects.all(), many=True, context={'request': self.request}).data
+        # One self link per choice, one shared poll link.
+        self.assertEqual(mock_reverse.call_count, 6)
+        self.assertEqual(set(item['_links']['poll']['href'] for item in data),
+                         set(['http://testserver/poll/%s' % self.poll.pk]))
+
+    def test_memo_disabled(self):
+        choices = Choice.objects.select_related('poll')
+        with patch.object(MemoizedPollSerializer, 'to_native', autospec=True,
+                          side_effect=MemoizedPollSerializer.to_native) as mock_to_native:
+            ChoiceEmbedMemoizedPollSerializer(choices, many=True, context={'request': self.request, 'hal_memo': None}).data
+        self.assertEqual(mock_to_native.call_count, 5)
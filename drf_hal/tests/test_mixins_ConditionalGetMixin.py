@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.http import http_date
+from django.utils.timezone import utc
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+
+from drf_hal.mixins import ConditionalGetMixin
+from sample_app.models import Choice, Poll
+from sample_app.serializers import ChoiceSerializer, PollListSerializer, PollSerializer
+
+
+class PollView(ConditionalGetMixin, RetrieveAPIView):
+    model = Poll
+    serializer_class = PollSerializer
+    last_modified_field = 'pub_date'
+
+
+class PollListView(ConditionalGetMixin, ListAPIView):
+    model = Poll
+    serializer_class = PollSerializer
+    pagination_serializer_class = PollListSerializer
+    paginate_by = 1
+    last_modified_field = 'pub_date'
+
+
+class ChoiceView(ConditionalGetMixin, RetrieveAPIView):
+    model = Choice
+    serializer_class = ChoiceSerializer
+    etag_field = 'votes'
+
+
+class CachedChoiceView(ConditionalGetMixin, RetrieveAPIView):
+    model = Choice
+    serializer_class = ChoiceSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super(CachedChoiceView, self).retrieve(request, *args, **kwargs)
+        response['Cache-Control'] = 'max-age=60'
+        return response
+
+
+class TestConditionalGetMixin(TestCase):
+    def setUp(self):
+        self.pub_date = datetime(2014, 1, 3, tzinfo=utc)
+        self.poll = Poll.objects.create(question='Poll', pub_date=self.pub_date)
+        Poll.objects.create(question='Poll2', pub_date=self.pub_date - timedelta(days=1))
+        self.choice = Choice.objects.create(poll=self.poll, choice_text='Choice')
+        self.factory = RequestFactory()
+
+    def get(self, view, path, **headers):
+        response = view.as_view()(self.factory.get(path, **headers), pk=self.poll.pk)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_retrieve_sets_validators(self):
+        response = self.get(PollView, '/poll/%s' % self.poll.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Last-Modified'], 'Fri, 03 Jan 2014 00:00:00 GMT')
+        self.assertTrue(response['ETag'].startswith('"'))
+
+    def test_retrieve_if_none_match(self):
+        etag = self.get(PollView, '/poll/%s' % self.poll.pk)['ETag']
+        with self.assertNumQueries(1):
+            response = self.get(PollView, '/poll/%s' % self.poll.pk, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_retrieve_if_modified_since(self):
+        response = self.get(PollView, '/poll/%s' % self.poll.pk, HTTP_IF_MODIFIED_SINCE='Fri, 03 Jan 2014 00:00:00 GMT')
+        self.assertEqual(response.status_code, 304)
+        response = self.get(PollView, '/poll/%s' % self.poll.pk, HTTP_IF_MODIFIED_SINCE='Thu, 02 Jan 2014 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_etag_changes_with_version(self):
+        etag = self.get(ChoiceView, '/choice/%s' % self.choice.pk)['ETag']
+        Choice.objects.filter(pk=self.choice.pk).update(votes=1)
+        response = self.get(ChoiceView, '/choice/%s' % self.choice.pk, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_content_etag_not_modified_keeps_headers(self):
+        response = self.get(CachedChoiceView, '/choice/%s' % self.choice.pk)
+        self.assertEqual(response.status_code, 200)
+        response = self.get(CachedChoiceView, '/choice/%s' % self.choice.pk, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], 'max-age=60')
+        self.assertEqual(response['Vary'], 'Accept')
+
+    def test_list_validators_are_aggregated(self):
+        response = self.get(PollListView, '/polls?page=1')
+        self.assertEqual(response['Last-Modified'], http_date(1388707200))
+        etag = response['ETag']
+
+        # aggregate only
+        with self.assertNumQueries(1):
+            response = self.get(PollListView, '/polls?page=1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.get(PollListView, '/polls?page=2', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        Poll.objects.create(question='Poll3', pub_date=self.pub_date - timedelta(days=2))
+        response = self.get(PollListView, '/polls?page=1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from django.core.paginator import InvalidPage
+from django.test import TestCase
+
+from drf_hal.pagination import CursorPaginator
+from sample_app.models import Poll
+
+
+class TestCursorPaginator(TestCase):
+    def setUp(self):
+        self.polls = [Poll.objects.create(question='Poll%s' % index, pub_date=date(2014, 8, 8))
+                      for index in xrange(0, 7)]
+
+    def test_pages_do_not_count(self):
+        paginator = CursorPaginator(Poll.objects.all(), 3)
+        with self.assertNumQueries(1):
+            page = paginator.page()
+        self.assertEqual(page.object_list, self.polls[:3])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_descending_ordering(self):
+        paginator = CursorPaginator(Poll.objects.all(), 3, ordering='-pk')
+        first = paginator.page()
+        self.assertEqual(first.object_list, self.polls[:-4:-1])
+
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(second.object_list, self.polls[3:0:-1])
+        self.assertEqual(paginator.page(second.previous_cursor).object_list, first.object_list)
+
+    def test_last_page(self):
+        paginator = CursorPaginator(Poll.objects.all(), 5)
+        last = paginator.page(paginator.page().next_cursor)
+        self.assertEqual(last.object_list, self.polls[5:])
+        self.assertFalse(last.has_next())
+        self.assertTrue(last.has_previous())
+
+    def test_count(self):
+        self.assertEqual(CursorPaginator(Poll.objects.all(), 3).count, 7)
+
+    def test_invalid_cursor(self):
+        paginator = CursorPaginator(Poll.objects.all(), 3)
+        self.assertRaises(InvalidPage, paginator.page, 'not-a-cursor')
+        self.assertRaises(InvalidPage, paginator.page, paginator.encode_cursor('x', 1))
+
+    def test_invalid_position(self):
+        paginator = CursorPaginator(Poll.objects.all(), 3)
+        for position in ([1, 2], 'abc', {}):
+            self.assertRaises(InvalidPage, paginator.page, paginator.encode_cursor('n', position))
+        self.assertEqual(paginator.page(paginator.encode_cursor('n', str(self.polls[2].pk))).object_list,
+                         self.polls[3:6])
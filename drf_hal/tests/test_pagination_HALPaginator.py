@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from django.test import TestCase
+
+from drf_hal.pagination import HALPaginator
+from sample_app.models import Poll
+
+
+def approximate_count(queryset):
+    return 4, True
+
+
+class TestHALPaginator(TestCase):
+    def setUp(self):
+        for index in xrange(0, 7):
+            Poll.objects.create(question='Poll%s' % index, pub_date=date(2014, 8, 8))
+        self.queryset = Poll.objects.order_by('pk')
+
+    def test_exact_count(self):
+        paginator = HALPaginator(self.queryset, 3)
+        self.assertEqual(paginator.count, 7)
+        self.assertFalse(paginator.count_is_approximate)
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_approximate_count_does_not_clip_pages(self):
+        paginator = HALPaginator(self.queryset, 3, count_strategy=approximate_count)
+        self.assertEqual(paginator.count, 4)
+        self.assertTrue(paginator.count_is_approximate)
+
+        page = paginator.page(2)
+        self.assertEqual(len(page.object_list), 3)
+        self.assertTrue(page.has_next())
+
+        page = paginator.page(3)
+        self.assertEqual(len(page.object_list), 1)
+        self.assertFalse(page.has_next())
+
+    def test_list_is_counted_with_len(self):
+        paginator = HALPaginator(range(5), 2, count_strategy=approximate_count)
+        self.assertEqual(paginator.count, 5)
+        self.assertFalse(paginator.count_is_approximate)
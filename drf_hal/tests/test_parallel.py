@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+import threading
+
+from django.db import connections
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from mock import patch
+from rest_framework.generics import ListAPIView
+from rest_framework.request import Request
+
+from drf_hal.mixins import OptimizedQuerysetMixin, StreamingListMixin
+from drf_hal.parallel import get_pk_ranges, is_ordered_by_pk, iter_parallel_chunks, serialize_parallel
+from drf_hal.renderers import HALRenderer
+from drf_hal.serializers import HALModelSerializer
+from sample_app.models import Choice, Poll
+from sample_app.serializers import ChoiceEmbedPollSerializer
+
+
+class ChoiceExportView(StreamingListMixin, OptimizedQuerysetMixin, ListAPIView):
+    model = Choice
+    serializer_class = ChoiceEmbedPollSerializer
+    renderer_classes = (HALRenderer,)
+    stream_chunk_size = 3
+    parallel_serialization = 'processes'
+    parallel_workers = 2
+
+
+class TestParallelSerialization(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        self.poll = Poll.objects.create(question='Poll', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.choices = [Choice.objects.create(poll=self.poll, choice_text='Choice%s' % index) for index in xrange(7)]
+        self.context = {'request': Request(RequestFactory().get('/choices'))}
+        self.queryset = ChoiceEmbedPollSerializer.optimize_queryset(Choice.objects.order_by('pk'))
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def serial(self):
+        return ChoiceEmbedPollSerializer(Choice.objects.order_by('pk'), many=True, context=self.context).data
+
+    def test_pk_ranges(self):
+        pks = [choice.pk for choice in self.choices]
+        self.assertEqual(get_pk_ranges(Choice.objects.all(), 3), [(pks[0], pks[2]), (pks[3], pks[5]), (pks[6], pks[6])])
+        self.assertEqual(get_pk_ranges(Choice.objects.none(), 3), [])
+
+    def test_processes(self):
+        chunks = list(iter_parallel_chunks(ChoiceEmbedPollSerializer, self.queryset, self.context, 3, workers=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual([native for chunk in chunks for native in chunk], self.serial())
+
+    def test_threads(self):
+        self.assertEqual(serialize_parallel(ChoiceEmbedPollSerializer, self.queryset, self.context, 3, workers=2,
+                                            processes=False), self.serial())
+
+    def test_threads_have_their_own_pool(self):
+        # The in-memory test database is shared with the threads, one query at a time
+        connection = connections['default']
+        lock = threading.Lock()
+        threads = set()
+        # Mock's call_count is not updated atomically
+        closed_in = []
+
+        def close_connections():
+            with lock:
+                closed_in.append(threading.current_thread())
+
+        def call_with_test_connection(function):
+            connections['default'] = connection
+            threads.add(threading.current_thread())
+            try:
+                with lock:
+                    return function()
+            finally:
+                del connections['default']
+
+        connection.allow_thread_sharing = True
+        try:
+            with patch('drf_hal.parallel.can_load_concurrently', return_value=True), \
+                    patch('drf_hal.parallel.call_with_connections', call_with_test_connection), \
+                    patch('drf_hal.parallel.close_connections', close_connections), \
+                    patch('drf_hal.concurrency.get_pool', side_effect=AssertionError('shared pool')):
+                natives = serialize_parallel(ChoiceEmbedPollSerializer, self.queryset, self.context, 3, workers=2,
+                                             processes=False)
+        finally:
+            connection.allow_thread_sharing = False
+        self.assertEqual(natives, self.serial())
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertTrue(all(not thread.is_alive() for thread in threads))
+        # Once in each thread of the pool
+        self.assertEqual(len(closed_in), 2)
+        self.assertEqual(len(set(closed_in)), 2)
+        self.assertTrue(threads <= set(closed_in))
+
+    def test_other_orderings_are_kept(self):
+        queryset = ChoiceEmbedPollSerializer.optimize_queryset(Choice.objects.order_by('-pk'))
+        for processes in (True, False):
+            chunks = list(iter_parallel_chunks(ChoiceEmbedPollSerializer, queryset, self.context, 3, workers=2,
+                                               processes=processes))
+            self.assertEqual(chunks, [self.serial()[::-1]])
+
+    def test_is_ordered_by_pk(self):
+        self.assertTrue(is_ordered_by_pk(Choice.objects.all()))
+        self.assertTrue(is_ordered_by_pk(Choice.objects.order_by('id')))
+        self.assertFalse(is_ordered_by_pk(Choice.objects.order_by('-pk')))
+        self.assertFalse(is_ordered_by_pk(Choice.objects.order_by('pk', 'votes')))
+
+    def test_sliced_queryset_is_serialized_serially(self):
+        chunks = list(iter_parallel_chunks(ChoiceEmbedPollSerializer, Choice.objects.order_by('pk')[:5],
+                                           self.context, 3, workers=2))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0], self.serial()[:5])
+
+    def test_streaming_view(self):
+        response = ChoiceExportView.as_view()(RequestFactory().get('/choices'))
+        content = HALRenderer().get_json_backend().loads(b''.join(response.streaming_content).decode('utf-8'))
+        self.assertEqual(content['count'], 7)
+        self.assertEqual([choice['choice_text'] for choice in content['_embedded']['choices']],
+                         [choice.choice_text for choice in self.choices])
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from io import BytesIO
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from rest_framework.exceptions import ParseError
+
+from drf_hal.parsers import HALParser, RequestEntityTooLarge
+from sample_app.serializers import ChoiceSerializer
+
+
+class TestHALParser(TestCase):
+    def setUp(self):
+        self.parser = HALParser()
+
+    def parse(self, body, parser=None, **extra):
+        request = RequestFactory().post('/', body, content_type='application/hal+json', **extra)
+        return (parser or self.parser).parse(BytesIO(body), 'application/hal+json', {'request': request})
+
+    def test_links_are_split(self):
+        data = self.parse(b'{"_links": {"self": {"href": "/choice/1"}, "poll": {"href": "/poll/1"}, '
+                          b'"tags": [{"href": "/tag/1"}, {"href": "/tag/2"}]}, "votes": 1}')
+        self.assertEqual(data.links, {'self': '/choice/1', 'poll': '/poll/1', 'tags': ['/tag/1', '/tag/2']})
+        self.assertEqual(data['poll'], '/poll/1')
+        self.assertEqual(data['tags'], ['/tag/1', '/tag/2'])
+        self.assertNotIn('self', data)
+        self.assertEqual(data['votes'], 1)
+
+    def test_plain_items_take_precedence(self):
+        data = self.parse(b'{"_links": {"poll": {"href": "/poll/1"}}, "poll": "/poll/2"}')
+        self.assertEqual(data['poll'], '/poll/2')
+        self.assertEqual(data.links['poll'], '/poll/1')
+
+    def test_embedded_objects_are_normalized(self):
+        data = self.parse(b'{"_embedded": {"choices": [{"_links": {"self": {"href": "/choice/1"}}}], '
+                          b'"poll": {"question": "Poll"}}}')
+        self.assertEqual(data.embedded['choices'][0].links, {'self': '/choice/1'})
+        self.assertEqual(data['_embedded']['poll'], {'question': 'Poll'})
+        self.assertIsNone(data.embedded['poll'].links)
+
+    def test_list(self):
+        data = self.parse(b'[{"_links": {"self": {"href": "/choice/1"}}}, 1]')
+        self.assertEqual(data[0].links, {'self': '/choice/1'})
+        self.assertEqual(data[1], 1)
+
+    def test_identity(self):
+        data = self.parse(b'{"_links": {"self": {"href": "/choice/1"}}}')
+        self.assertEqual(ChoiceSerializer().get_identity(data), '/choice/1')
+
+    def test_invalid_json(self):
+        with self.assertRaises(ParseError):
+            self.parse(b'{"_links": ')
+
+    def test_max_body_size(self):
+        parser = HALParser()
+        parser.max_body_size = 10
+        self.assertEqual(self.parse(b'{"a": 1}', parser), {'a': 1})
+        with self.assertRaises(RequestEntityTooLarge):
+            self.parse(b'{"a": 12345}', parser)
+
+    def test_max_body_size_without_content_length(self):
+        parser = HALParser()
+        parser.max_body_size = 10
+        with self.assertRaises(RequestEntityTooLarge):
+            parser.parse(BytesIO(b'{"a": 12345}'), 'application/hal+json', {})
+
+    def test_max_embedded_items(self):
+        parser = HALParser()
+        parser.max_embedded_items = 2
+        self.assertEqual(len(self.parse(b'{"_embedded": {"choices": [{}, {}]}}', parser)['_embedded']['choices']), 2)
+        with self.assertRaises(ParseError):
+            self.parse(b'{"_embedded": {"choices": [{}, {}, {}]}}', parser)
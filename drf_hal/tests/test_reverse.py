@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.core.urlresolvers import NoReverseMatch, get_resolver
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from mock import patch
+from rest_framework import reverse as drf_reverse
+from rest_framework.request import Request
+
+from drf_hal import reverse as hal_reverse
+from drf_hal.serializers import HALModelSerializer
+from sample_app.models import Choice, Poll
+
+
+class TestGetLinkTemplate(TestCase):
+    def setUp(self):
+        hal_reverse.clear_link_templates()
+
+    def test_link_template_for_simple_view(self):
+        template = hal_reverse.get_link_template('poll-detail')
+        self.assertEqual(template.params, frozenset(['pk']))
+        self.assertEqual(template.expand({'pk': 3}), 'poll/3')
+
+    def test_link_template_is_cached(self):
+        self.assertIs(hal_reverse.get_link_template('poll-detail'), hal_reverse.get_link_template('poll-detail'))
+
+    def test_no_link_template_for_unknown_view(self):
+        self.assertIsNone(hal_reverse.get_link_template('unknown-detail'))
+
+    def test_no_link_template_without_the_views_of_the_resolver(self):
+        class Resolver(object):
+            reverse_dict = get_resolver(None).reverse_dict
+
+        with patch.object(hal_reverse, 'get_resolver', return_value=Resolver()):
+            self.assertIsNone(hal_reverse.get_link_template('poll-detail'))
+
+    def test_expand_with_wrong_kwargs(self):
+        template = hal_reverse.get_link_template('poll-detail')
+        with self.assertRaises(NoReverseMatch):
+            template.expand({'slug': 3})
+
+    def test_expand_with_value_not_matching_pattern(self):
+        template = hal_reverse.get_link_template('poll-detail')
+        with self.assertRaises(NoReverseMatch):
+            template.expand({'pk': 'abc'})
+
+
+class TestReverse(TestCase):
+    def setUp(self):
+        hal_reverse.clear_link_templates()
+        self.request = Request(RequestFactory().get('/'))
+
+    def test_reverse_matches_rest_framework_reverse(self):
+        for view_name, kwargs in (('poll-detail', {'pk': 1}),
+                                  ('poll-choice-detail', {'poll__pk': 1, 'pk': 2}),
+                                  ('user-detail', {'username': 'some-user'})):
+            self.assertEqual(hal_reverse.reverse(view_name, kwargs=kwargs),
+                             drf_reverse.reverse(view_name, kwargs=kwargs))
+            self.assertEqual(hal_reverse.reverse(view_name, kwargs=kwargs, request=self.request),
+                             drf_reverse.reverse(view_name, kwargs=kwargs, request=self.request))
+
+    def test_reverse_does_not_use_resolver_for_templated_view(self):
+        hal_reverse.reverse('poll-detail', kwargs={'pk': 1})
+        with patch('rest_framework.reverse.reverse') as mock_reverse:
+            hal_reverse.reverse('poll-detail', kwargs={'pk': 1}, request=self.request)
+        self.assertFalse(mock_reverse.called)
+
+    def test_reverse_falls_back_to_rest_framework_reverse(self):
+        with self.assertRaises(NoReverseMatch):
+            hal_reverse.reverse('poll-detail', kwargs={'pk': 'abc'})
+
+
+class TestHALModelSerializerLinkTemplates(TestCase):
+    def setUp(self):
+        poll = Poll.objects.create(question='What is your favorite food?',
+                                   pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.choice = Choice.objects.create(poll=poll, choice_text='Sushi')
+        self.request = Request(RequestFactory().get('/'))
+
+    def test_link_templates_give_the_same_links(self):
+        class ChoiceSerializer(HALModelSerializer):
+            class Meta:
+                model = Choice
+
+        class TemplatedChoiceSerializer(HALModelSerializer):
+            class Meta:
+                model = Choice
+                link_templates = True
+
+        context = {'request': self.request}
+        self.assertEqual(TemplatedChoiceSerializer(self.choice, context=context).data['_links'],
+                         ChoiceSerializer(self.choice, context=context).data['_links'])
@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.timezone import utc
+from mock import patch
+from rest_framework.request import Request
+
+from drf_hal.fieldsets import FieldSelection
+from drf_hal.serializers import HALModelSerializer, HALQuerysetPlan
+from sample_app.models import Choice, Poll
+from sample_app.serializers import ChoiceSerializer, ChoiceEmbedPollSerializer, ChoiceExcludePollSerializer, \
+    ChoiceExcludeVotesSerializer, CreatePollWithChoicesSerializer, PollWithAdditionalEmbeddedSerializer
+
+
+class TestHALModelSerializerFieldPlan(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def test_field_plan_is_computed_once_per_class(self):
+        with patch.object(ChoiceSerializer, 'build_fields', autospec=True,
+                          side_effect=HALModelSerializer.build_fields) as mock_build_fields:
+            ChoiceSerializer()
+            ChoiceSerializer()
+        self.assertEqual(mock_build_fields.call_count, 1)
+
+    def test_field_plan_layout(self):
+        plan = ChoiceSerializer.get_field_plan()
+        self.assertEqual(plan.link_names, ['poll'])
+        self.assertEqual(plan.embedded_names, [])
+        self.assertIn('choice_text', plan.plain_names)
+        self.assertIn('id', plan.read_only_names)
+
+    def test_field_plan_nested_serializer_is_embedded(self):
+        plan = ChoiceEmbedPollSerializer.get_field_plan()
+        self.assertEqual(plan.link_names, [])
+        self.assertEqual(plan.embedded_names, ['poll'])
+
+    def test_instances_get_their_own_fields(self):
+        first = ChoiceSerializer()
+        second = ChoiceSerializer()
+        self.assertIsNot(first.fields['choice_text'], second.fields['choice_text'])
+        self.assertIs(first.fields['choice_text'].parent, first)
+        self.assertIs(second.fields['choice_text'].parent, second)
+
+    def test_shared_fields_stay_shared_in_instance(self):
+        serializer = ChoiceSerializer()
+        self.assertIs(serializer.fields['poll'], serializer.additional_links['poll'])
+
+    def test_invalidate_field_plan(self):
+        plan = ChoiceSerializer.get_field_plan()
+        ChoiceSerializer.invalidate_field_plan()
+        self.assertIsNot(ChoiceSerializer.get_field_plan(), plan)
+
+    def test_cache_field_plan_disabled(self):
+        class UncachedChoiceSerializer(HALModelSerializer):
+            class Meta:
+                model = Choice
+                cache_field_plan = False
+
+        UncachedChoiceSerializer()
+        self.assertNotIn(UncachedChoiceSerializer, HALModelSerializer._field_plans)
+
+
+class TestHALModelSerializerOptimizeQueryset(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        for index in xrange(3):
+            poll = Poll.objects.create(question='Poll%s' % index, pub_date=datetime(2014, 1, 3, tzinfo=utc))
+            for choice_index in xrange(3):
+                Choice.objects.create(poll=poll, choice_text='Choice%s' % choice_index)
+        self.request = Request(RequestFactory().get('/'))
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def test_foreign_key_link_needs_no_join(self):
+        queryset = ChoiceSerializer.optimize_queryset(Choice.objects.all())
+        self.assertEqual(queryset.query.select_related, False)
+        self.assertEqual(queryset.query.deferred_loading[1], False)
+        self.assertEqual(set(queryset.query.deferred_loading[0]), set(['id', 'poll', 'choice_text', 'votes']))
+
+    def test_embedded_foreign_key_is_selected(self):
+        queryset = ChoiceEmbedPollSerializer.optimize_queryset(Choice.objects.all())
+        with self.assertNumQueries(1):
+            ChoiceEmbedPollSerializer(queryset, many=True, context={'request': self.request}).data
+
+    def test_embedded_reverse_relation_is_prefetched(self):
+        queryset = CreatePollWithChoicesSerializer.optimize_queryset(Poll.objects.all())
+        with self.assertNumQueries(2):
+            data = CreatePollWithChoicesSerializer(queryset, many=True, context={'request': self.request}).data
+        self.assertEqual([len(item['_embedded']['choices']) for item in data], [3, 3, 3])
+
+    def test_method_fields_do_not_restrict_columns(self):
+        queryset = PollWithAdditionalEmbeddedSerializer.optimize_queryset(Poll.objects.all())
+        self.assertEqual(queryset.query.deferred_loading, (set(), True))
+
+
+class TestHALModelSerializerFieldSelection(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        self.poll = Poll.objects.create(question='Poll', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        for index in xrange(3):
+            Choice.objects.create(poll=self.poll, choice_text='Choice%s' % index)
+        self.request = Request(RequestFactory().get('/'))
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def serialize(self, serializer_class, selection, many=True):
+        queryset = serializer_class.optimize_queryset(serializer_class.Meta.model.objects.all(), selection)
+        if not many:
+            queryset = queryset[0]
+        return serializer_class(queryset, many=many, context={'request': self.request, 'hal_fields': selection}).data
+
+    def test_fields(self):
+        selection = FieldSelection.parse('choice_text')
+        serializer = ChoiceSerializer(context={'hal_fields': selection})
+        self.assertEqual(list(serializer.fields.keys()), ['_links', 'choice_text'])
+        self.assertEqual(list(serializer.additional_links.keys()), [])
+        with self.assertNumQueries(1):
+            data = self.serialize(ChoiceSerializer, selection)
+        self.assertEqual(set(data[0].keys()), set(['_links', 'choice_text']))
+        self.assertEqual(list(data[0]['_links'].keys()), ['self'])
+
+    def test_fields_restrict_columns(self):
+        queryset = ChoiceSerializer.optimize_queryset(Choice.objects.all(), FieldSelection.parse('votes'))
+        self.assertEqual(set(queryset.query.deferred_loading[0]), set(['id', 'votes']))
+
+    def test_exclude_embedded(self):
+        selection = FieldSelection.parse(exclude='choices')
+        with self.assertNumQueries(1):
+            data = self.serialize(CreatePollWithChoicesSerializer, selection)
+        self.assertNotIn('_embedded', data[0])
+
+    def test_embed_link(self):
+        selection = FieldSelection.parse(embed='poll')
+        with self.assertNumQueries(1):
+            data = self.serialize(ChoiceSerializer, selection)
+        self.assertNotIn('poll', data[0]['_links'])
+        self.assertEqual(data[0]['_embedded']['poll']['question'], 'Poll')
+        self.assertEqual(data[0]['_embedded']['poll']['_links']['self']['href'], 'http://testserver/poll/%s' % self.poll.pk)
+
+    def test_only_embeddable_relations_are_embedded(self):
+        selection = FieldSelection.parse(embed='poll')
+        with self.assertNumQueries(1):
+            data = self.serialize(ChoiceExcludeVotesSerializer, selection)
+        self.assertNotIn('_embedded', data[0])
+        self.assertEqual(data[0]['_links']['poll']['href'], 'http://testserver/poll/%s' % self.poll.pk)
+
+    def test_embed_dotted_path(self):
+        selection = FieldSelection.parse(embed='poll.choices')
+        with self.assertNumQueries(2):
+            data = self.serialize(ChoiceEmbedPollSerializer, selection, many=False)
+        choices = data['_embedded']['poll']['_embedded']['choices']
+        self.assertEqual([choice['choice_text'] for choice in choices], ['Choice0', 'Choice1', 'Choice2'])
+
+    def test_embedded_objects_are_memoized_per_selection(self):
+        choice = Choice.objects.all()[0]
+        context = {'request': self.request}
+        ChoiceEmbedPollSerializer(choice, context=context).data
+        data = ChoiceEmbedPollSerializer(choice, context=dict(context, hal_fields=FieldSelection.parse(
+            embed='poll.choices'))).data
+        self.assertIn('_embedded', data['_embedded']['poll'])
+
+    def test_queryset_plans_are_cached_per_selection(self):
+        plans = ChoiceSerializer.get_field_plan().queryset_plans
+        ChoiceSerializer.optimize_queryset(Choice.objects.all())
+        ChoiceSerializer.optimize_queryset(Choice.objects.all(), FieldSelection.parse('votes'))
+        ChoiceSerializer.optimize_queryset(Choice.objects.all(), FieldSelection.parse('votes'))
+        self.assertEqual(len(plans), 2)
+
+
+class TransformedChoiceSerializer(HALModelSerializer):
+    class Meta:
+        model = Choice
+
+    def transform_choice_text(self, obj, value):
+        return value.upper()
+
+
+class TestHALModelSerializerActiveFields(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        self.poll = Poll.objects.create(question='Poll', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.choices = [Choice.objects.create(poll=self.poll, choice_text='Choice%s' % index) for index in xrange(3)]
+        self.context = {'request': Request(RequestFactory().get('/'))}
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def test_active_fields(self):
+        serializer = TransformedChoiceSerializer(context=self.context)
+        active_fields = serializer.get_active_fields()
+        self.assertEqual([field_name for field_name, field, key, transform, write_only, profile_name in active_fields],
+                         ['_links', 'id', 'choice_text', 'votes'])
+        self.assertIsNotNone(active_fields[2][3])
+        self.assertIs(serializer.get_active_fields(), active_fields)
+
+    def test_transform(self):
+        data = TransformedChoiceSerializer(self.choices, many=True, context=self.context).data
+        self.assertEqual([choice['choice_text'] for choice in data], ['CHOICE0', 'CHOICE1', 'CHOICE2'])
+
+    def test_fields_are_initialized_once(self):
+        serializer = ChoiceSerializer(context=self.context)
+        links = serializer.fields['_links']
+        poll_link = links.additional_links['poll']
+        serializer.to_native(self.choices[0])
+        with patch.object(poll_link.__class__, 'initialize', autospec=True) as mock_initialize:
+            for choice in self.choices:
+                serializer.to_native(choice)
+        self.assertEqual(mock_initialize.call_count, 0)
+        self.assertIs(poll_link.parent, links)
+
+    def test_active_fields_follow_the_root(self):
+        serializer = ChoiceSerializer(context=self.context)
+        active_fields = serializer.get_active_fields()
+        parent = CreatePollWithChoicesSerializer(context=self.context)
+        serializer.initialize(parent, 'choices')
+        self.assertIsNot(serializer.get_active_fields(), active_fields)
+        self.assertIs(serializer.fields['choice_text'].root, parent)
+
+
+class LimitedPollWithChoicesSerializer(CreatePollWithChoicesSerializer):
+    class Meta:
+        model = Poll
+        max_embedded_items = 2
+        related_collections = {'choices': ('create-poll-choice', {'poll__pk': 'pk'})}
+
+
+class FlatChoiceEmbedPollSerializer(ChoiceEmbedPollSerializer):
+    class Meta:
+        model = Choice
+        max_embed_depth = 1
+
+
+class TestHALModelSerializerEmbedLimits(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        self.poll = Poll.objects.create(question='Poll', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.choices = [Choice.objects.create(poll=self.poll, choice_text='Choice%s' % index) for index in xrange(3)]
+        self.request = Request(RequestFactory().get('/'))
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def test_no_limits(self):
+        serializer = CreatePollWithChoicesSerializer(self.poll, context={'request': self.request})
+        self.assertIsNone(serializer.get_embed_limits())
+        self.assertEqual(len(serializer.data['_embedded']['choices']), 3)
+
+    def test_embedded_items_are_truncated(self):
+        serializer = LimitedPollWithChoicesSerializer(self.poll, context={'request': self.request})
+        # The first items, then their count
+        with self.assertNumQueries(2):
+            data = serializer.data
+        self.assertEqual([choice['choice_text'] for choice in data['_embedded']['choices']], ['Choice0', 'Choice1'])
+        self.assertEqual(data['_links']['choices'], {'href': 'http://testserver/poll/%s/choice' % self.poll.pk})
+        self.assertEqual(data['choices_count'], 3)
+
+    def test_truncated_relation_without_collection(self):
+        class Serializer(LimitedPollWithChoicesSerializer):
+            class Meta:
+                model = Poll
+                max_embedded_items = 2
+
+        data = Serializer(self.poll, context={'request': self.request}).data
+        self.assertEqual(len(data['_embedded']['choices']), 2)
+        self.assertNotIn('choices', data['_links'])
+        self.assertEqual(data['choices_count'], 3)
+
+    def test_embedded_items_within_limit(self):
+        self.choices[2].delete()
+        data = LimitedPollWithChoicesSerializer(self.poll, context={'request': self.request}).data
+        self.assertEqual(len(data['_embedded']['choices']), 2)
+        self.assertNotIn('choices', data['_links'])
+
+    def test_embed_depth(self):
+        selection = FieldSelection.parse(embed='poll.choices')
+        data = FlatChoiceEmbedPollSerializer(self.choices[0], context={'request': self.request,
+                                                                       'hal_fields': selection}).data
+        poll = data['_embedded']['poll']
+        self.assertNotIn('_embedded', poll)
+        self.assertEqual(len(poll['_links']['choices']), 3)
+
+    def test_relations_past_embed_depth_are_prefetched_for_links_only(self):
+        selection = FieldSelection.parse(embed='poll.choices')
+        plan = HALQuerysetPlan(FlatChoiceEmbedPollSerializer, selection=selection)
+        self.assertEqual(plan.select_related, ['poll'])
+        self.assertEqual(plan.prefetch_related, [('poll__choices', Choice, None)])
+
+        queryset = FlatChoiceEmbedPollSerializer.optimize_queryset(Choice.objects.all(), selection)
+        context = {'request': self.request, 'hal_fields': selection}
+        # The choices with their poll, then the pks of the choices of the poll
+        with self.assertNumQueries(2):
+            data = FlatChoiceEmbedPollSerializer(queryset, many=True, context=context).data
+        self.assertEqual([len(choice['_embedded']['poll']['_links']['choices']) for choice in data], [3] * 3)
+
+    def test_relations_past_embed_depth_link_their_collection(self):
+        class LinkedPollSerializer(LimitedPollWithChoicesSerializer):
+            class Meta:
+                model = Poll
+                max_embed_depth = 0
+                related_collections = {'choices': ('create-poll-choice', {'poll__pk': 'pk'})}
+
+        self.assertEqual(HALQuerysetPlan(LinkedPollSerializer).prefetch_related, [])
+        queryset = LinkedPollSerializer.optimize_queryset(Poll.objects.all())
+        with self.assertNumQueries(1):
+            data = LinkedPollSerializer(queryset, many=True, context={'request': self.request}).data
+        self.assertNotIn('_embedded', data[0])
+        self.assertEqual(data[0]['_links']['choices'], {'href': 'http://testserver/poll/%s/choice' % self.poll.pk})
+
+    def test_zero_embed_depth_links_relations(self):
+        class LinkedChoiceSerializer(ChoiceEmbedPollSerializer):
+            class Meta:
+                model = Choice
+                max_embed_depth = 0
+
+        data = LinkedChoiceSerializer(self.choices[0], context={'request': self.request}).data
+        self.assertNotIn('_embedded', data)
+        self.assertEqual(data['_links']['poll'], {'href': 'http://testserver/poll/%s' % self.poll.pk})
+
+
+class NoCopyDict(dict):
+    def copy(self):
+        raise AssertionError('restore_fields should not copy the data')
+
+
+class TestHALModelSerializerRestoreFields(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        self.poll = Poll.objects.create(question='What is your favorite food?',
+                                        pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.data = NoCopyDict(poll='http://testserver/poll/%s' % self.poll.pk, choice_text='Sushi')
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def test_leftover_relation_is_restored(self):
+        serializer = ChoiceExcludePollSerializer(data=self.data)
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.object.poll, self.poll)
+
+    def test_leftover_field_is_built_once_per_class(self):
+        with patch.object(ChoiceExcludePollSerializer, 'build_leftover_field', autospec=True,
+                          side_effect=HALModelSerializer.build_leftover_field) as mock_build:
+            for index in xrange(3):
+                self.assertTrue(ChoiceExcludePollSerializer(data=self.data).is_valid())
+        self.assertEqual(mock_build.call_count, 1)
+
+    def test_leftover_hrefs_are_fetched_once_for_many(self):
+        choices = [Choice.objects.create(poll=self.poll, choice_text='Choice%s' % index) for index in xrange(3)]
+        data = [{'_links': {'self': {'href': 'http://testserver/choice/%s' % choice.pk}},
+                 'poll': self.data['poll'], 'choice_text': 'Updated'} for choice in choices]
+        request = Request(RequestFactory().get('/'))
+        serializer = ChoiceExcludePollSerializer(choices, data=data, many=True, context={'request': request})
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual([choice.poll for choice in serializer.object], [self.poll] * 3)
+
+    def test_prefetched_relations_are_checked_for_uniqueness(self):
+        Choice.objects.create(poll=self.poll, choice_text='Sushi')
+        data = [{'poll': self.data['poll'], 'choice_text': 'Sushi'}]
+        request = Request(RequestFactory().get('/'))
+        with patch.object(Choice._meta, 'unique_together', (('poll', 'choice_text'),)):
+            serializer = ChoiceSerializer(data=data, many=True, context={'request': request})
+            self.assertFalse(serializer.is_valid())
+        self.assertIn('__all__', serializer.errors[0])
+
+    def test_model_relations(self):
+        relations = HALModelSerializer.get_model_relations(Choice)
+        self.assertEqual(relations.keys(), ['poll'])
+        self.assertEqual(relations['poll'][1:], (Poll, False))
+
+
+class BulkChoiceSerializer(HALModelSerializer):
+    class Meta:
+        model = Choice
+        bulk_create = True
+
+
+class TestHALModelSerializerSaveObjects(TestCase):
+    def setUp(self):
+        HALModelSerializer.invalidate_field_plan()
+        self.poll = Poll.objects.create(question='What is your favorite food?',
+                                        pub_date=datetime(2014, 1, 3, tzinfo=utc))
+        self.data = [{'poll': 'http://testserver/poll/%s' % self.poll.pk, 'choice_text': 'Choice%s' % index}
+                     for index in xrange(10)]
+
+    def tearDown(self):
+        HALModelSerializer.invalidate_field_plan()
+
+    def test_bulk_create(self):
+        serializer = BulkChoiceSerializer(data=self.data, many=True)
+        self.assertTrue(serializer.is_valid())
+        # The last key, a single insert and the new keys inside a savepoint
+        with self.assertNumQueries(5):
+            serializer.save()
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('choice_text', flat=True)),
+                         ['Choice%s' % index for index in xrange(10)])
+        self.assertEqual([(choice.pk, choice.choice_text) for choice in serializer.object],
+                         list(Choice.objects.order_by('pk').values_list('pk', 'choice_text')))
+
+    def test_objects_are_saved_one_by_one_by_default(self):
+        serializer = ChoiceSerializer(data=self.data, many=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.assertTrue(all(choice.pk is not None for choice in serializer.object))
@@ -92,6 +92,12 @@ REST_FRAMEWORK = {
         'drf_hal.renderers.HALRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ),
+    'DEFAULT_PARSER_CLASSES': (
+        'drf_hal.parsers.HALParser',
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_SERIALIZER_CLASS':
         'drf_hal.pagination.HALPaginationSerializer',
 }
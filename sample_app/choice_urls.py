@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 from django.conf.urls import patterns, url
-from sample_app.views import ChoiceRetrieveUpdateDestroyAPIView
+from sample_app.views import ChoiceRetrieveUpdateDestroyAPIView, ChoiceListAPIView, ChoiceBulkAPIView
 
 
 urlpatterns = patterns('',
-    url('^/(?P<pk>\d+)$', ChoiceRetrieveUpdateDestroyAPIView.as_view(), name='choice-detail')
+    url('^/(?P<pk>\d+)$', ChoiceRetrieveUpdateDestroyAPIView.as_view(), name='choice-detail'),
+    url('^s$', ChoiceListAPIView.as_view(), name='choice-list'),
+    url('^s/bulk$', ChoiceBulkAPIView.as_view(), name='choice-bulk'),
 )
 
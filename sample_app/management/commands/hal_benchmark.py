@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from optparse import make_option
+import gc
+import multiprocessing
+import resource
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.test.client import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils.timezone import utc
+from rest_framework.compat import get_concrete_model
+from rest_framework.request import Request
+from rest_framework.serializers import _resolve_model
+
+from drf_hal.concurrency import can_load_concurrently, prefetch_concurrently
+from drf_hal.encoders import SimpleJSONBackend, StdlibJSONBackend
+from drf_hal.parallel import serialize_parallel
+from drf_hal.renderers import HALRenderer
+from drf_hal.serializers import HALModelSerializer
+from sample_app.models import Channel, Choice, Partner, Poll, UserProfile
+from sample_app.serializers import ChannelSerializer, ChoiceEmbedPollSerializer, ChoiceExcludePollSerializer, \
+    ChoiceSerializer, CreatePollWithChoicesSerializer
+
+
+class ReverseChoiceSerializer(HALModelSerializer):
+    class Meta:
+        model = Choice
+
+
+class TemplatedChoiceSerializer(HALModelSerializer):
+    class Meta:
+        model = Choice
+        link_templates = True
+
+
+class BaselineRestoreMixin(object):
+    """
+    The deserialization path before `restore_fields` was slimmed down: the
+    payload is copied, every field is initialized for every item, and the
+    relations left in the payload get new fields from the model options.
+    They are not prefetched with the fields either.
+    """
+
+    def restore_initialize_field(self, field_name, field, data, files, reverted_data):
+        field.initialize(parent=self, field_name=field_name)
+        try:
+            field.field_from_native(data, files, field_name, reverted_data)
+        except ValidationError as err:
+            if getattr(err, 'error_dict', None):
+                for key, value in err.error_dict.items():
+                    self._errors[key] = value.messages
+            else:
+                self._errors[field_name] = list(err.messages)
+
+    def restore_fields(self, data, files):
+        reverted_data = {}
+        copy_data = data.copy()
+
+        if data is not None and not isinstance(data, dict):
+            self._errors['non_field_errors'] = ['Invalid data']
+            return None
+
+        for field_name, field in self.fields.items():
+            copy_data.pop(field_name, None)
+            self.restore_initialize_field(field_name, field, data, files, reverted_data)
+
+        opts = get_concrete_model(self.opts.model)._meta
+        nested = bool(self.opts.depth)
+        for field_name in copy_data.keys():
+            try:
+                model_field = opts.get_field_by_name(field_name)[0]
+            except models.FieldDoesNotExist:
+                continue
+            if model_field.rel:
+                related_model = _resolve_model(model_field.rel.to)
+                to_many = isinstance(model_field, models.fields.related.ManyToManyField)
+                if nested:
+                    field = self.get_nested_field(model_field, related_model, to_many)
+                else:
+                    field = self.get_related_field(model_field, related_model, to_many)
+                self.restore_initialize_field(field_name, field, data, files, reverted_data)
+
+        return reverted_data
+
+    def prepare_data(self, data):
+        seen = set()
+        for field_name, field in self.fields.items():
+            prefetch_data = getattr(field, 'prefetch_data', None)
+            if prefetch_data is not None and id(field) not in seen:
+                seen.add(id(field))
+                field.initialize(parent=self, field_name=field_name)
+                prefetch_data(data, field_name)
+
+
+class BaselineChoiceSerializer(BaselineRestoreMixin, ChoiceSerializer):
+    pass
+
+
+class BaselineChoiceExcludePollSerializer(BaselineRestoreMixin, ChoiceExcludePollSerializer):
+    pass
+
+
+def build_choices(count):
+    """
+    Unsaved choices of a single poll; link generation does not need the database.
+    """
+    poll = Poll(pk=1, question='What is your favorite food?', pub_date=datetime(2014, 1, 3, tzinfo=utc))
+    return [Choice(pk=index, poll=poll, choice_text='Choice%s' % index) for index in xrange(1, count + 1)]
+
+
+def create_fixtures(count):
+    """
+    Fill the database with `count` polls of 4 choices each (the first one
+    with `count` choices), `count` channels
+    of 3 partners each out of 10, and `count` users with a profile, in 2
+    groups each out of 10.
+    """
+    pub_date = datetime(2014, 1, 3, tzinfo=utc)
+    Poll.objects.bulk_create([Poll(question='Poll%s' % index, pub_date=pub_date) for index in xrange(count)])
+    polls = list(Poll.objects.all())
+    Choice.objects.bulk_create([Choice(poll=poll, choice_text='Choice%s' % index, votes=index)
+                                for poll in polls for index in xrange(count if poll is polls[0] else 4)])
+
+    Partner.objects.bulk_create([Partner(name='Partner%s' % index) for index in xrange(10)])
+    partners = list(Partner.objects.all())
+    Channel.objects.bulk_create([Channel(name='Channel%s' % index) for index in xrange(count)])
+    through = Channel.partner.through
+    through.objects.bulk_create([through(channel=channel, partner=partners[(channel.pk + offset) % len(partners)])
+                                 for channel in Channel.objects.all() for offset in xrange(3)])
+
+    User = get_user_model()
+    User.objects.bulk_create([User(username='user%s' % index) for index in xrange(count)])
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in User.objects.all()])
+    Group.objects.bulk_create([Group(name='Group%s' % index) for index in xrange(10)])
+    groups = list(Group.objects.all())
+    through = User.groups.through
+    through.objects.bulk_create([through(user=user, group=groups[(user.pk + offset) % len(groups)])
+                                 for user in User.objects.all() for offset in xrange(2)])
+
+
+def get_request(path='/'):
+    return Request(RequestFactory().get(path))
+
+
+def client_get(client, path):
+    response = client.get(path)
+    if response.status_code != 200:
+        raise CommandError('GET %s returned %s' % (path, response.status_code))
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def bench_links(options):
+    """
+    Serialize a page of choices with `reverse()` links and with compiled link templates.
+    """
+    choices = build_choices(options['objects'])
+    request = get_request('/choices')
+
+    def run(serializer_class):
+        return lambda: serializer_class(choices, many=True, context={'request': request}).data
+    return [('reverse', len(choices), run(ReverseChoiceSerializer)),
+            ('link_templates', len(choices), run(TemplatedChoiceSerializer))]
+
+
+def bench_detail(options):
+    """
+    GET single resources: plain fields, a foreign key link and a nested lookup field.
+    """
+    client = Client()
+    poll = Poll.objects.all()[0]
+    choice = Choice.objects.all()[0]
+    profile = UserProfile.objects.select_related('user')[0]
+    return [('poll', 1, lambda: client_get(client, '/poll/%s' % poll.pk)),
+            ('choice', 1, lambda: client_get(client, '/choice/%s' % choice.pk)),
+            ('userprofile', 1, lambda: client_get(client, '/user/%s/profile' % profile.user.username))]
+
+
+def bench_list(options):
+    """
+    GET a page of polls with page number, cursor and streaming pagination.
+    """
+    client = Client()
+    page_size = options['objects']
+    return [('paginated', page_size, lambda: client_get(client, '/polls?page_size=%s&page=2' % page_size)),
+            ('cursor', page_size, lambda: client_get(client, '/polls/cursor?page_size=%s' % page_size)),
+            ('streaming', page_size, lambda: client_get(client, '/polls/export?page_size=%s' % page_size))]
+
+
+def bench_nested(options):
+    """
+    Embed a foreign key per choice, and the reverse choices per poll.
+    """
+    client = Client()
+    page_size = options['objects']
+    request = get_request('/polls')
+
+    def polls_with_choices():
+        queryset = CreatePollWithChoicesSerializer.optimize_queryset(Poll.objects.all()[:page_size])
+        return CreatePollWithChoicesSerializer(queryset, many=True, context={'request': request}).data
+    return [('embed_poll', page_size, lambda: client_get(client, '/choices?page_size=%s' % page_size)),
+            ('embed_choices', page_size, polls_with_choices)]
+
+
+def bench_m2m(options):
+    """
+    Link the partners of each channel.
+    """
+    page_size = options['objects']
+    request = get_request('/channels')
+
+    def channels(queryset):
+        return lambda: ChannelSerializer(queryset(), many=True, context={'request': request}).data
+    return [('instances', page_size, channels(lambda: Channel.objects.all()[:page_size])),
+            ('prefetched', page_size, channels(lambda: Channel.objects.prefetch_related('partner')[:page_size]))]
+
+
+def bench_write(options):
+    """
+    Validate a bulk PUT body of choices; `leftover` sends the poll link to a
+    serializer that excludes it, which restores it as a leftover relation.
+    With --baseline, both also run through the deserialization path from
+    before `restore_fields` was slimmed down.
+    """
+    request = get_request('/choices')
+    poll = Poll.objects.all()[0]
+    choices = list(Choice.objects.filter(poll=poll)[:options['objects']])
+    items = [{'_links': {'self': {'href': 'http://testserver/choice/%s' % choice.pk}},
+              'poll': 'http://testserver/poll/%s' % poll.pk, 'choice_text': 'Updated%s' % index, 'votes': index}
+             for index, choice in enumerate(choices)]
+
+    def restore(serializer_class):
+        def run():
+            serializer = serializer_class(choices, data=items, many=True, context={'request': request})
+            if not serializer.is_valid():
+                raise CommandError(serializer.errors)
+        return run
+    cases = [('fields', len(choices), restore(ChoiceSerializer)),
+             ('leftover', len(choices), restore(ChoiceExcludePollSerializer))]
+    if options['baseline']:
+        cases += [('fields_base', len(choices), restore(BaselineChoiceSerializer)),
+                  ('leftover_base', len(choices), restore(BaselineChoiceExcludePollSerializer))]
+    return cases
+
+
+def bench_render(options):
+    """
+    Render a serialized page of choices with each JSON encoder backend.
+    """
+    choices = build_choices(options['objects'])
+    data = {
+        '_links': {'self': {'href': 'http://testserver/choices'}},
+        'count': len(choices),
+        '_embedded': {'choices': ReverseChoiceSerializer(choices, many=True,
+                                                         context={'request': get_request('/choices')}).data},
+    }
+
+    def render(backend):
+        renderer = HALRenderer()
+        renderer.json_backend = backend
+        return lambda: renderer.render(data)
+    return [('stdlib', len(choices), render(StdlibJSONBackend())),
+            ('simplejson', len(choices), render(SimpleJSONBackend()))]
+
+
+def bench_parallel(options):
+    """
+    Serialize every choice, with its poll embedded, in one thread and in
+    pools of threads and processes. The pools can only beat the serial run
+    with a core per worker; the threads also need a database they can share.
+    """
+    request = get_request('/choices')
+    queryset = ChoiceEmbedPollSerializer.optimize_queryset(Choice.objects.all())
+    objects = queryset.count()
+    chunk_size = max(objects // 16, 1)
+
+    def serial():
+        return ChoiceEmbedPollSerializer(queryset.order_by('pk'), many=True, context={'request': request}).data
+
+    def parallel(workers, processes):
+        return lambda: serialize_parallel(ChoiceEmbedPollSerializer, queryset, {'request': request}, chunk_size,
+                                          workers, processes)
+    return [('serial', objects, serial),
+            ('threads_4', objects, parallel(4, False)),
+            ('processes_2', objects, parallel(2, True)),
+            ('processes_4', objects, parallel(4, True))]
+
+
+def bench_prefetch(options):
+    """
+    Load a page of users with their groups, profile and permissions
+    prefetched one relation after the other and in pools of threads. The
+    threads need a database they can share: PostgreSQL, or SQLite with
+    --sqlite-file.
+    """
+    page_size = options['objects']
+    queryset = get_user_model().objects.prefetch_related('groups', 'profile', 'user_permissions')[:page_size]
+
+    def load(workers):
+        if workers is None:
+            return lambda: list(queryset.all())
+        return lambda: list(prefetch_concurrently(queryset, workers))
+    cases = [('serial', page_size, load(None))]
+    if can_load_concurrently(queryset.db):
+        cases += [('threads_2', page_size, load(2)),
+                  ('threads_3', page_size, load(3))]
+    return cases
+
+
+def percentile(timings, percent):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))]
+
+
+def resident_memory():
+    """
+    Current resident set size of the process in kilobytes, read from
+    /proc/self/statm. Elsewhere, the peak resident set size, which only grows.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+    except (IOError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pages * resource.getpagesize() // 1024
+
+
+class Command(BaseCommand):
+    args = '<case case ...>'
+    help = ('Benchmarks the drf_hal serialization hot paths over the sample_app models. '
+            'Cases other than "links" and "render" run against a fresh test database filled with generated fixtures.')
+
+    cases = {
+        'links': bench_links,
+        'detail': bench_detail,
+        'list': bench_list,
+        'nested': bench_nested,
+        'm2m': bench_m2m,
+        'write': bench_write,
+        'render': bench_render,
+        'parallel': bench_parallel,
+        'prefetch': bench_prefetch,
+    }
+    database_cases = ('detail', 'list', 'nested', 'm2m', 'write', 'parallel', 'prefetch')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--objects', type='int', default=100,
+                    help='Number of objects per response.'),
+        make_option('--repeat', type='int', default=20,
+                    help='Number of timed runs per case.'),
+        make_option('--sqlite-file', default=None,
+                    help='Create the SQLite test database in this file instead of in memory.'),
+        make_option('--baseline', action='store_true', default=False,
+                    help='Also run the write case through the deserialization path it replaced.'),
+    )
+
+    def handle(self, *args, **options):
+        names = args or sorted(self.cases.keys())
+        for name in names:
+            if name not in self.cases:
+                raise CommandError('Unknown benchmark case "%s". Choose from: %s' %
+                                   (name, ', '.join(sorted(self.cases.keys()))))
+
+        if 'parallel' in names:
+            self.stdout.write('%s cores available to the parallel case' % multiprocessing.cpu_count())
+        self.stdout.write('%-6s %-14s %9s %9s %9s %12s %8s %10s' % (
+            'case', 'label', 'p50 ms', 'p90 ms', 'p99 ms', 'objects/sec', 'queries', '+RSS KB'))
+        if any(name in self.database_cases for name in names):
+            if options['sqlite_file'] and connection.vendor == 'sqlite':
+                connection.settings_dict.setdefault('TEST', {})['NAME'] = options['sqlite_file']
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0)
+            try:
+                create_fixtures(max(options['objects'] * 2, 10))
+                self.run_cases(names, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+        else:
+            self.run_cases(names, options)
+
+    def run_cases(self, names, options):
+        for name in names:
+            for label, objects, run in self.cases[name](options):
+                self.report(name, label, objects, *self.measure(run, options['repeat']))
+
+    def measure(self, run, repeat):
+        """
+        Return the timings of `repeat` runs, the queries of one run and the
+        largest growth of resident memory over the case.
+
+        Memory is sampled after each run, while its result is still alive,
+        and compared with the resident memory before the case.
+        """
+        gc.collect()
+        baseline = resident_memory()
+        run()
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        query_count = len(queries)
+        gc.collect()
+        memory = [baseline]
+
+        def timed_run():
+            result = run()
+            memory.append(resident_memory())
+            del result
+        timings = timeit.repeat(timed_run, number=1, repeat=repeat)
+        return timings, query_count, max(memory) - baseline
+
+    def report(self, name, label, objects, timings, queries, memory):
+        median = percentile(timings, 50)
+        self.stdout.write('%-6s %-14s %9.2f %9.2f %9.2f %12.0f %8d %10d' % (
+            name, label, median * 1000, percentile(timings, 90) * 1000, percentile(timings, 99) * 1000,
+            objects / median, queries, memory))
@@ -2,7 +2,8 @@
 from django.conf.urls import patterns, url
 
 from sample_app.views import PollRetrieveUpdateDestroyAPIView, PollChoiceRetrieveUpdateDestroyAPIView, \
-    PollChoiceCreateAPIView, PollListAPIView, CreatePollWithChoicesAPIView, PollWithAdditionalEmbeddedView
+    PollChoiceCreateAPIView, PollListAPIView, CreatePollWithChoicesAPIView, PollWithAdditionalEmbeddedView, \
+    PollExportAPIView, PollCursorListAPIView
 
 
 urlpatterns = patterns(
@@ -15,6 +16,8 @@ urlpatterns = patterns(
        name='poll-detail'),
     url('^/(?P<poll__pk>\d+)/choice/(?P<pk>\d+)$', PollChoiceRetrieveUpdateDestroyAPIView.as_view(), name='poll-choice-detail'),
     url('^/(?P<poll__pk>\d+)/choice$', PollChoiceCreateAPIView.as_view(), name='create-poll-choice'),
-    url('^s$', PollListAPIView.as_view(), name='poll-list')
+    url('^s$', PollListAPIView.as_view(), name='poll-list'),
+    url('^s/export$', PollExportAPIView.as_view(), name='poll-export'),
+    url('^s/cursor$', PollCursorListAPIView.as_view(), name='poll-cursor-list'),
 )
 
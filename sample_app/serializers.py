@@ -8,9 +8,22 @@ from drf_hal.serializers import HALModelSerializer
 from sample_app.models import Choice, Poll, Channel, Partner, UserProfile
 
 
+class ChoiceBulkSerializer(HALModelSerializer):
+    class Meta:
+        model = Choice
+        bulk_create = True
+
+
+class ChoiceRelatedSerializer(HALModelSerializer):
+    class Meta:
+        model = Choice
+        exclude = ('poll',)
+
+
 class PollSerializer(HALModelSerializer):
     class Meta:
         model = Poll
+        embeddable = {'choices': ChoiceRelatedSerializer}
 
 
 class PollWithAdditionalEmbeddedSerializer(HALModelSerializer):
@@ -40,12 +53,7 @@ class PollChoiceSerializer(HALModelSerializer):
 class ChoiceSerializer(HALModelSerializer):
     class Meta:
         model = Choice
-
-
-class ChoiceRelatedSerializer(HALModelSerializer):
-    class Meta:
-        model = Choice
-        exclude = ('poll',)
+        embeddable = {'poll': PollSerializer}
 
 
 class CreatePollWithChoicesSerializer(HALModelSerializer):
@@ -5,9 +5,11 @@ from django.contrib.auth import get_user_model
 
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.test.utils import override_settings
 import simplejson
 from dougrain import Document
 
+from drf_hal.pagination import CursorPaginator
 from sample_app.models import Poll, Choice, Partner, Channel, UserProfile
 
 
@@ -66,6 +68,30 @@ class TestChoiceView(TestCase):
         response = self.client.get('/choice/%s?fields=true' % self.choice.id)
         self.assertEqual(response.status_code, 200)
 
+    def test_get_choice_with_fields_list(self):
+        response = self.client.get('/choice/%s?fields=id,choice_text' % self.choice.id)
+        self.assertEqual(response.status_code, 200)
+
+        content = simplejson.loads(response.content)
+        self.assertEqual(set(content.keys()), set(['_links', 'id', 'choice_text']))
+        self.assertEqual(list(content['_links'].keys()), ['self'])
+
+    def test_put_choice_ignores_fields(self):
+        response = self.client.put('/choice/%s?fields=id' % self.choice.id, simplejson.dumps({
+            'poll': 'http://testserver/poll/%s' % self.poll.id, 'choice_text': 'Ramen', 'votes': 1,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        content = simplejson.loads(response.content)
+        self.assertEqual(content['choice_text'], 'Ramen')
+
+    def test_put_choice_with_hal_links(self):
+        response = self.client.put('/choice/%s' % self.choice.id, simplejson.dumps({
+            '_links': {'poll': {'href': 'http://testserver/poll/%s' % self.poll.id}},
+            'choice_text': 'Ramen', 'votes': 1,
+        }), content_type='application/hal+json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Choice.objects.get(pk=self.choice.id).choice_text, 'Ramen')
+
     def test_get_choice_with_lookup_field(self):
         response = self.client.get('/choice/%s?lookup_field=true' % self.choice.id)
         self.assertEqual(response.status_code, 200)
@@ -89,6 +115,21 @@ class TestPollView(TestCase):
         self.assertEqual(doc.links['self'].url(), 'http://testserver/poll/%s' % self.poll.id)
 
 
+    def test_get_poll_etag_from_content(self):
+        response = self.client.get('/poll/%s' % self.poll.id)
+        etag = response['ETag']
+
+        response = self.client.get('/poll/%s' % self.poll.id, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.poll.question = 'What is your favorite drink?'
+        self.poll.save()
+        response = self.client.get('/poll/%s' % self.poll.id, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
 class TestPollWithAdditionEmbeddedView(TestCase):
     def setUp(self):
         self.poll = Poll.objects.create(question='What is your favorite food?', pub_date=date(2014, 1, 3))
@@ -159,6 +200,7 @@ class TestPollListView(TestCase):
         _links = content['_links']
         _embedded = content['_embedded']
         self.assertEqual(content['total'], 30)
+        self.assertFalse(content['total_is_approximate'])
         self.assertEqual(content['num_pages'], 3)
         self.assertEqual(_links['self']['href'], 'http://testserver/polls')
         self.assertEqual(_links['first']['href'], 'http://testserver/polls?page=1')
@@ -241,6 +283,214 @@ class TestPollListView(TestCase):
         self.assertEqual(content['count'], 3)
 
 
+class TestChoiceListView(TestCase):
+    def setUp(self):
+        for index in xrange(0, 3):
+            poll = Poll.objects.create(question='Poll%s' % index, pub_date=date(2014, 8, 8))
+            for choice_index in xrange(0, 5):
+                Choice.objects.create(poll=poll, choice_text='Choice%s' % choice_index)
+
+    def test_get_choice_list_embeds_polls(self):
+        response = self.client.get('/choices')
+        self.assertEqual(response.status_code, 200)
+        content = simplejson.loads(response.content)
+        choices = content['_embedded']['choices']
+        self.assertEqual(content['total'], 15)
+        self.assertEqual(len(choices), 10)
+        self.assertEqual(choices[0]['_embedded']['poll']['question'], 'Poll0')
+
+    def test_get_choice_list_query_count_does_not_depend_on_page_size(self):
+        # count + page
+        with self.assertNumQueries(2):
+            self.client.get('/choices?page_size=2')
+        with self.assertNumQueries(2):
+            self.client.get('/choices?page_size=15')
+
+    @override_settings(DEBUG=True)
+    def test_get_choice_list_profile(self):
+        response = self.client.get('/choices?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn('render;dur=', timing)
+        self.assertIn('ChoiceEmbedPollSerializer._embedded.poll;dur=', timing)
+        self.assertIn('paginate;dur=', timing)
+        self.assertIn('pagination.choices;dur=', timing)
+
+    def test_get_choice_list_not_profiled(self):
+        response = self.client.get('/choices?page_size=2')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_get_choice_list_with_fields(self):
+        response = self.client.get('/choices?fields=votes')
+        self.assertEqual(response.status_code, 200)
+        choices = simplejson.loads(response.content)['_embedded']['choices']
+        self.assertEqual(set(choices[0].keys()), set(['_links', 'votes']))
+
+    def test_get_choice_list_embed_dotted_path(self):
+        # count + page + choices of the polls
+        with self.assertNumQueries(3):
+            response = self.client.get('/choices?page_size=5&embed=poll.choices')
+        choices = simplejson.loads(response.content)['_embedded']['choices']
+        self.assertEqual(len(choices[0]['_embedded']['poll']['_embedded']['choices']), 5)
+
+
+class TestPollExportView(TestCase):
+    def __create_polls(self, count):
+        for index in xrange(0, count):
+            Poll.objects.create(question='Poll%s' % index, pub_date=date(2014, 8, 8))
+
+    def test_export_streams_all_polls(self):
+        self.__create_polls(25)
+
+        response = self.client.get('/polls/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['content-type'], 'application/hal+json')
+        content = simplejson.loads(''.join(response.streaming_content))
+        polls = content['_embedded']['polls']
+        self.assertEqual(content['_links']['self']['href'], 'http://testserver/polls/export')
+        self.assertEqual(content['count'], 25)
+        self.assertEqual([poll['question'] for poll in polls], ['Poll%s' % index for index in xrange(0, 25)])
+        self.assertEqual(polls[0]['_links']['self']['href'], 'http://testserver/poll/%s' % polls[0]['id'])
+
+    def test_export_no_polls(self):
+        response = self.client.get('/polls/export')
+        content = simplejson.loads(''.join(response.streaming_content))
+        self.assertEqual(content['count'], 0)
+        self.assertEqual(content['_embedded']['polls'], [])
+
+    def test_export_paginated(self):
+        self.__create_polls(25)
+
+        response = self.client.get('/polls/export?page_size=20&page=2')
+        content = simplejson.loads(''.join(response.streaming_content))
+        self.assertEqual(content['total'], 25)
+        self.assertEqual(content['count'], 5)
+        self.assertIn('page=1', content['_links']['prev']['href'])
+        self.assertEqual(len(content['_embedded']['polls']), 5)
+
+
+class TestPollCursorListView(TestCase):
+    def setUp(self):
+        for index in xrange(0, 25):
+            Poll.objects.create(question='Poll%s' % index, pub_date=date(2014, 8, 8))
+
+    def __get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return simplejson.loads(response.content)
+
+    def test_first_page(self):
+        content = self.__get('/polls/cursor')
+        polls = content['_embedded']['polls']
+        self.assertEqual([poll['question'] for poll in polls], ['Poll%s' % index for index in xrange(0, 10)])
+        self.assertEqual(content['count'], 10)
+        self.assertNotIn('total', content)
+        self.assertEqual(content['_links']['self']['href'], 'http://testserver/polls/cursor')
+        self.assertEqual(content['_links']['first']['href'], 'http://testserver/polls/cursor')
+        self.assertIsNone(content['_links']['prev'])
+        self.assertIn('cursor=', content['_links']['next']['href'])
+
+    def test_walk_forward_and_back(self):
+        first = self.__get('/polls/cursor')
+        second = self.__get(first['_links']['next']['href'])
+        self.assertEqual([poll['question'] for poll in second['_embedded']['polls']],
+                         ['Poll%s' % index for index in xrange(10, 20)])
+
+        third = self.__get(second['_links']['next']['href'])
+        self.assertEqual([poll['question'] for poll in third['_embedded']['polls']],
+                         ['Poll%s' % index for index in xrange(20, 25)])
+        self.assertIsNone(third['_links']['next'])
+
+        back = self.__get(third['_links']['prev']['href'])
+        self.assertEqual(back['_embedded']['polls'], second['_embedded']['polls'])
+        self.assertIsNotNone(back['_links']['next'])
+
+        start = self.__get(back['_links']['prev']['href'])
+        self.assertEqual(start['_embedded']['polls'], first['_embedded']['polls'])
+        self.assertIsNone(start['_links']['prev'])
+
+    def test_first_link_drops_cursor(self):
+        first = self.__get('/polls/cursor?page_size=5')
+        second = self.__get(first['_links']['next']['href'])
+        self.assertEqual(second['_links']['first']['href'], 'http://testserver/polls/cursor?page_size=5')
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/polls/cursor?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_cursor_position(self):
+        paginator = CursorPaginator(Poll.objects.all(), 3)
+        for position in ([1, 2], 'abc', {}):
+            response = self.client.get('/polls/cursor', {'cursor': paginator.encode_cursor('n', position)})
+            self.assertEqual(response.status_code, 404)
+
+
+class TestChoiceBulkView(TestCase):
+    def setUp(self):
+        self.poll = Poll.objects.create(question='What is your favorite food?', pub_date=date(2014, 1, 3))
+        self.poll_uri = 'http://testserver/poll/%s' % self.poll.pk
+
+    def __collection(self, items):
+        return simplejson.dumps({'_embedded': {'choices': items}})
+
+    def test_bulk_create(self):
+        items = [{'poll': self.poll_uri, 'choice_text': 'Choice%s' % index} for index in xrange(50)]
+        # The poll, then the last key, a single insert and the new keys inside a savepoint.
+        with self.assertNumQueries(6):
+            response = self.client.post('/choices/bulk', self.__collection(items), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        content = simplejson.loads(response.content)
+        self.assertEqual(content['count'], 50)
+        self.assertEqual(len(content['_embedded']['choices']), 50)
+        for choice, item in zip(Choice.objects.order_by('pk'), content['_embedded']['choices']):
+            self.assertEqual(item['id'], choice.pk)
+            self.assertEqual(item['_links']['self']['href'], 'http://testserver/choice/%s' % choice.pk)
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('choice_text', flat=True)),
+                         ['Choice%s' % index for index in xrange(50)])
+
+    def test_bulk_create_plain_list(self):
+        items = [{'poll': self.poll_uri, 'choice_text': 'Sushi'}]
+        response = self.client.post('/choices/bulk', simplejson.dumps(items), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Choice.objects.count(), 1)
+
+    def test_bulk_create_validation_errors(self):
+        items = [{'poll': self.poll_uri, 'choice_text': 'Sushi'}, {'poll': 'http://testserver/poll/999'}]
+        response = self.client.post('/choices/bulk', self.__collection(items), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        content = simplejson.loads(response.content)
+        self.assertEqual(content[0], {})
+        self.assertIn('poll', content[1])
+        self.assertIn('choice_text', content[1])
+        self.assertEqual(Choice.objects.count(), 0)
+
+    def test_bulk_update(self):
+        choices = [Choice.objects.create(poll=self.poll, choice_text='Choice%s' % index) for index in xrange(10)]
+        items = [{'_links': {'self': {'href': 'http://testserver/choice/%s' % choice.pk}},
+                  'poll': self.poll_uri, 'choice_text': 'Updated%s' % choice.pk, 'votes': 1}
+                 for choice in choices]
+        response = self.client.put('/choices/bulk', self.__collection(items), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        content = simplejson.loads(response.content)
+        self.assertEqual([item['choice_text'] for item in content['_embedded']['choices']],
+                         ['Updated%s' % choice.pk for choice in choices])
+        self.assertEqual(Choice.objects.count(), 10)
+        self.assertEqual(set(Choice.objects.values_list('votes', flat=True)), set([1]))
+
+    def test_bulk_partial_update(self):
+        choice = Choice.objects.create(poll=self.poll, choice_text='Sushi')
+        items = [{'_links': {'self': {'href': 'http://testserver/choice/%s' % choice.pk}}, 'votes': 3}]
+        response = self.client.patch('/choices/bulk', self.__collection(items), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Choice.objects.get(pk=choice.pk).votes, 3)
+
+    def test_bulk_update_unknown_item(self):
+        items = [{'_links': {'self': {'href': 'http://testserver/choice/999'}}, 'votes': 3}]
+        response = self.client.patch('/choices/bulk', self.__collection(items), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
 class TestCreatePollAPIView(TestCase):
     def setUp(self):
         self.data = dict(
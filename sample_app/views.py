@@ -1,41 +1,47 @@
 # -*- coding: utf-8 -*-
 from django.contrib.auth import get_user_model
-from rest_framework.generics import RetrieveUpdateDestroyAPIView, CreateAPIView, ListAPIView, RetrieveAPIView
+from rest_framework.generics import RetrieveUpdateDestroyAPIView, CreateAPIView, ListAPIView, RetrieveAPIView, \
+    ListCreateAPIView
 from rest_framework.reverse import reverse
 
-from drf_hal.mixins import MultipleLookupFieldsMixin
+from drf_hal.mixins import MultipleLookupFieldsMixin, OptimizedQuerysetMixin, StreamingListMixin, \
+    CursorPaginationMixin, BulkWriteMixin, SparseFieldsetMixin, ConditionalGetMixin, \
+    ProfiledViewMixin
 from sample_app.models import Choice, Poll, Channel, Partner, UserProfile
-from sample_app.serializers import ChoiceSerializer, ChoiceExcludePollSerializer, ChoiceExcludeVotesSerializer, \
-    ChoiceEmbedPollSerializer, PollSerializer, ChoiceFieldsPollSerializer, ChoiceLookupFieldPollSerializer, \
-    PollChoiceSerializer, PollListSerializer, ChannelSerializer, PartnerSerializer, CreatePollWithChoicesSerializer, \
-    PollWithAdditionalEmbeddedSerializer, UserSerializer, UserProfileSerializer
+from sample_app.serializers import ChoiceSerializer, ChoiceEmbedPollSerializer, PollSerializer, \
+    ChoiceLookupFieldPollSerializer, PollChoiceSerializer, PollListSerializer, ChannelSerializer, PartnerSerializer, \
+    CreatePollWithChoicesSerializer, PollWithAdditionalEmbeddedSerializer, UserSerializer, UserProfileSerializer, \
+    ChoiceBulkSerializer
 
 
-class ChoiceRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
+class ChoiceRetrieveUpdateDestroyAPIView(SparseFieldsetMixin, RetrieveUpdateDestroyAPIView):
     model = Choice
 
     def get_serializer_class(self):
-        query_params = self.request.QUERY_PARAMS
-        if query_params.get('exclude'):
-            exclude = query_params['exclude']
-            if exclude == 'poll':
-                return ChoiceExcludePollSerializer
-            return ChoiceExcludeVotesSerializer
-        if query_params.get('embed'):
-            return ChoiceEmbedPollSerializer
-        if query_params.get('fields'):
-            return ChoiceFieldsPollSerializer
-        if query_params.get('lookup_field'):
+        if self.request.QUERY_PARAMS.get('lookup_field'):
             return ChoiceLookupFieldPollSerializer
         return ChoiceSerializer
 
 
+class ChoiceListAPIView(ProfiledViewMixin, SparseFieldsetMixin, OptimizedQuerysetMixin, ListAPIView):
+    model = Choice
+    serializer_class = ChoiceEmbedPollSerializer
+    paginate_by = 10
+    paginate_by_param = 'page_size'
+    max_paginate_by = 100
+
+
+class ChoiceBulkAPIView(BulkWriteMixin, ListCreateAPIView):
+    model = Choice
+    serializer_class = ChoiceBulkSerializer
+
+
 class CreatePollWithChoicesAPIView(CreateAPIView):
     model = Poll
     serializer_class = CreatePollWithChoicesSerializer
 
 
-class PollRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
+class PollRetrieveUpdateDestroyAPIView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     model = Poll
 
     def get_serializer_class(self):
@@ -49,7 +55,7 @@ class PollWithAdditionalEmbeddedView(RetrieveAPIView):
         return PollWithAdditionalEmbeddedSerializer
 
 
-class PollRetrieveListAPIView(ListAPIView):
+class PollRetrieveListAPIView(OptimizedQuerysetMixin, ListAPIView):
     model = Poll
     serializer_class = PollSerializer
     pagination_serializer_class = PollListSerializer
@@ -70,7 +76,23 @@ class PollChoiceCreateAPIView(CreateAPIView):
         return super(PollChoiceCreateAPIView, self).create(request, *args, **kwargs)
 
 
-class PollListAPIView(ListAPIView):
+class PollListAPIView(ConditionalGetMixin, SparseFieldsetMixin, OptimizedQuerysetMixin, ListAPIView):
+    model = Poll
+    serializer_class = PollSerializer
+    paginate_by = 10
+    paginate_by_param = 'page_size'
+    max_paginate_by = 100
+
+
+class PollExportAPIView(StreamingListMixin, OptimizedQuerysetMixin, ListAPIView):
+    model = Poll
+    serializer_class = PollSerializer
+    paginate_by_param = 'page_size'
+    max_paginate_by = 100
+    stream_chunk_size = 10
+
+
+class PollCursorListAPIView(CursorPaginationMixin, OptimizedQuerysetMixin, ListAPIView):
     model = Poll
     serializer_class = PollSerializer
     paginate_by = 10